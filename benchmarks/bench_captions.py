@@ -0,0 +1,61 @@
+# Рост времени оформления подписей с числом таблиц и рисунков.
+#
+# Документ из N повторений "абзац, подпись, таблица, рисунок, подпись, пустой абзац" оформляется при
+# нескольких N; время на одну группу должно оставаться примерно постоянным (линейный рост). Вставка
+# подписей через поиск позиции в теле давала квадратичный рост.
+#
+#   python benchmarks/bench_captions.py --sizes 500 1000 2000
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Cm
+
+from benchmarks.generate import _png
+from style_configs.style_config import StyleManager
+from utils.pipeline import load_converter
+
+
+def make(path, groups):
+    doc, image = Document(), _png()
+    for i in range(groups):
+        doc.add_paragraph(f"Абзац {i} обычного текста.")
+        doc.add_paragraph(f"Таблица {i} - данные")
+        doc.add_table(rows=1, cols=2).cell(0, 0).text = str(i)
+        doc.add_picture(io.BytesIO(image), width=Cm(3))
+        doc.add_paragraph(f"Рисунок {i} - схема")
+        doc.add_paragraph("")
+    doc.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Рост времени оформления подписей таблиц и рисунков")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 2000], help="числа групп")
+    args = parser.parse_args()
+
+    style_conf = StyleManager()
+    print(f"{'групп':>7} {'таблицы, с':>11} {'абзацы, с':>10} {'мс на группу':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for groups in args.sizes:
+            path = os.path.join(tmp, f"captions{groups}.docx")
+            make(path, groups)
+            conv = load_converter(path, os.devnull, style_conf, jobs=1)
+
+            started = time.perf_counter()
+            conv.format_tables()
+            tables = time.perf_counter() - started
+            for c in conv.data:
+                conv.format_doc(c)
+            total = time.perf_counter() - started
+            print(f"{groups:7} {tables:11.2f} {total - tables:10.2f} {total / groups * 1000:13.2f}")
+
+
+if __name__ == '__main__':
+    main()
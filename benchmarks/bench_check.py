@@ -0,0 +1,90 @@
+# Проверка оформления (--check, utils.check) против полного форматирования с сохранением.
+#
+# Синтетический отчет проверяется без изменений, затем форматируется и сохраняется, и проверяется
+# результат. В исходном отчете нарушения должны найтись; после форматирования допустимы только подписи
+# без названия ("[]" вместо названия ставит само форматирование), а после их заполнения отчет должен
+# пройти проверку без нарушений. Печатается время проверки и форматирования; если проверка не быстрее
+# форматирования или находит не то, программа завершается с кодом 1.
+#
+#   python benchmarks/bench_check.py --paragraphs 20000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.generate import make_docx
+from style_configs.style_config import StyleManager
+from utils.check import check_document
+from utils.pipeline import load_converter
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def format_docx(path, out, style_conf):
+    conv = load_converter(path, out, style_conf, jobs=1)
+    conv.start()
+
+
+# подписи "Рисунок N − []" получают название, как сделал бы автор после форматирования
+def fill_captions(path, out):
+    doc = Document(path)
+    for par in doc.paragraphs:
+        if par.text.endswith(' − []'):
+            for run in par.runs:
+                run.text = run.text.replace('[]', 'Название')
+    doc.save(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка оформления против форматирования")
+    parser.add_argument('--paragraphs', type=int, default=20000, help="число блоков синтетического отчета")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    style_conf, failed = StyleManager(), False
+    with tempfile.TemporaryDirectory() as tmp:
+        raw, formatted, filled = (os.path.join(tmp, name) for name in ("raw.docx", "out.docx", "filled.docx"))
+        make_docx(raw, args.paragraphs, seed=args.seed)
+
+        check_time, report = timed(check_document, raw, style_conf)
+        format_time, _ = timed(format_docx, raw, formatted, style_conf)
+        print(f"абзацев: {report['paragraphs']}, таблиц: {report['tables']}, рисунков: {report['figures']}")
+        print(f"{'':22} {'время, с':>9}  нарушения")
+        print(f"{'проверка исходного':22} {check_time:9.3f}  {report['counts']}")
+        print(f"{'форматирование':22} {format_time:9.3f}")
+        if report['ok']:
+            print("в исходном отчете не найдено нарушений")
+            failed = True
+
+        report = check_document(formatted, style_conf)
+        print(f"{'после форматирования':22} {'':9}  {report['counts']}")
+        if set(report['counts']) - {'caption_missing'}:
+            print("после форматирования остались нарушения, кроме подписей без названия")
+            failed = True
+
+        fill_captions(formatted, filled)
+        report = check_document(filled, style_conf)
+        print(f"{'подписи заполнены':22} {'':9}  {report['counts']}")
+        if not report['ok']:
+            failed = True
+
+    if check_time >= format_time:
+        print("проверка не быстрее форматирования")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"проверка быстрее форматирования в {format_time / check_time:.1f} раза")
+
+
+if __name__ == '__main__':
+    main()
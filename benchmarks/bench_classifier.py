@@ -0,0 +1,110 @@
+# Определение формул и кода (DocParser.special_scores) на злонамеренных абзацах против прежних регулярок.
+#
+# Прежние признаки - регулярки вида .*\(.*\).*;.* - на длинном абзаце из одних скобок или "/*" без пары
+# перебирают все разбиения строки и работают за квадратичное и худшее время. Сначала на случайных абзацах
+# (знаки, ключевые слова, переводы строк) проверяется, что баллы совпадают с прежними регулярками. Затем
+# печатается время на абзац для каждого злонамеренного шаблона при разной длине: прежние регулярки -
+# только до --reference-chars, новый способ - до наибольшей длины. Если баллы расходятся или время нового
+# способа растет быстрее длины (с запасом в 3 раза), программа завершается с кодом 1.
+#
+#   python benchmarks/bench_classifier.py --chars 1000 10000 50000 --reference-chars 1000
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.parsers import DocParser
+
+FORMULA_SIGNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'.*[=≠≈<>≤≥∝→←↑↓↔].*',
+    r'.*\b(sin|cos|tan|log|ln|exp|sqrt|sum|prod|int|lim)\b.*',
+    r'.*\d+/\d+.*',
+    r'.*[a-zA-Z]_{.*}.*',
+    r'.*[a-zA-Z]\^\{.*\}.*',
+    r'.*\b(alpha|beta|gamma|delta|epsilon|zeta|theta|lambda|mu|nu|xi|pi|rho|sigma|tau|phi|chi|psi|omega)\b.*',
+)]
+CODE_SIGNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'^\s*(if|else|for|while|def|class|function|return|import|from)\b',
+    r'.*\{.*\}.*',
+    r'.*\(.*\).*;.*',
+    r'.*//.*|.*/\*.*\*/.*',
+    r'.*->.*|.*=>.*',
+)]
+
+# абзацы, на которых прежние регулярки не находят пары и перебирают всё
+ADVERSARIAL = {
+    "скобки (((": "(",
+    "(); без ;": "()",
+    "{{{ без }": "{",
+    "x_{ без }": "x_{",
+    "/* без */": "/*",
+    "sin( и цифры": "sin(1",
+}
+PARTS = ["=", "<", "->", "=>", "//", "/*", "*/", "{", "}", "(", ")", ";", "_{", "^{", "1/2", "/", "x", "K",
+         "ſ", "İ", " ", " ", "\n", "sin", "ln", "pi", "alpha", "if", "def", "return", "word", "_", "^", "*"]
+
+
+def reference_scores(text) -> tuple[int, int]:
+    return (sum(p.search(text) is not None for p in FORMULA_SIGNS),
+            sum(p.search(text) is not None for p in CODE_SIGNS))
+
+
+def per_paragraph(fn, text, repeat) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Определение формул и кода на злонамеренных абзацах")
+    parser.add_argument('--chars', type=int, nargs='+', default=[1000, 10000, 50000], help="длины абзаца")
+    parser.add_argument('--reference-chars', type=int, default=1000,
+                        help="наибольшая длина для прежних регулярок (они квадратичны)")
+    parser.add_argument('--cases', type=int, default=20000, help="случайных абзацев для сверки")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd, failed = random.Random(args.seed), False
+    mismatches = 0
+    for _ in range(args.cases):
+        text = ''.join(rnd.choice(PARTS) for _ in range(rnd.randrange(1, 25)))
+        if DocParser.special_scores(text) != reference_scores(text):
+            if mismatches < 5:
+                print(f"{text!r}: {DocParser.special_scores(text)}, прежние {reference_scores(text)}")
+            mismatches += 1
+    print(f"случайных абзацев: {args.cases}, расхождений с прежними регулярками: {mismatches}")
+    failed |= bool(mismatches)
+
+    sizes = sorted(args.chars)
+    print(f"{'шаблон':14} {'символов':>9} {'прежние, мс':>12} {'новые, мс':>10}")
+    for name, unit in ADVERSARIAL.items():
+        times = []
+        for chars in sizes:
+            text = unit * (chars // len(unit))
+            new = per_paragraph(DocParser.special_scores, text, 20)
+            times.append(new)
+            old = ''
+            if chars <= args.reference_chars:
+                old = f"{per_paragraph(reference_scores, text, 1) * 1000:12.1f}"
+                if DocParser.special_scores(text) != reference_scores(text):
+                    print(f"  {name}: баллы отличаются от прежних регулярок")
+                    failed = True
+            print(f"{name:14} {chars:9} {old:>12} {new * 1000:10.3f}")
+        growth = (times[-1] / times[0]) / (sizes[-1] / sizes[0])
+        if growth > 3:
+            print(f"  {name}: время растет в {growth:.1f} раза быстрее длины")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+    print("баллы совпадают с прежними регулярками, время линейно от длины абзаца")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Классификация абзацев большого отчета: последовательно и на пуле процессов (DocParser.classify).
+#
+# Сначала проверяется, что параллельный разбор дает в точности те же (тип, уровень, признаки) в том же
+# порядке, что и последовательный (при расхождении программа завершается с кодом 1), затем
+# сравнивается время при разном числе процессов.
+#
+#   python benchmarks/bench_classify.py --paragraphs 20000 --jobs 1 2 4 8
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.generate import make_docx
+from utils import parsers
+from utils.parsers import DocParser
+
+
+def classify(doc, jobs):
+    started = time.perf_counter()
+    result = [(c.ptype, c.level, c.flags, c.index) for c in DocParser(doc, jobs=jobs).parse()]
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Последовательная и параллельная классификация абзацев")
+    parser.add_argument('--paragraphs', type=int, default=20000, help="число блоков синтетического отчета")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[2, 4], help="числа процессов для сравнения")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.docx")
+        make_docx(path, args.paragraphs, seed=args.seed)
+        doc = Document(path)
+
+    # порог отключается, чтобы пул использовался при любом размере отчета
+    parsers.PARALLEL_MIN = 0
+    serial, serial_time = classify(doc, 1)
+    print(f"абзацев: {len(serial)}")
+    print(f"{'процессов':>10} {'время, с':>9} {'ускорение':>10}")
+    print(f"{1:10} {serial_time:9.3f} {1:10.2f}")
+
+    failed = False
+    for jobs in args.jobs:
+        result, elapsed = classify(doc, jobs)
+        mismatch = next((i for i, (a, b) in enumerate(zip(serial, result)) if a != b), None)
+        if len(result) != len(serial) or mismatch is not None:
+            print(f"{jobs:10} расхождение с последовательным разбором"
+                  + (f" в абзаце {mismatch}" if mismatch is not None else f": {len(result)} абзацев"))
+            failed = True
+            continue
+        print(f"{jobs:10} {elapsed:9.3f} {serial_time / elapsed:10.2f}")
+
+    if failed:
+        sys.exit(1)
+    print("результаты совпадают")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# Оптимизация рисунков (--image-dpi) на отчете с фотографиями и сканами.
+#
+# Отчет с крупными картинками (JPEG-фотографии и PNG-сканы шире ширины текста, часть картинок
+# повторяется отдельными частями пакета) форматируется без оптимизации и с ней при разном числе
+# потоков. Проверяется, что в результате нет картинок шире ширины текста при заданном DPI, рисунков
+# шире текста на странице и дублей, а текст документа тот же; иначе программа завершается с кодом 1.
+#
+#   python benchmarks/bench_images.py --images 12 --size 4000 --dpi 300 --jobs 1 2 4
+
+import argparse
+import hashlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.oxml.ns import qn
+from docx.parts.image import ImagePart
+from docx.shared import Cm
+from PIL import Image, ImageFilter
+
+from style_configs.style_config import StyleManager
+from utils.converters import Converter
+from utils.images import EMU_PER_INCH, ImageOptions, image_summary
+from utils.pipeline import load_converter
+
+
+# "фотография": плавный фон с зерном, как снимок с телефона
+def photo(width, height, rnd, fmt) -> bytes:
+    base = Image.radial_gradient('L').resize((width, height))
+    channels = [Image.blend(base, Image.effect_noise((width, height), rnd.randrange(20, 60)), 0.3)
+                .filter(ImageFilter.GaussianBlur(rnd.choice((1, 2)))) for _ in range(3)]
+    im = Image.merge('RGB', channels) if fmt == 'JPEG' else channels[0]
+    out = io.BytesIO()
+    im.save(out, fmt, **({'quality': 95} if fmt == 'JPEG' else {}))
+    return out.getvalue()
+
+
+def make(path, images, size, seed):
+    rnd, doc = random.Random(seed), Document()
+    blobs = []
+    for i in range(images):
+        doc.add_paragraph(f"Абзац {i} перед рисунком.")
+        if blobs and i % 4 == 3:
+            # та же картинка отдельной частью: так бывает после копирования рисунков между документами
+            blob = rnd.choice(blobs)
+            doc.add_picture(io.BytesIO(blob), width=Cm(15))
+            blip = doc.inline_shapes[-1]._inline.graphic.graphicData.pic.blipFill.blip
+            part = ImagePart(PackURI(f'/word/media/copy{i}.bin'), doc.part.related_parts[blip.get(qn('r:embed'))]
+                             .content_type, blob, None)
+            blip.set(qn('r:embed'), doc.part.relate_to(part, RT.IMAGE))
+        else:
+            blob = photo(size, size * 3 // 4, rnd, 'JPEG' if i % 2 else 'PNG')
+            blobs.append(blob)
+            doc.add_picture(io.BytesIO(blob), width=Cm(rnd.choice((12, 17, 20))))
+        doc.add_paragraph(f"Рисунок {i + 1} - снимок")
+    doc.save(path)
+
+
+# нарушения в готовом отчете: картинки шире max_px, рисунки шире текста, одинаковые части
+def problems(path, max_px) -> list[str]:
+    found, hashes = [], set()
+    with zipfile.ZipFile(path) as z:
+        for name in z.namelist():
+            if not name.startswith('word/media/'):
+                continue
+            blob = z.read(name)
+            if hashlib.sha1(blob).digest() in hashes:
+                found.append(f"дубль {name}")
+            hashes.add(hashlib.sha1(blob).digest())
+            with Image.open(io.BytesIO(blob)) as im:
+                if im.width > max_px:
+                    found.append(f"{name}: {im.width} пикселей")
+        xml = z.read('word/document.xml').decode()
+    found += [f"рисунок шириной {cx} EMU" for cx in re.findall(r'<wp:extent cx="(\d+)"', xml)
+              if int(cx) > Converter.TEXT_WIDTH]
+    return found
+
+
+def text(path) -> list[str]:
+    return [p.text for p in Document(path).paragraphs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Оптимизация рисунков отчета")
+    parser.add_argument('--images', type=int, default=12, help="число рисунков")
+    parser.add_argument('--size', type=int, default=4000, help="ширина картинки, пикселей")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4], help="числа потоков")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    max_px = round(Converter.TEXT_WIDTH / EMU_PER_INCH * args.dpi)
+    style_conf = StyleManager()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "photos.docx")
+        make(source, args.images, args.size, args.seed)
+
+        def run(name, images, jobs):
+            out = os.path.join(tmp, f"{len(results)}.docx")
+            started = time.perf_counter()
+            conv = load_converter(source, out, style_conf, jobs=jobs, images=images)
+            conv.start()
+            results.append((name, time.perf_counter() - started, os.path.getsize(out), conv.image_report,
+                            text(out), problems(out, max_px) if images else []))
+
+        results = []
+        run("без оптимизации", None, 1)
+        for jobs in args.jobs:
+            run(f"{args.dpi} dpi, потоков {jobs}", ImageOptions(args.dpi, args.quality), jobs)
+        source_size = os.path.getsize(source)
+
+    expected = results[0][4]
+    print(f"исходный отчет: {source_size / 2**20:.1f} МБ, ширина текста при {args.dpi} dpi: {max_px} пикселей")
+    print(f"{'способ':24} {'время, с':>9} {'размер, МБ':>11}")
+    failed = False
+    for name, elapsed, size, report, got, found in results:
+        print(f"{name:24} {elapsed:9.2f} {size / 2**20:11.2f}")
+        if got != expected:
+            found = found + ["текст отличается от результата без оптимизации"]
+        for problem in found:
+            print(f"  {problem}")
+        failed |= bool(found)
+    print(image_summary(results[-1][3]))
+
+    if failed:
+        sys.exit(1)
+    print("картинки не шире текста, дублей нет, текст совпадает")
+
+
+if __name__ == '__main__':
+    main()
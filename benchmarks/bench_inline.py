@@ -0,0 +1,110 @@
+# Строчная разметка Markdown (utils.inline): разбор и сборка прогонов против прежнего способа.
+#
+# Сначала проверяется разбор набора строк с вложенной разметкой, кодом, экранированием и одиночными
+# звездочками. Затем прогоны абзацев с разметкой собираются через utils.inline и прежним способом
+# (два прохода регулярками и python-docx со шрифтом и размером на каждом прогоне); печатаются абзацы
+# в секунду и число XML-элементов. При ошибке разбора или расхождении текста программа завершается
+# с кодом 1.
+#
+#   python benchmarks/bench_inline.py --paragraphs 5000
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx.oxml import OxmlElement
+from docx.shared import Pt
+from docx.text.paragraph import Paragraph
+
+from utils.inline import BOLD, CODE, ITALIC, append_runs, parse_inline
+
+CASES = [
+    ("текст с **жирным** и *курсивом*.", [("текст с ", 0), ("жирным", BOLD), (" и ", 0), ("курсивом", ITALIC),
+                                           (".", 0)]),
+    ("**жирный с *курсивом* внутри**", [("жирный с ", BOLD), ("курсивом", BOLD | ITALIC), (" внутри", BOLD)]),
+    ("*курсив с **жирным***", [("курсив с ", ITALIC), ("жирным", BOLD | ITALIC)]),
+    ("***оба***", [("оба", BOLD | ITALIC)]),
+    ("*a **b* c**", [("a **b", ITALIC), (" c**", 0)]),
+    ("2 * 3 = 6", [("2 * 3 = 6", 0)]),
+    ("** не жирный **", [("** не жирный **", 0)]),
+    ("**незакрытый", [("**незакрытый", 0)]),
+    (r"\*не курсив\* и \\", [("*не курсив* и \\", 0)]),
+    ("вызов `f(*args)` и ``a ` b``", [("вызов ", 0), ("f(*args)", CODE), (" и ", 0), ("a ` b", CODE)]),
+    ("**жирный `код`**", [("жирный ", BOLD), ("код", BOLD | CODE)]),
+    ("`незакрытый код", [("`незакрытый код", 0)]),
+    ("C:\\Users\\имя", [("C:\\Users\\имя", 0)]),
+]
+
+
+def make(paragraphs, seed) -> list[str]:
+    rnd = random.Random(seed)
+    words = "результаты измерения показали что значение параметра превышает допустимое".split()
+    marks = ("**{}**", "*{}*", "`{}`", "{}", "{}", "{}")
+    return [' '.join(rnd.choice(marks).format(rnd.choice(words)) for _ in range(rnd.randrange(8, 30))) + '.'
+            for _ in range(paragraphs)]
+
+
+# прежний способ: курсив и жирный отдельными проходами, шрифт и размер на каждом прогоне
+def reference_runs(par, text):
+    spans = [(m.span(), 'italic') for m in re.finditer(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', text)]
+    spans += [(m.span(), 'bold') for m in re.finditer(r"\*\*(.*?)\*\*", text)]
+    spans.sort()
+    bounds, last = [], 0
+    for (start, end), style in spans:
+        bounds += [((last, start), 'normal'), ((start, end), style)]
+        last = end
+    bounds.append(((last, len(text)), 'normal'))
+    for (start, end), style in bounds:
+        run = par.add_run(text[start:end].replace('*', '').replace('`', ''))
+        run.font.size = Pt(14)
+        run.font.name = "Times New Roman"
+        run.bold = True if style == 'bold' else None
+        run.italic = True if style == 'italic' else None
+
+
+# абзацы создаются заранее и вне документа: замеряется только сборка прогонов
+def build(texts, fill):
+    pars = [Paragraph(OxmlElement('w:p'), None) for _ in texts]
+    started = time.perf_counter()
+    for par, text in zip(pars, texts):
+        fill(par, text)
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(1 for par in pars for _ in par._p.iter()), [par.text for par in pars]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Строчная разметка Markdown")
+    parser.add_argument('--paragraphs', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    for text, expected in CASES:
+        got = parse_inline(text)
+        if got != expected:
+            print(f"разбор {text!r}: {got}, ожидалось {expected}")
+            failed = True
+    print(f"случаев разбора: {len(CASES)}, ошибок: {sum(parse_inline(t) != e for t, e in CASES)}")
+
+    texts = make(args.paragraphs, args.seed)
+    new_time, new_nodes, new_text = build(texts, lambda par, text: append_runs(par._p, text))
+    old_time, old_nodes, old_text = build(texts, reference_runs)
+    print(f"{'способ':18} {'абзацев/с':>10} {'элементов XML':>14}")
+    print(f"{'прежний':18} {len(texts) / old_time:10.0f} {old_nodes:14}")
+    print(f"{'utils.inline':18} {len(texts) / new_time:10.0f} {new_nodes:14}")
+    if new_text != old_text:
+        print("текст абзацев отличается от прежнего способа")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("разбор верен, текст совпадает")
+
+
+if __name__ == '__main__':
+    main()
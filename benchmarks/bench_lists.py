@@ -0,0 +1,222 @@
+# Списки ГОСТ через numbering.xml (utils.numbering) против прежней переписи текста элементов.
+#
+# Строится отчет из десятков тысяч элементов списков: маркированные и нумерованные списки Word (w:numPr,
+# numId подобраны так, что прежнее правило "нечетный numId - маркированный" ошибается) с жирными и
+# курсивными прогонами и списки, набранные в тексте ("• ", "1) "). Проверяется, что тип списка определен
+# по формату номера, что маркированные элементы ссылаются на один w:num ГОСТ, а каждый нумерованный
+# список - на свой с тем же начальным номером, что текст и оформление прогонов не изменились и что
+# повторное форматирование результата ничего не меняет. Затем те же элементы оформляются прежним
+# способом (снятие w:numPr и новый прогон "− " с текстом); печатаются элементов в секунду, размер
+# word/document.xml и число прогонов с оформлением. При ошибке программа завершается с кодом 1.
+#
+#   python benchmarks/bench_lists.py --items 20000
+
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Cm
+from docx.text.paragraph import Paragraph
+
+from benchmarks.generate import WORDS
+from style_configs.style_config import StyleManager, StyleNames
+from utils.converters import Converter
+from utils.numbering import BULLET, NUMBERED, gost_nums, list_item, numbering_part
+from utils.parsers import DocParser
+from utils.typography import normalize_paragraph
+
+_NUM, _START_OVERRIDE, _R, _T = qn('w:num'), qn('w:startOverride'), qn('w:r'), qn('w:t')
+_EMPHASIS = (qn('w:rPr'), qn('w:b')), (qn('w:rPr'), qn('w:i'))
+# numId списков Word: маркированные - четные, нумерованные - нечетные (прежнее правило считало наоборот)
+BULLET_ABSTRACT, NUMBER_ABSTRACT = 90, 91
+
+
+def _abstract(abstract_id, fmt, text):
+    levels = ''.join(f'<w:lvl w:ilvl="{k}"><w:start w:val="1"/><w:numFmt w:val="{fmt}"/>'
+                     f'<w:lvlText w:val="{text.replace("N", str(k + 1))}"/></w:lvl>' for k in range(2))
+    return parse_xml(f'<w:abstractNum {nsdecls("w")} w:abstractNumId="{abstract_id}">{levels}</w:abstractNum>')
+
+
+# отчет и ожидания по каждому элементу списка: [(вид, текст, уровень, numId, начало списка)]
+def make(items, seed):
+    rnd = random.Random(seed)
+    doc = Document()
+    numbering = numbering_part(doc).element
+    first = next(numbering.iterchildren(_NUM))
+    first.addprevious(_abstract(BULLET_ABSTRACT, 'bullet', '•'))
+    first.addprevious(_abstract(NUMBER_ABSTRACT, 'decimal', '%N.'))
+    num_id = 100
+
+    expected = []
+    while len(expected) < items:
+        doc.add_paragraph(' '.join(rnd.choice(WORDS) for _ in range(12)).capitalize() + '.')
+        kind = rnd.choice(('word_bullet', 'word_number', 'text_bullet', 'text_number'))
+        start = rnd.choice((1, 1, 1, 3))
+        if kind.startswith('word'):
+            num_id += 2 if kind == 'word_bullet' else 1
+            num_id += (num_id % 2) != (kind == 'word_number')
+            override = f'<w:lvlOverride w:ilvl="0"><w:startOverride w:val="{start}"/></w:lvlOverride>'
+            numbering.append(parse_xml(
+                f'<w:num {nsdecls("w")} w:numId="{num_id}"><w:abstractNumId w:val='
+                f'"{BULLET_ABSTRACT if kind == "word_bullet" else NUMBER_ABSTRACT}"/>'
+                f'{override if kind == "word_number" else ""}</w:num>'))
+
+        for k in range(rnd.randint(3, 8)):
+            words = [rnd.choice(WORDS) for _ in range(rnd.randint(4, 10))]
+            ilvl = rnd.choice((0, 0, 0, 1)) if k and kind.startswith('word') else 0
+            par = doc.add_paragraph()
+            if kind == 'text_bullet':
+                par.add_run('• ')
+            elif kind == 'text_number':
+                par.add_run(f'{k + 1}) ')
+            par.add_run(words[0]).bold = True
+            par.add_run(' ' + ' '.join(words[1:-1]) + ' ')
+            par.add_run(words[-1]).italic = True
+            if kind.startswith('word'):
+                par._p.get_or_add_pPr().get_or_add_numPr().get_or_add_ilvl().val = ilvl
+                par._p.pPr.numPr.get_or_add_numId().val = num_id
+            expected.append((kind, par.text.strip(), ilvl, str(num_id) if kind.startswith('word') else None, start))
+
+    blob = io.BytesIO()
+    doc.save(blob)
+    return blob.getvalue(), expected
+
+
+def parts(blob) -> dict:
+    with zipfile.ZipFile(io.BytesIO(blob)) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+# прежний способ: снятие w:numPr и отступы абзаца, текст элемента - одним новым прогоном с "− "
+class LegacyConverter(Converter):
+    def format_bullet(self, par: Paragraph):
+        p_pr = par._p.get_or_add_pPr()
+        if p_pr.numPr is not None:
+            p_pr.remove(p_pr.numPr)
+        par.style = StyleNames.list
+        par.paragraph_format.first_line_indent = Cm(0)
+        par.paragraph_format.left_indent = Cm(1.25)
+
+        normalize_paragraph(par)
+
+        text = par.text.strip()
+        if text and not text.startswith('− '):
+            for run in par.runs:
+                run.text = ""
+            par.add_run('− ' + re.sub(r"^[*•\-]\s?", "", text))
+
+    def format_numbered(self, par: Paragraph):
+        par.style = StyleNames.list
+        if not re.match(r'^[\dа-яa-z]+[).]\s+.+', par.text, re.IGNORECASE):
+            self.format_bullet(par)
+        normalize_paragraph(par)
+
+
+# форматирование тела: (время оформления элементов списков, отформатированный отчет)
+def run(blob, style_conf, cls=Converter):
+    doc = Document(io.BytesIO(blob))
+    data = DocParser(doc, jobs=1).parse()
+    conv = cls(doc, data, os.devnull, style_conf, jobs=1)
+    elapsed = 0
+    for c in data:
+        started = time.perf_counter()
+        conv.format_doc(c)
+        if c.ptype.startswith('list'):
+            elapsed += time.perf_counter() - started
+    out = io.BytesIO()
+    conv.save(out)
+    return elapsed, out.getvalue()
+
+
+def check(blob, expected) -> list[str]:
+    errors = []
+    doc = Document(io.BytesIO(blob))
+    numbering = numbering_part(doc).element
+    gost = gost_nums(numbering)
+    starts = {num.get(qn('w:numId')): num.find(f'.//{_START_OVERRIDE}') for num in numbering.iterchildren(_NUM)}
+    items = [p for p in doc.paragraphs if p.style.name == StyleNames.list]
+    if len(items) != len(expected):
+        return [f"элементов списков {len(items)}, ожидалось {len(expected)}"]
+
+    lists = {}
+    for par, (kind, text, ilvl, source, start) in zip(items, expected):
+        num_id, level = list_item(par._p)
+        want = re.sub(r'^(• |\d+\) )', '', text) if kind == 'text_bullet' else text
+        if par.text != want:
+            errors.append(f"текст {par.text!r}, ожидался {want!r}")
+        if kind.endswith('bullet') and (gost.get(num_id) != BULLET or level != ilvl):
+            errors.append(f"маркированный элемент {text[:30]!r}: numId {num_id}, уровень {level}")
+        elif kind == 'word_number':
+            override = starts.get(num_id)
+            if gost.get(num_id) != NUMBERED or level != ilvl or lists.setdefault(source, num_id) != num_id:
+                errors.append(f"нумерованный элемент {text[:30]!r}: numId {num_id}, уровень {level}")
+            elif override is None or override.get(qn('w:val')) != str(start):
+                errors.append(f"список {num_id} начинается не с {start}")
+        elif kind == 'text_number' and num_id is not None:
+            errors.append(f"набранный номер {text[:30]!r} получил нумерацию Word")
+        runs = [run for run in par.runs if run.text]
+        if kind != 'text_number' and not (runs and runs[0].bold and runs[-1].italic):
+            errors.append(f"оформление прогонов {text[:30]!r} потеряно")
+    if len(set(lists.values())) != len(lists):
+        errors.append("разные нумерованные списки ссылаются на один w:num ГОСТ")
+    return errors[:5]
+
+
+# прогоны с текстом и жирным или курсивом (пустые прогоны прежний способ оставляет с оформлением)
+def styled_runs(blob) -> int:
+    body = parse_xml(parts(blob)['word/document.xml'])
+    return sum(1 for r in body.iter(_R) if any(r.find(f'{pr}/{tag}') is not None for pr, tag in _EMPHASIS)
+               and any(t.text for t in r.iter(_T)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Списки ГОСТ через numbering.xml")
+    parser.add_argument('--items', type=int, default=20000, help="число элементов списков")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    style_conf, failed = StyleManager(), False
+    blob, expected = make(args.items, args.seed)
+    types = [c.ptype for c in DocParser(Document(io.BytesIO(blob)), jobs=1).parse() if c.ptype.startswith('list')]
+    want = ['list_bullet' if kind.endswith('bullet') else 'list_number' for kind, *_ in expected]
+    if types != want:
+        wrong = sum(a != b for a, b in zip(types, want)) + abs(len(types) - len(want))
+        print(f"тип списка определен неверно у {wrong} элементов")
+        failed = True
+
+    new_time, new_blob = run(blob, style_conf)
+    for error in check(new_blob, expected):
+        print(error)
+        failed = True
+
+    _, again = run(new_blob, style_conf)
+    first, second = parts(new_blob), parts(again)
+    for name in ('word/numbering.xml', 'word/document.xml'):
+        if first[name] != second[name]:
+            print(f"повторное форматирование изменило {name}")
+            failed = True
+
+    old_time, old_blob = run(blob, style_conf, LegacyConverter)
+    print(f"элементов списков: {len(expected)}")
+    print(f"{'способ':16} {'элементов/с':>12} {'document.xml, КБ':>17} {'прогонов с оформлением':>23}")
+    for name, elapsed, out in (("прежний", old_time, old_blob), ("numbering.xml", new_time, new_blob)):
+        size = len(parts(out)['word/document.xml']) / 1024
+        print(f"{name:16} {len(expected) / elapsed:12.0f} {size:17.0f} {styled_runs(out):23}")
+
+    if failed:
+        sys.exit(1)
+    print("типы списков, ссылки на определения ГОСТ, текст и прогоны верны; повторный запуск ничего не меняет")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Замер разбора Markdown: время должно расти линейно с размером файла, пиковая память - оставаться
+# постоянной (файл читается построчно, токены не накапливаются).
+#
+#   python benchmarks/bench_markdown.py [--sizes 1 2 4 8]   (размеры в МБ)
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.parsers import MdParser
+
+BLOCKS = [
+    "# Заголовок раздела {n}\n\n",
+    "## Подраздел {n}\n",
+    "Обычный абзац с **жирным** и *курсивом*, номер {n}. " * 3 + "\n\n",
+    "- пункт списка {n}\n- еще пункт\n+ и еще\n",
+    "1. первый {n}\n2. второй\n",
+    "> цитата {n}\n\n",
+    "| столбец | значение |\n|:--------|---------:|\n| a{n} | 1,5 |\n| b | 2 |\n\n",
+    "```python\nx = {n}\nprint(x)\n```\n",
+    "---\n",
+    "<div>html {n}</div>\n",
+]
+
+
+def make_markdown(path, size_mb, seed=0):
+    rnd = random.Random(seed)
+    limit, written, n = size_mb * 1024 * 1024, 0, 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < limit:
+            block = rnd.choice(BLOCKS).format(n=n)
+            f.write(block)
+            written += len(block.encode('utf-8'))
+            n += 1
+
+
+def measure(path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = 0
+    with open(path, encoding='utf-8') as f:
+        for _ in MdParser(f).tokens():
+            count += 1
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер разбора Markdown")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8], help="размеры файлов в МБ")
+    args = parser.parse_args()
+
+    print(f"{'МБ':>4} {'токенов':>9} {'время, с':>9} {'с/МБ':>7} {'пик памяти, КБ':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"bench_{size}.txt")
+            make_markdown(path, size)
+            count, elapsed, peak = measure(path)
+            print(f"{size:>4} {count:>9} {elapsed:>9.3f} {elapsed / size:>7.3f} {peak / 1024:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
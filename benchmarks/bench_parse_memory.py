@@ -0,0 +1,49 @@
+# Память, которую занимают результаты разбора (DocParser.parse) в расчете на один абзац.
+#
+# Документ загружается до начала трассировки, поэтому в замер попадают только записи ParseResult
+# и то, что они удерживают, а не само XML-дерево.
+#
+#   python benchmarks/bench_parse_memory.py --paragraphs 5000
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.generate import make_docx
+from utils.parsers import DocParser
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память результатов разбора на абзац")
+    parser.add_argument('--paragraphs', type=int, default=5000, help="число блоков синтетического отчета")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.docx")
+        make_docx(path, args.paragraphs, seed=args.seed)
+        doc = Document(path)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = DocParser(doc, jobs=1).parse()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    retained -= before
+    print(f"абзацев: {len(data)}")
+    print(f"результаты разбора: {retained / 1024:.1f} КБ, {retained / len(data):.0f} байт на абзац")
+    print(f"пик во время разбора: {(peak - before) / 1024:.1f} КБ")
+
+
+if __name__ == '__main__':
+    main()
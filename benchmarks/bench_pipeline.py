@@ -0,0 +1,184 @@
+# Поэтапный замер конвейера на синтетических отчетах (benchmarks/generate.py).
+#
+# Каждый этап (разбор, настройка стилей, оформление страниц, таблиц и абзацев, сохранение) замеряется
+# отдельно: время - лучшее из --repeat запусков, пиковая память - в отдельном запуске под tracemalloc,
+# чтобы трассировка не искажала время. Результаты пишутся в JSON; с --compare сравниваются с ранее
+# сохраненным файлом, и если время или пиковая память этапа выросли больше чем на --threshold,
+# программа завершается с кодом 1.
+#
+#   python benchmarks/bench_pipeline.py --json baseline.json
+#   python benchmarks/bench_pipeline.py --compare baseline.json --threshold 0.15
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+
+from benchmarks.generate import make_docx, make_markdown
+from style_configs.style_config import StyleManager
+from utils.converters import Converter, MarkdownConverter
+from utils.parsers import DocParser, MdParser
+
+# изменения меньше этих порогов считаются шумом и не отмечаются как регрессия
+MIN_DELTA = 0.02
+MIN_DELTA_KB = 1024
+
+
+# этапы одного прогона; каждый возвращает (имя, функция), функции вызываются по порядку
+def docx_stages(path, out):
+    state = {}
+
+    def load():
+        state['doc'] = Document(path)
+
+    def parse():
+        state['data'] = DocParser(state['doc']).parse()
+
+    def style_manager():
+        state['style_conf'] = StyleManager()
+
+    def setup_styles():
+        state['conv'] = Converter(state['doc'], state['data'], out, state['style_conf'])
+
+    return [('load', load), ('DocParser.parse', parse), ('StyleManager', style_manager),
+            ('setup_styles', setup_styles)] + _format_stages(state)
+
+
+def txt_stages(path, out):
+    state = {}
+
+    def tokenize():
+        with open(path, encoding='utf-8') as f:
+            state['tokens'] = MdParser(f).parse_()
+
+    def build():
+        md = MarkdownConverter(state['tokens'], out)
+        state['doc'], state['data'], state['table_align'] = md.convert_to_doc(), md.ctx, md.table_align
+
+    def style_manager():
+        state['style_conf'] = StyleManager()
+
+    def setup_styles():
+        state['conv'] = Converter(state['doc'], state['data'], out, state['style_conf'],
+                                  table_align=state['table_align'])
+
+    return [('MdParser.parse_', tokenize), ('MarkdownConverter', build), ('StyleManager', style_manager),
+            ('setup_styles', setup_styles)] + _format_stages(state)
+
+
+def _format_stages(state):
+    def format_doc():
+        conv = state['conv']
+        for c in conv.data:
+            conv.format_doc(c)
+
+    return [('format_pages', lambda: state['conv'].format_pages()),
+            ('format_tables', lambda: state['conv'].format_tables()),
+            ('format_doc', format_doc),
+            ('save', lambda: state['conv'].save())]
+
+
+def run_stages(stages, trace=False) -> dict:
+    result = {}
+    for name, fn in stages:
+        if trace:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        result[name] = tracemalloc.get_traced_memory()[1] if trace else elapsed
+    return result
+
+
+def measure(make_stages, path, out, repeat) -> dict:
+    times = [run_stages(make_stages(path, out)) for _ in range(repeat)]
+    tracemalloc.start()
+    peaks = run_stages(make_stages(path, out), trace=True)
+    tracemalloc.stop()
+
+    return {name: {'time': min(t[name] for t in times), 'peak_kb': round(peaks[name] / 1024, 1)}
+            for name in times[0]}
+
+
+def compare(results, baseline, threshold) -> list[str]:
+    regressions = []
+    print(f"\n{'вход':6} {'этап':20} {'было, с':>9} {'стало, с':>9} {'изм.':>7} {'пик, изм.':>10}")
+    for kind, stages in results.items():
+        for name, cur in stages.items():
+            base = baseline.get(kind, {}).get(name)
+            if base is None:
+                continue
+            ratio = cur['time'] / base['time'] - 1 if base['time'] else 0.0
+            mem_ratio = cur['peak_kb'] / base['peak_kb'] - 1 if base['peak_kb'] else 0.0
+            slower = ratio > threshold and cur['time'] - base['time'] > MIN_DELTA
+            heavier = mem_ratio > threshold and cur['peak_kb'] - base['peak_kb'] > MIN_DELTA_KB
+
+            marks = [m for m, flag in (('медленнее', slower), ('больше памяти', heavier)) if flag]
+            print(f"{kind:6} {name:20} {base['time']:9.3f} {cur['time']:9.3f} {ratio:+7.1%} {mem_ratio:+10.1%}"
+                  + (f"  <- {', '.join(marks)}" if marks else ''))
+            if marks:
+                regressions.append(f"{kind}/{name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поэтапный замер конвейера форматирования")
+    parser.add_argument('--paragraphs', type=int, default=2000, help="число блоков синтетического отчета")
+    parser.add_argument('--rows', type=int, default=10, help="строк данных в таблицах")
+    parser.add_argument('--cols', type=int, default=4, help="столбцов в таблицах")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="число запусков для замера времени")
+    parser.add_argument('--inputs', nargs='+', choices=['docx', 'txt'], default=['docx', 'txt'])
+    parser.add_argument('--json', help="куда записать результаты")
+    parser.add_argument('--compare', help="файл результатов, с которым сравнивать")
+    parser.add_argument('--threshold', type=float, default=0.15, help="допустимое замедление этапа (доля)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.inputs:
+            path, out = os.path.join(tmp, f"report.{kind}"), os.path.join(tmp, "out.docx")
+            make = make_docx if kind == 'docx' else make_markdown
+            make(path, args.paragraphs, args.rows, args.cols, args.seed)
+            results[kind] = measure(docx_stages if kind == 'docx' else txt_stages, path, out, args.repeat)
+
+    print(f"{'вход':6} {'этап':20} {'время, с':>9} {'пик, КБ':>10}")
+    for kind, stages in results.items():
+        for name, r in stages.items():
+            print(f"{kind:6} {name:20} {r['time']:9.3f} {r['peak_kb']:10.1f}")
+        print(f"{kind:6} {'всего':20} {sum(r['time'] for r in stages.values()):9.3f}")
+
+    if args.json:
+        report = {
+            'meta': {'date': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                     'platform': platform.platform(), 'paragraphs': args.paragraphs, 'rows': args.rows,
+                     'cols': args.cols, 'seed': args.seed, 'repeat': args.repeat},
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        params = ('paragraphs', 'rows', 'cols', 'seed')
+        if any(baseline['meta'].get(k) != getattr(args, k) for k in params):
+            print("\nвнимание: параметры отчета отличаются от сохраненных, сравнение неточно")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\nрегрессии: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nрегрессий нет")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Сохранение отчета с большими рисунками: Document.save (python-docx) против utils.package.
+#
+# Отчет с несколькими "сканами" (рисунки из шума, почти не сжимаются) форматируется, после чего
+# сохраняется python-docx и utils.package.save_document - с копированием неизмененных частей из
+# исходного .docx и без него, при разном числе потоков. Содержимое всех частей каждого результата
+# сравнивается с результатом python-docx; при расхождении программа завершается с кодом 1.
+#
+#   python benchmarks/bench_save.py --images 20 --size 1500 --jobs 1 2 4
+
+import argparse
+import io
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Cm
+
+from style_configs.style_config import StyleManager
+from utils.package import save_document
+from utils.pipeline import load_converter
+
+
+# серое изображение из шума: как скан, сжимается плохо
+def noise_png(size, rnd) -> bytes:
+    width, height = size, size * 2 // 3
+    raw = b''.join(b'\x00' + rnd.randbytes(width) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+
+def make(path, images, size, seed):
+    rnd, doc = random.Random(seed), Document()
+    for i in range(images):
+        doc.add_paragraph(f"Абзац {i} перед рисунком.")
+        doc.add_picture(io.BytesIO(noise_png(size, rnd)), width=Cm(12))
+        doc.add_paragraph(f"Рисунок {i + 1} - скан")
+    doc.save(path)
+
+
+def parts(path) -> dict:
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сохранение отчета с большими рисунками")
+    parser.add_argument('--images', type=int, default=20, help="число рисунков")
+    parser.add_argument('--size', type=int, default=1500, help="ширина рисунка, пикселей")
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4], help="числа потоков сжатия")
+    parser.add_argument('--level', type=int, default=6, help="уровень сжатия")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "scans.docx")
+        make(source, args.images, args.size, args.seed)
+        conv = load_converter(source, os.devnull, StyleManager(), jobs=1)
+        conv.format()
+
+        def timed(name, save):
+            out = os.path.join(tmp, f"{len(results)}.docx")
+            started = time.perf_counter()
+            copied = save(out)
+            results.append((name, time.perf_counter() - started, os.path.getsize(out), copied, parts(out)))
+
+        results = []
+        timed("python-docx", lambda out: conv.doc.save(out))
+        for jobs in args.jobs:
+            timed(f"без копирования, потоков {jobs}",
+                  lambda out: save_document(conv.doc, out, None, args.level, jobs))
+        for jobs in args.jobs:
+            timed(f"с копированием, потоков {jobs}",
+                  lambda out: save_document(conv.doc, out, source, args.level, jobs))
+        source_size = os.path.getsize(source)
+
+    expected = results[0][4]
+    print(f"исходный отчет: {source_size / 2**20:.1f} МБ, частей: {len(expected)}")
+    print(f"{'способ':34} {'время, с':>9} {'размер, МБ':>11} {'скопировано':>12}")
+    failed = False
+    for name, elapsed, size, copied, got in results:
+        same = got == expected
+        failed |= not same
+        print(f"{name:34} {elapsed:9.3f} {size / 2**20:11.2f} {copied if copied is not None else '-':>12}"
+              + ('' if same else "  расхождение с python-docx"))
+
+    if failed:
+        sys.exit(1)
+    print("содержимое частей совпадает")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Сервер форматирования (--serve) против запуска cli.py на каждый файл.
+#
+# Синтетический отчет сначала несколько раз форматируется отдельным запуском cli.py, затем
+# отправляется на сервер с прогретыми процессами несколькими параллельными клиентами. Каждый ответ
+# сравнивается по частям архива с результатом локального форматирования; при расхождении или
+# ошибке программа завершается с кодом 1. Печатаются задержки (медиана, 95-й перцентиль),
+# пропускная способность и метрики сервера.
+#
+#   python benchmarks/bench_server.py --paragraphs 300 --requests 40 --concurrency 4 --jobs 2
+
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import make_docx
+from style_configs.style_config import StyleManager
+from utils.pipeline import load_converter
+from utils.server import WorkerPool, create_server, request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parts(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return {name: z.read(name) for name in z.namelist()}
+
+
+def reference(path) -> dict:
+    conv = load_converter(path, os.devnull, StyleManager(), jobs=1)
+    conv.format()
+    out = io.BytesIO()
+    conv.doc.save(out)
+    return parts(out.getvalue())
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер форматирования против запуска cli.py на каждый файл")
+    parser.add_argument('--paragraphs', type=int, default=300, help="число блоков синтетического отчета")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=40, help="запросов к серверу")
+    parser.add_argument('--concurrency', type=int, default=4, help="параллельных клиентов")
+    parser.add_argument('--jobs', type=int, default=None, help="процессов сервера (по умолчанию: число ядер)")
+    parser.add_argument('--spawn', type=int, default=5, help="запусков cli.py для сравнения")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.docx")
+        make_docx(path, args.paragraphs, seed=args.seed)
+        with open(path, 'rb') as f:
+            data = f.read()
+        expected = reference(path)
+
+        spawned = []
+        for _ in range(args.spawn):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, 'cli.py'), path, '-o', os.path.join(tmp, 'out.docx'),
+                            '-f', '--no-cache'], check=True, capture_output=True, cwd=ROOT)
+            spawned.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        pool = WorkerPool(args.jobs)
+        pool.start()
+        warmup = time.perf_counter() - started
+        server = create_server(('127.0.0.1', 0), pool, queue_size=args.requests)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        address = server.server_address
+
+        def send(_):
+            t = time.perf_counter()
+            status, _, body = request(address, 'POST', '/format', data)
+            return status, body, time.perf_counter() - t
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as ex:
+                results = list(ex.map(send, range(args.requests)))
+            elapsed = time.perf_counter() - started
+            metrics = json.loads(request(address, 'GET', '/metrics')[2])
+        finally:
+            server.shutdown()
+            server.server_close()
+            pool.close()
+
+    failed = [i for i, (status, body, _) in enumerate(results) if status != 200 or parts(body) != expected]
+    latencies = [t for _, _, t in results]
+    print(f"отчет: {len(data) / 1024:.0f} КБ, процессов сервера: {pool.size}, прогрев: {warmup:.2f} с")
+    print(f"{'':24} {'медиана, с':>11} {'95%, с':>8} {'файлов/с':>9}")
+    print(f"{'запуск cli.py':24} {statistics.median(spawned):11.3f} {percentile(spawned, 0.95):8.3f} "
+          f"{len(spawned) / sum(spawned):9.2f}")
+    print(f"{'сервер, клиентов: ' + str(args.concurrency):24} {statistics.median(latencies):11.3f} "
+          f"{percentile(latencies, 0.95):8.3f} {len(results) / elapsed:9.2f}")
+    print(f"очередь: наибольшая глубина {metrics['queue']['max_depth']}, "
+          f"ожидание в сумме {metrics['latency']['queue_wait']['sum']:.2f} с, "
+          f"обработка в сумме {metrics['latency']['processing']['sum']:.2f} с")
+
+    if failed:
+        print(f"ответов с ошибкой или расхождением с локальным форматированием: {len(failed)}")
+        sys.exit(1)
+    print("ответы совпадают с локальным форматированием")
+
+
+if __name__ == '__main__':
+    main()
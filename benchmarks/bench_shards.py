@@ -0,0 +1,73 @@
+# Форматирование большого отчета по главам на пуле процессов (Converter.format_shards) против
+# последовательного.
+#
+# Отчет форматируется последовательно (1 процесс) и по главам при разном числе процессов. Каждый
+# результат сравнивается с последовательным побайтно по всем частям пакета: при расхождении программа
+# завершается с кодом 1. Печатаются число кусков, время форматирования тела и ускорение.
+#
+#   python benchmarks/bench_shards.py --paragraphs 20000 --jobs 2 4 8
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import make_docx
+from style_configs.style_config import StyleManager
+from utils import converters
+from utils.pipeline import load_converter
+
+
+def run(path, style_conf, jobs):
+    conv = load_converter(path, os.devnull, style_conf, jobs=jobs)
+    shards = conv.shards(2 * jobs) if jobs > 1 else None
+    started = time.perf_counter()
+    conv.format()
+    elapsed = time.perf_counter() - started
+    out = io.BytesIO()
+    conv.save(out)
+    with zipfile.ZipFile(out) as z:
+        parts = {name: z.read(name) for name in z.namelist()}
+    return elapsed, len(shards) if shards else 1, parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Форматирование по главам на пуле процессов")
+    parser.add_argument('--paragraphs', type=int, default=20000, help="число блоков синтетического отчета")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[2, 4], help="числа процессов для сравнения")
+    args = parser.parse_args()
+
+    style_conf = StyleManager()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.docx")
+        make_docx(path, args.paragraphs, seed=args.seed)
+
+        # порог отключается, чтобы по главам форматировался отчет любого размера
+        converters.SHARD_MIN = 0
+        serial_time, _, serial = run(path, style_conf, 1)
+        print(f"{'процессов':>10} {'кусков':>7} {'время, с':>9} {'ускорение':>10}")
+        print(f"{1:10} {1:7} {serial_time:9.3f} {1:10.2f}")
+
+        failed = False
+        for jobs in args.jobs:
+            elapsed, shards, parts = run(path, style_conf, jobs)
+            diff = sorted(name for name in serial.keys() | parts.keys() if serial.get(name) != parts.get(name))
+            if diff:
+                print(f"{jobs:10} {shards:7} результат отличается от последовательного: {', '.join(diff)}")
+                failed = True
+                continue
+            print(f"{jobs:10} {shards:7} {elapsed:9.3f} {serial_time / elapsed:10.2f}")
+
+    if failed:
+        sys.exit(1)
+    print("результат совпадает с последовательным побайтно")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Холодный старт cli.py на путях, которым не нужна обработка документа: справка, ошибка аргументов,
+# отсутствующий и неподдерживаемый файл.
+#
+# Для каждого пути cli.py запускается в отдельном интерпретаторе несколько раз; из лучшего времени
+# вычитается запуск пустого интерпретатора (python -c pass). По выводу python -X importtime
+# проверяется, что тяжелые модули (python-docx, lxml, модули обработки) на этих путях не загружаются.
+# Если модуль загружен или время старта больше бюджета, программа завершается с кодом 1.
+# Для сравнения печатается время импорта модулей обработки и самые дорогие из них.
+#
+#   python benchmarks/bench_startup.py --budget 40 --repeat 7
+#
+# Те же проверки выполняет tests/test_startup.py.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, 'cli.py')
+HEAVY = ('docx', 'lxml', 'utils.parsers', 'utils.converters', 'utils.pipeline', 'style_configs.style_config')
+BUDGET = 40.0
+
+
+def run(args, stdin='\n', importtime=False):
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+    started = time.perf_counter()
+    result = subprocess.run(cmd, input=stdin, capture_output=True, text=True, cwd=ROOT)
+    return time.perf_counter() - started, result.stderr
+
+
+def best(args, repeat) -> float:
+    return min(run(args)[0] for _ in range(repeat))
+
+
+# модули из вывода -X importtime: имя -> суммарное время импорта, мкс
+def imported(args) -> dict[str, int]:
+    modules = {}
+    for line in run(args, importtime=True)[1].splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+# пути без обработки документа: [(название, аргументы интерпретатора)]; tmp - каталог для файлов
+def cases(tmp) -> list[tuple[str, list[str]]]:
+    unsupported = os.path.join(tmp, 'отчет.pdf')
+    open(unsupported, 'wb').close()
+    return [
+        ('справка', [CLI, '--help']),
+        ('ошибка аргументов', [CLI, '--нет-такого-ключа']),
+        ('файл не найден', [CLI, os.path.join(tmp, 'нет.docx'), '-o', os.path.join(tmp, 'out.docx')]),
+        ('неподдерживаемый файл', [CLI, unsupported]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного старта cli.py")
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help="допустимое время старта сверх пустого интерпретатора, мс")
+    parser.add_argument('--repeat', type=int, default=7, help="запусков на каждый путь (берется лучший)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        interpreter = best(['-c', 'pass'], args.repeat)
+        print(f"пустой интерпретатор: {interpreter * 1000:.1f} мс, бюджет cli.py: {args.budget:.0f} мс сверх него")
+        print(f"{'путь':<24} {'время, мс':>10} {'сверх, мс':>10}  тяжелые модули")
+
+        failed = False
+        for name, cmd in cases(tmp):
+            elapsed = best(cmd, args.repeat)
+            modules = imported(cmd)
+            heavy = [m for m in HEAVY if m in modules]
+            overhead = (elapsed - interpreter) * 1000
+            over = overhead > args.budget
+            failed |= over or bool(heavy)
+            print(f"{name:<24} {elapsed * 1000:10.1f} {overhead:10.1f}  "
+                  f"{', '.join(heavy) or '-'}{'  (больше бюджета)' if over else ''}")
+
+    # для сравнения: что стоит путь обработки документа
+    modules = imported(['-c', 'import utils.pipeline, utils.streaming'])
+    top = sorted(((t, m) for m, t in modules.items() if '.' not in m), reverse=True)[:5]
+    print(f"\nимпорт модулей обработки: {modules.get('utils.pipeline', 0) / 1000:.1f} мс; дороже всего: "
+          + ', '.join(f"{m} {t / 1000:.1f} мс" for t, m in top))
+
+    if failed:
+        sys.exit(1)
+    print("старт в пределах бюджета")
+
+
+if __name__ == '__main__':
+    main()
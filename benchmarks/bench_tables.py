@@ -0,0 +1,110 @@
+# Таблицы Markdown с тысячами строк: сборка MarkdownConverter и полное форматирование, строк в секунду.
+#
+# Для сравнения та же таблица собирается построчно через python-docx (Table.add_row и add_run на каждую
+# ячейку, как раньше). Проверяется, что текст ячеек обоих вариантов совпадает, а выравнивание столбцов
+# после форматирования взято из строки-разделителя или, где его нет, по содержимому (числовые столбцы
+# вправо); при расхождении программа завершается с кодом 1.
+#
+#   python benchmarks/bench_tables.py --rows 1000 5000 20000 --reference-rows 2000
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT as JC
+from docx.shared import Pt
+
+from style_configs.style_config import StyleManager
+from utils.converters import Converter, MarkdownConverter, md_cells
+from utils.parsers import MdParser
+
+HEADER = "| № | Образец | Масса, г | Доля | Примечание |"
+# выравнивание: по центру, влево, вправо, по содержимому, по содержимому
+SEPARATOR = "|:-:|:--|--:|---|---|"
+EXPECTED = [JC.CENTER, JC.LEFT, JC.RIGHT, JC.RIGHT, JC.LEFT]
+
+
+# выгрузка из скрипта анализа: номер, имя, числа и примечание с разметкой
+def make(rows, seed) -> str:
+    rnd = random.Random(seed)
+    lines = ["# Результаты", "", "Таблица 1 - Измерения", "", HEADER, SEPARATOR]
+    for i in range(rows):
+        note = rnd.choice(("норма", "**выброс**", "повтор *2*", ""))
+        lines.append(f"| {i + 1} | образец-{rnd.randrange(1000)} | {rnd.uniform(0, 100):.3f} | "
+                     f"{rnd.random():.2f} | {note} |")
+    lines += ["", "Текст после таблицы."]
+    return '\n'.join(lines) + '\n'
+
+
+# прежний способ: строка за строкой через python-docx
+def reference(tokens):
+    md = MarkdownConverter([], os.devnull)
+    table = None
+    for p in tokens:
+        if p['type'] == 'table':
+            cells = md_cells(p['text'])
+            row = md.doc.add_table(rows=1, cols=len(cells)).rows[0] if table is None else table.add_row()
+            table = row.table if table is None else table
+            for cell, text in zip(row.cells, cells):
+                if text:
+                    run = cell.paragraphs[0].add_run(text.replace('*', ''))
+                    run.font.size = Pt(14)
+                    run.font.name = "Times New Roman"
+    return md.doc
+
+
+def texts(doc) -> list:
+    return [[c.text for c in row.cells] for t in doc.tables for row in t.rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка и форматирование больших таблиц Markdown")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 5000, 20000], help="строк в таблице")
+    parser.add_argument('--reference-rows', type=int, default=2000,
+                        help="наибольшая таблица для построчной сборки python-docx (она квадратична)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    style_conf = StyleManager()
+    failed = False
+    print(f"{'строк':>7} {'сборка, строк/с':>16} {'всего, строк/с':>15} {'python-docx, строк/с':>21}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            tokens = MdParser(make(rows, args.seed)).parse_()
+
+            started = time.perf_counter()
+            md = MarkdownConverter(tokens, os.devnull)
+            doc = md.convert_to_doc()
+            built = time.perf_counter() - started
+            conv = Converter(doc, md.ctx, os.path.join(tmp, 'out.docx'), style_conf, table_align=md.table_align)
+            conv.start()
+            total = time.perf_counter() - started
+
+            ref = ''
+            if rows <= args.reference_rows:
+                started = time.perf_counter()
+                ref_doc = reference(tokens)
+                ref = f"{rows / (time.perf_counter() - started):21.0f}"
+                if texts(ref_doc) != texts(doc):
+                    print(f"  {rows}: текст ячеек отличается от построчной сборки")
+                    failed = True
+
+            table = doc.tables[0]
+            got = [table.rows[1].cells[k].paragraphs[0].alignment for k in range(len(EXPECTED))]
+            if got != EXPECTED or len(table.rows) != rows + 1:
+                print(f"  {rows}: строк {len(table.rows) - 1}, выравнивание {got}, ожидалось {EXPECTED}")
+                failed = True
+            print(f"{rows:7} {rows / built:16.0f} {rows / total:15.0f} {ref}")
+
+    if failed:
+        sys.exit(1)
+    print("текст ячеек и выравнивание столбцов совпадают с ожидаемыми")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# Детерминированный генератор синтетических отчетов для замеров: .docx и .txt (Markdown) одинаковой
+# структуры - заголовки, обычный текст, списки, таблицы N x M с подписями, рисунки, формулы и код.
+# При одинаковых параметрах и seed содержимое документа одно и то же.
+#
+#   python benchmarks/generate.py отчет.docx --paragraphs 5000 --rows 20 --cols 5
+#   python benchmarks/generate.py отчет.txt --paragraphs 5000
+
+import argparse
+import io
+import random
+import struct
+import zlib
+
+from docx import Document
+from docx.shared import Cm
+
+WORDS = ("метод анализ система данные результат модель расчет значение параметр процесс исследование "
+         "структура показатель оценка условие работа задача решение алгоритм требование").split()
+
+# доли блоков в отчете; остальное - обычные абзацы
+BLOCKS = [('heading1', 1), ('heading2', 3), ('bullet', 4), ('numbered', 4), ('table', 2), ('image', 2),
+          ('formula', 2), ('code', 2), ('empty', 3), ('normal', 40)]
+
+
+def _png(width=64, height=48) -> bytes:
+    raw = b''.join(b'\x00' + bytes((x * 4 + y) % 256 for x in range(width)) for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def _sentence(rnd, n):
+    words = [rnd.choice(WORDS) for _ in range(n)]
+    return ' '.join(words).capitalize() + '.'
+
+
+# последовательность блоков отчета: (вид, данные); общая для .docx и .txt
+def blocks(paragraphs, rows, cols, seed=0):
+    rnd = random.Random(seed)
+    kinds, weights = zip(*BLOCKS)
+    chapter = 0
+
+    for i in range(paragraphs):
+        kind = rnd.choices(kinds, weights)[0]
+        if kind == 'heading1':
+            chapter += 1
+            yield kind, f"{chapter}. {_sentence(rnd, 3)[:-1]}"
+        elif kind == 'heading2':
+            yield kind, f"{chapter}.{rnd.randint(1, 9)}. {_sentence(rnd, 4)[:-1]}"
+        elif kind in ('bullet', 'numbered'):
+            yield kind, [_sentence(rnd, rnd.randint(3, 8)) for _ in range(rnd.randint(2, 5))]
+        elif kind == 'table':
+            header = [f"Столбец {k + 1}" for k in range(cols)]
+            body = [[f"{rnd.randint(1, 999)},{rnd.randint(0, 9)}" if k % 2 else rnd.choice(WORDS)
+                     for k in range(cols)] for _ in range(rows)]
+            yield kind, (f"Таблица {i} - {_sentence(rnd, 3)[:-1]}", header, body)
+        elif kind == 'image':
+            yield kind, f"Рисунок {i} - {_sentence(rnd, 3)[:-1]}"
+        elif kind == 'formula':
+            yield kind, f"y = sin(alpha) + {rnd.randint(1, 9)}/{rnd.randint(2, 9)} + x_{{i}}"
+        elif kind == 'code':
+            yield kind, [f"def f{i}(x):", f"    return x * {rnd.randint(2, 9)}"]
+        elif kind == 'empty':
+            yield kind, ''
+        else:
+            yield kind, ' '.join(_sentence(rnd, rnd.randint(6, 14)) for _ in range(rnd.randint(1, 4)))
+
+
+def make_docx(path, paragraphs=2000, rows=10, cols=4, seed=0):
+    doc = Document()
+    image = _png()
+
+    for kind, data in blocks(paragraphs, rows, cols, seed):
+        if kind == 'heading1':
+            doc.add_heading(data, 1)
+        elif kind == 'heading2':
+            doc.add_heading(data, 2)
+        elif kind == 'bullet':
+            for item in data:
+                doc.add_paragraph(f"• {item}")
+        elif kind == 'numbered':
+            for k, item in enumerate(data, 1):
+                doc.add_paragraph(f"{k}) {item}")
+        elif kind == 'table':
+            caption, header, body = data
+            doc.add_paragraph(caption)
+            tb = doc.add_table(rows=len(body) + 1, cols=len(header))
+            for r, values in enumerate([header] + body):
+                for k, text in enumerate(values):
+                    tb.cell(r, k).text = text
+        elif kind == 'image':
+            doc.add_picture(io.BytesIO(image), width=Cm(5))
+            doc.add_paragraph(data)
+        elif kind == 'code':
+            for line in data:
+                doc.add_paragraph(line)
+        else:
+            doc.add_paragraph(data)
+    doc.save(path)
+
+
+def make_markdown(path, paragraphs=2000, rows=10, cols=4, seed=0):
+    with open(path, 'w', encoding='utf-8') as f:
+        for kind, data in blocks(paragraphs, rows, cols, seed):
+            if kind == 'heading1':
+                f.write(f"# {data}\n")
+            elif kind == 'heading2':
+                f.write(f"## {data}\n")
+            elif kind == 'bullet':
+                f.writelines(f"- {item}\n" for item in data)
+            elif kind == 'numbered':
+                f.writelines(f"{k}. {item}\n" for k, item in enumerate(data, 1))
+            elif kind == 'table':
+                caption, header, body = data
+                f.write(f"{caption}\n| {' | '.join(header)} |\n|{'---|' * len(header)}\n")
+                f.writelines(f"| {' | '.join(values)} |\n" for values in body)
+                f.write("\n")
+            elif kind == 'image':
+                # в Markdown-входе картинок нет: остается подпись
+                f.write(f"{data}\n")
+            elif kind == 'code':
+                f.write("```python\n" + '\n'.join(data) + "\n```\n")
+            else:
+                f.write(f"{data}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генератор синтетических отчетов")
+    parser.add_argument('output', help="выходной файл (.docx или .txt)")
+    parser.add_argument('--paragraphs', type=int, default=2000, help="число блоков отчета")
+    parser.add_argument('--rows', type=int, default=10, help="строк данных в таблице")
+    parser.add_argument('--cols', type=int, default=4, help="столбцов в таблице")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    make = make_markdown if args.output.endswith('.txt') else make_docx
+    make(args.output, args.paragraphs, args.rows, args.cols, args.seed)
+
+
+if __name__ == '__main__':
+    main()
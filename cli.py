@@ -1,12 +1,21 @@
+# python-docx, lxml и модули обработки импортируются только там, где нужны: справка, ошибки
+# аргументов и неподдерживаемый файл не платят за их загрузку (см. benchmarks/bench_startup.py)
 import sys
 import os
-import argparse
-from utils.parsers import DocParser, MdParser
-from utils.converters import Converter, MarkdownConverter
-from docx import Document
 
 
-def process_file(input_file, output_file=None, force=False):
+def process_file(input_file, output_file=None, force=False, stream=False, cache=True, cache_dir=None,
+                 profile=None, profile_format='json', jobs=None, styles=None, compression=None,
+                 images=None):
+    from style_configs.style_config import StyleManager
+    from utils.cache import ParCache, default_cache_dir
+    from utils.images import image_summary
+    from utils.parsers import DocParser
+    from utils.pipeline import load_converter
+    from utils.profiling import profiler
+    from utils.streaming import StreamConverter
+
+    par_cache = None
     try:
         if not output_file:
             output_file = "output.docx"
@@ -15,17 +24,31 @@ def process_file(input_file, output_file=None, force=False):
             print(f"файл {output_file} уже существует. используйте -f для перезаписи.")
             return False
 
-        if input_file.endswith(".txt"):
-            with open(input_file, encoding="utf-8") as text:
-                data = MdParser(text.read()).parse_()
-                d = MarkdownConverter(data, output_file).convert_to_doc()
-                p1 = DocParser(d)
-                Converter(d, p1.parse(), output_file).start()
+        # с --no-cache и скомпилированные стили не сохраняются на диск
+        style_conf = StyleManager(styles, (cache_dir or default_cache_dir()) if cache else None)
+        if profile:
+            profiler.start(DocParser, trace=profile_format == 'trace')
+
+        if stream and not input_file.endswith(".txt"):
+            if images is not None:
+                print("потоковая обработка рисунки не оптимизирует")
+            with profiler.stage('stream'):
+                StreamConverter(input_file, output_file, style_conf, compression).start()
+            profiler.output_size(output_file)
         else:
-            doc = Document(input_file)
-            p1 = DocParser(doc)
-            Converter(doc, p1.parse(), output_file).start()
+            if cache and not input_file.endswith(".txt"):
+                par_cache = ParCache(cache_dir)
+            conv = load_converter(input_file, output_file, style_conf, par_cache, jobs, compression, images)
+            conv.start()
+            if conv.image_report is not None:
+                print(image_summary(conv.image_report))
+
+        if profile:
+            profiler.save(profile, profile_format)
+            print(f"профиль: {profile}")
 
+        if par_cache is not None:
+            print(f"кэш: {par_cache.hits} из {par_cache.hits + par_cache.misses} абзацев без повторного разбора")
         print(f"готово: {output_file}")
         return True
 
@@ -33,6 +56,19 @@ def process_file(input_file, output_file=None, force=False):
         print(f"ошибка: {e}")
         return False
 
+    finally:
+        if par_cache is not None:
+            par_cache.close()
+        profiler.stop()
+
+
+# каталог кэша для стилей пакетного режима, сервера и проверки; None - с --no-cache
+def cache_location(args):
+    if args.no_cache:
+        return None
+    from utils.cache import default_cache_dir
+    return args.cache_dir or default_cache_dir()
+
 
 def main():
     if len(sys.argv) == 2 and os.path.isfile(sys.argv[1]):
@@ -49,6 +85,7 @@ def main():
             input("нажмите Enter для выхода...")
         return
 
+    import argparse
     pr = argparse.ArgumentParser(
         description='GOST Report Helper - форматирование документов по ГОСТу',
         add_help=False
@@ -66,6 +103,149 @@ def main():
         default=None
     )
 
+    pr.add_argument(
+        '-f', '--force',
+        action='store_true',
+        help='перезаписать выходной файл, если он существует'
+    )
+
+    pr.add_argument(
+        '-s', '--stream',
+        action='store_true',
+        help='потоковая обработка .docx с ограниченным расходом памяти'
+    )
+
+    pr.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='следить за входным файлом и форматировать его после каждого сохранения'
+    )
+
+    pr.add_argument(
+        '--check',
+        action='store_true',
+        help='только проверить оформление .docx (отчет JSON, код выхода 1 при нарушениях), без сохранения'
+    )
+
+    pr.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='не использовать кэш результатов предыдущих запусков'
+    )
+
+    pr.add_argument(
+        '--cache-dir',
+        default=None,
+        help='каталог кэша (по умолчанию: каталог кэша пользователя)'
+    )
+
+    pr.add_argument(
+        '--styles',
+        metavar='ПРОФИЛЬ',
+        default=None,
+        help='профиль стилей (.toml или .json) вместо встроенных настроек ГОСТ'
+    )
+
+    pr.add_argument(
+        '--compression',
+        type=int,
+        choices=range(10),
+        default=None,
+        metavar='0-9',
+        help='уровень сжатия измененных частей .docx: 0 - без сжатия, 9 - наибольшее (по умолчанию: 6)'
+    )
+
+    pr.add_argument(
+        '--image-dpi',
+        type=int,
+        nargs='?',
+        const=300,
+        default=None,
+        metavar='DPI',
+        help='уменьшить рисунки шире текста до заданного разрешения и свести одинаковые (по умолчанию: 300)'
+    )
+
+    pr.add_argument(
+        '--image-quality',
+        type=int,
+        default=85,
+        metavar='1-95',
+        help='качество JPEG для уменьшенных рисунков (по умолчанию: 85)'
+    )
+
+    pr.add_argument(
+        '--profile',
+        metavar='ФАЙЛ',
+        default=None,
+        help='записать профиль запуска (время этапов, детекторы, элементы XML) в файл'
+    )
+
+    pr.add_argument(
+        '--profile-format',
+        choices=['json', 'trace'],
+        default='json',
+        help='формат профиля: json - отчет, trace - события Chrome для флеймграфа'
+    )
+
+    pr.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='подробный вывод: тип и текст каждого оформляемого абзаца'
+    )
+
+    pr.add_argument(
+        '-b', '--batch',
+        nargs='+',
+        metavar='ПУТЬ',
+        help='пакетная обработка: каталоги и/или маски файлов'
+    )
+
+    pr.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='число процессов для пакетной обработки и сервера (по умолчанию: число ядер), для разбора '
+             'и форматирования больших документов (по умолчанию: без пула)'
+    )
+
+    pr.add_argument(
+        '--out-dir',
+        default='output',
+        help='каталог для результатов пакетной обработки (по умолчанию: output)'
+    )
+
+    pr.add_argument(
+        '--serve',
+        nargs='?',
+        const='127.0.0.1:8000',
+        metavar='АДРЕС',
+        help='сервер форматирования: хост:порт или unix:путь (по умолчанию: 127.0.0.1:8000)'
+    )
+
+    pr.add_argument(
+        '--max-size',
+        type=float,
+        default=50,
+        metavar='МБ',
+        help='сервер: наибольший размер принимаемого файла (по умолчанию: 50)'
+    )
+
+    pr.add_argument(
+        '--timeout',
+        type=float,
+        default=120,
+        metavar='С',
+        help='сервер: время на обработку одного запроса (по умолчанию: 120)'
+    )
+
+    pr.add_argument(
+        '--queue',
+        type=int,
+        default=None,
+        metavar='N',
+        help='сервер: сколько запросов ждут свободного процесса (по умолчанию: два на процесс)'
+    )
+
     pr.add_argument(
         '-h', '--help',
         action='store_true',
@@ -73,6 +253,45 @@ def main():
     )
 
     args = pr.parse_args()
+    # без настройки предупреждения и ошибки и так выводятся в stderr одним текстом сообщения
+    if args.verbose:
+        import logging
+        logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+
+    images = None
+    if args.image_dpi is not None:
+        if args.image_dpi <= 0 or not 1 <= args.image_quality <= 95:
+            print("ошибка: DPI должно быть больше 0, качество - от 1 до 95")
+            sys.exit(1)
+        from utils.images import ImageOptions
+        images = ImageOptions(args.image_dpi, args.image_quality)
+
+    if args.serve:
+        from utils.server import serve
+        try:
+            serve(args.serve, args.jobs, args.styles, int(args.max_size * 2**20), args.timeout, args.queue,
+                  args.compression, images, cache_location(args))
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"ошибка: {e}")
+            sys.exit(1)
+        return
+
+    if args.check:
+        from utils.check import run_check
+        if args.batch:
+            from utils.batch import collect_files
+            files = [f for f in collect_files(args.batch) if f.lower().endswith('.docx')]
+        else:
+            files = [args.input_file] if args.input_file else []
+        if not files:
+            print("ошибка: не указаны файлы .docx для проверки")
+            sys.exit(2)
+        sys.exit(run_check(files, args.styles, cache_location(args)))
+
+    if args.batch:
+        from utils.batch import run_batch
+        sys.exit(run_batch(args.batch, args.out_dir, args.jobs, args.force, args.styles,
+                           args.compression, images, cache_location(args)))
 
     if args.help or not args.input_file:
         print("GOST report helper - форматирование документов по ГОСТу\n")
@@ -82,8 +301,32 @@ def main():
         print("GOSTFormatter.exe файл.docx")
         print("GOSTFormatter.exe файл.txt -o результат.docx")
         print("GOSTFormatter.exe файл.docx -f")
+        print("GOSTFormatter.exe отчет.docx -w -o отчет_гост.docx")
+        print("GOSTFormatter.exe отчет.docx -f --profile профиль.json")
+        print("GOSTFormatter.exe отчет.docx --check")
+        print("GOSTFormatter.exe -b отчеты/ \"архив/*.txt\" -j 8 --out-dir готовые")
+        print("GOSTFormatter.exe --serve 127.0.0.1:8000 -j 4")
         print("\nОпции:")
         print("-o, --output ФАЙЛ   Выходной файл")
+        print("-f, --force         Перезаписать выходной файл")
+        print("-s, --stream        Потоковая обработка больших .docx (мало памяти)")
+        print("-w, --watch         Форматировать заново после каждого сохранения файла")
+        print("--check             Только проверить оформление .docx (JSON, код 1 при нарушениях)")
+        print("--no-cache          Не использовать кэш предыдущих запусков")
+        print("--cache-dir КАТАЛОГ Где хранить кэш")
+        print("--styles ПРОФИЛЬ    Профиль стилей .toml/.json (см. style_configs/gost.toml)")
+        print("--compression 0-9   Уровень сжатия измененных частей .docx (по умолчанию 6)")
+        print("--image-dpi [DPI]   Уменьшить большие рисунки до DPI (по умолчанию 300), убрать дубли")
+        print("--image-quality Q   Качество JPEG уменьшенных рисунков (по умолчанию 85)")
+        print("--profile ФАЙЛ      Записать профиль запуска (--profile-format json|trace)")
+        print("-v, --verbose       Подробный вывод")
+        print("-b, --batch ПУТЬ... Пакетная обработка каталогов и масок файлов")
+        print("-j, --jobs N        Число процессов (пакетная обработка; большие документы - только с ключом)")
+        print("--out-dir КАТАЛОГ   Куда сохранять результаты пакетной обработки")
+        print("--serve [АДРЕС]     Сервер форматирования (POST /format, GET /metrics)")
+        print("--max-size МБ       Сервер: наибольший размер файла")
+        print("--timeout С         Сервер: время на обработку одного запроса")
+        print("--queue N           Сервер: длина очереди запросов")
         print("-h, --help          Показать эту справку")
         input("Нажмите Enter для выхода... ")
         return
@@ -96,6 +339,26 @@ def main():
         print("неподдерживаемый файл")
         return
 
-    process_file(args.input_file, args.output, args.force)
+    if args.watch:
+        output_file = args.output or "output.docx"
+        if os.path.exists(output_file) and not args.force:
+            print(f"файл {output_file} уже существует. используйте -f для перезаписи.")
+            return
+        from utils.watch import watch_file
+        try:
+            watch_file(args.input_file, output_file, args.stream, not args.no_cache, args.cache_dir, args.styles,
+                       args.compression, images)
+        except (OSError, ValueError) as e:
+            print(f"ошибка: {e}")
+        return
+
+    process_file(args.input_file, args.output, args.force, args.stream, not args.no_cache, args.cache_dir,
+                 args.profile, args.profile_format, args.jobs, args.styles, args.compression, images)
 
-main()
\ No newline at end of file
+# защита нужна дочерним процессам пакетного режима (spawn на Windows и в собранном .exe)
+if __name__ == '__main__':
+    # нужна только собранному .exe; в обычном запуске multiprocessing не импортируется зря
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+# Профили стилей: TOML или JSON поверх встроенных настроек StyleManager.
+#
+# В профиле перечисляются только отличия. Размеры шрифта и интервалы до/после абзаца задаются
+# в пунктах, отступы и высота строки таблицы - в сантиметрах, толщина границ таблицы - в восьмых
+# долях пункта (как w:sz), выравнивание - словом
+# (left, center, right, justify). Пример со всеми встроенными значениями - style_configs/gost.toml.
+
+import json
+from dataclasses import replace
+
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.shared import Pt, Cm
+
+ALIGNMENTS = {
+    'left': WD_PARAGRAPH_ALIGNMENT.LEFT,
+    'center': WD_PARAGRAPH_ALIGNMENT.CENTER,
+    'right': WD_PARAGRAPH_ALIGNMENT.RIGHT,
+    'justify': WD_PARAGRAPH_ALIGNMENT.JUSTIFY,
+}
+
+# поле -> (допустимые типы значения в профиле, перевод в значение StyleConf)
+_STYLE_FIELDS = {
+    'font_name': (str, str),
+    'font_size': ((int, float), Pt),
+    'font_bold': (bool, bool),
+    'font_italic': (bool, bool),
+    'font_all_caps': (bool, bool),
+    'alignment': (str, ALIGNMENTS.get),
+    'line_spacing': ((int, float), float),
+    'space_before': ((int, float), Pt),
+    'space_after': ((int, float), Pt),
+    'page_break_before': (bool, bool),
+    'first_line_indent': ((int, float), Cm),
+    'left_indent': ((int, float), Cm),
+    'hanging_indent': ((int, float), Cm),
+}
+# из настроек таблиц при оформлении используются только эти
+_TABLE_FIELDS = {
+    'border_size': (int, int),
+    'row_height': ((int, float), Cm),
+}
+
+
+def read_profile(path: str) -> dict:
+    if path.lower().endswith('.toml'):
+        # tomllib импортируется только при запуске с профилем
+        import tomllib
+        with open(path, 'rb') as f:
+            try:
+                return tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError(f"профиль стилей {path}: {e}") from None
+    with open(path, encoding='utf-8') as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"профиль стилей {path}: {e}") from None
+
+
+def _convert(where, key, value, spec):
+    if spec is None:
+        raise ValueError(f"{where}: неизвестный параметр {key}")
+    types, convert = spec
+    types = types if isinstance(types, tuple) else (types,)
+    # bool - подкласс int, но размер true/false - явная ошибка в профиле
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        raise ValueError(f"{where}: неверное значение {key} = {value!r}")
+    result = convert(value)
+    if result is None:
+        raise ValueError(f"{where}: {key} должно быть одним из: {', '.join(ALIGNMENTS)}")
+    return result
+
+
+def _section(data, name) -> dict:
+    section = data.get(name, {})
+    if not isinstance(section, dict):
+        raise ValueError(f"профиль стилей: раздел [{name}] должен быть таблицей")
+    return section
+
+
+# настройки StyleManager (стили и таблицы) с изменениями из профиля
+def apply_profile(data: dict, styles: dict, tables: dict, conf_cls):
+    unknown = set(data) - {'styles', 'tables'}
+    if unknown:
+        raise ValueError(f"профиль стилей: неизвестные разделы {', '.join(sorted(unknown))}")
+
+    styles = dict(styles)
+    for name, values in _section(data, 'styles').items():
+        if not isinstance(values, dict):
+            raise ValueError(f"стиль {name}: ожидается таблица параметров")
+        changes = {key: _convert(f"стиль {name}", key, value, _STYLE_FIELDS.get(key)) for key, value in values.items()}
+        # новый стиль строится от значений StyleConf по умолчанию
+        styles[name] = replace(styles.get(name) or conf_cls(), **changes)
+
+    tables = {**tables, **{key: _convert("таблицы", key, value, _TABLE_FIELDS.get(key))
+                           for key, value in _section(data, 'tables').items()}}
+    return styles, tables
@@ -1,9 +1,58 @@
 from docx.shared import Pt, Cm
 from docx.document import Document
 from docx import Document as Doc
+import docx
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from dataclasses import dataclass
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.styles.styles import Styles
+from copy import deepcopy
+from dataclasses import astuple, dataclass
+from functools import lru_cache
+from lxml import etree
 from typing import Any
+import hashlib
+import json
+import os
+import tempfile
+
+from style_configs.profiles import apply_profile, read_profile
+
+_STYLE, _STYLE_ID, _NAME, _VAL = qn('w:style'), qn('w:styleId'), qn('w:name'), qn('w:val')
+
+# скомпилированные стили по хэшу настроек: один разбор XML на процесс
+_TEMPLATES = {}
+
+# styles.xml нового документа: умолчания шрифта и базовые стили Word, как в шаблоне python-docx (без
+# latentStyles). На нем строятся стили ГОСТ; его же получает .docx без styles.xml (utils.streaming)
+DEFAULT_STYLES_XML = (
+    f'<w:styles {nsdecls("w")}>'
+    '<w:docDefaults><w:rPrDefault><w:rPr>'
+    '<w:rFonts w:asciiTheme="minorHAnsi" w:eastAsiaTheme="minorEastAsia" w:hAnsiTheme="minorHAnsi" '
+    'w:cstheme="minorBidi"/><w:sz w:val="24"/><w:szCs w:val="24"/>'
+    '<w:lang w:val="en-US" w:eastAsia="en-US" w:bidi="ar-SA"/>'
+    '</w:rPr></w:rPrDefault><w:pPrDefault/></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    '<w:style w:type="character" w:default="1" w:styleId="DefaultParagraphFont">'
+    '<w:name w:val="Default Paragraph Font"/><w:uiPriority w:val="1"/><w:semiHidden/><w:unhideWhenUsed/>'
+    '</w:style>'
+    '<w:style w:type="table" w:default="1" w:styleId="TableNormal">'
+    '<w:name w:val="Normal Table"/><w:uiPriority w:val="99"/><w:semiHidden/><w:unhideWhenUsed/>'
+    '<w:tblPr><w:tblInd w:w="0" w:type="dxa"/><w:tblCellMar><w:top w:w="0" w:type="dxa"/>'
+    '<w:left w:w="108" w:type="dxa"/><w:bottom w:w="0" w:type="dxa"/><w:right w:w="108" w:type="dxa"/>'
+    '</w:tblCellMar></w:tblPr></w:style>'
+    '<w:style w:type="numbering" w:default="1" w:styleId="NoList">'
+    '<w:name w:val="No List"/><w:uiPriority w:val="99"/><w:semiHidden/><w:unhideWhenUsed/></w:style>'
+    '</w:styles>'
+)
+
+
+# хэш кода, от которого зависит XML стилей: этот модуль и версия python-docx
+@lru_cache
+def _source_digest() -> bytes:
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.blake2b(f.read() + docx.__version__.encode(), digest_size=16).digest()
 
 class StyleNames:
     h1 = "ГОСТ_заголовок1"
@@ -36,10 +85,19 @@ class StyleConf:
     hanging_indent: Any = Cm(0)
 
 class StyleManager:
-    def __init__(self):
+    # profile - путь к профилю стилей (TOML или JSON, см. style_configs/profiles.py), cache_dir - каталог
+    # кэша, где хранятся скомпилированные стили (None - стили компилируются заново в каждом процессе)
+    def __init__(self, profile: str = None, cache_dir: str = None):
         self.styles = self.conf_styles()
         self.tb_conf = self.conf_tables()
         self.page_conf = self.conf_page()
+        if profile:
+            self.styles, self.tb_conf = apply_profile(read_profile(profile), self.styles, self.tb_conf, StyleConf)
+
+        self.cache_dir = cache_dir
+        self.key = hashlib.blake2b(_source_digest() + json.dumps(
+            [[name, *astuple(conf)] for name, conf in self.styles.items()], default=str).encode(),
+            digest_size=16).hexdigest()
 
     @staticmethod
     def conf_styles():
@@ -117,16 +175,81 @@ class StyleManager:
         }
 
     def setup_styles(self, doc: Document):
-        for style_name, config in self.styles.items():
-            self.apply_style(style_name, config, doc)
+        self.apply_styles(doc.styles)
+
+    # то же для коллекции стилей без документа (например, styles.xml, прочитанный отдельно).
+    # Стили ГОСТ вставляются готовыми w:style за один проход; уже существующие (повторный запуск
+    # на оформленном файле) заменяются с сохранением своего styleId, поэтому повтор ничего не меняет
+    def apply_styles(self, styles: Styles):
+        root = styles.element
+        by_name, by_id = {}, {}
+        for style in root.iterchildren(_STYLE):
+            name = style.find(_NAME)
+            if name is not None:
+                by_name.setdefault(name.get(_VAL), style)
+            by_id.setdefault(style.get(_STYLE_ID), style)
+
+        for name, compiled in self.template():
+            style = deepcopy(compiled)
+            old = by_name.get(name)
+            if old is None:
+                old = by_id.get(style.get(_STYLE_ID))
+            if old is None:
+                root.append(style)
+            else:
+                style.set(_STYLE_ID, old.get(_STYLE_ID))
+                root.replace(old, style)
 
-    def apply_style(self, name: str, conf: StyleConf, doc: Document):
+    # [(имя, w:style)] для всех стилей; XML хранится в каталоге кэша под хэшем настроек
+    def template(self) -> list:
+        if self.key not in _TEMPLATES:
+            path = os.path.join(self.cache_dir, 'styles', f'{self.key}.xml') if self.cache_dir else None
+            xml = None
+            if path is not None:
+                try:
+                    with open(path, 'rb') as f:
+                        xml = f.read()
+                except OSError:
+                    pass
+            if xml is None:
+                xml = self.compile_styles()
+                if path is not None:
+                    self.store_template(path, xml)
+            _TEMPLATES[self.key] = [(style.find(_NAME).get(_VAL), style) for style in parse_xml(xml)]
+        return _TEMPLATES[self.key]
+
+    # запись через свой временный файл: процессы пакетного режима и сервера пишут один и тот же путь
+    # одновременно, и os.replace ставит только дописанный файл
+    @staticmethod
+    def store_template(path, xml: bytes):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+        except OSError:
+            return
         try:
-            style = doc.styles.add_style(name, 1)
-        except ValueError:
-            style = doc.styles["name"]
+            with os.fdopen(fd, 'wb') as f:
+                f.write(xml)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
 
-        self.conf_style(style, conf)
+    # стили строятся через python-docx на пустом styles.xml, как раньше строились прямо в документе
+    def compile_styles(self) -> bytes:
+        styles = Styles(parse_xml(DEFAULT_STYLES_XML))
+        compiled = parse_xml(f'<w:styles {nsdecls("w")}/>')
+        for name, conf in self.styles.items():
+            try:
+                style = styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+            except ValueError:
+                # профиль может менять и встроенные стили (Normal, Heading 1, ...)
+                style = styles[name]
+            self.conf_style(style, conf)
+            compiled.append(style.element)
+        return etree.tostring(compiled, encoding='UTF-8')
 
     @staticmethod
     def conf_style(style, config: StyleConf) -> None:
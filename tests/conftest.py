@@ -0,0 +1,42 @@
+# Общие данные тестов: небольшие синтетические отчеты (benchmarks/generate.py) и настройки стилей ГОСТ.
+#
+#   python -m pytest
+
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import make_docx, make_markdown
+from style_configs.style_config import StyleManager
+
+
+@pytest.fixture(scope='session')
+def style_conf():
+    return StyleManager()
+
+
+@pytest.fixture(scope='session')
+def report_docx(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('report') / 'report.docx')
+    make_docx(path, 600, rows=5, cols=3)
+    return path
+
+
+@pytest.fixture(scope='session')
+def report_txt(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('report') / 'report.txt')
+    make_markdown(path, 400, rows=5, cols=3)
+    return path
+
+
+# части пакета .docx (путь, байты или файловый объект): {имя: содержимое}
+def zip_parts(source) -> dict:
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with zipfile.ZipFile(source) as z:
+        return {name: z.read(name) for name in z.namelist()}
@@ -0,0 +1,61 @@
+# Генератор синтетических отчетов и поэтапный замер конвейера (benchmarks/generate.py,
+# benchmarks/bench_pipeline.py).
+
+import os
+
+from docx import Document
+
+from benchmarks.bench_pipeline import compare, docx_stages, measure, txt_stages
+from benchmarks.generate import make_docx, make_markdown
+from conftest import zip_parts
+
+
+def test_generator_is_deterministic(tmp_path):
+    paths = [str(tmp_path / name) for name in ('a.docx', 'b.docx', 'c.docx')]
+    for path, seed in zip(paths, (1, 1, 2)):
+        make_docx(path, 200, seed=seed)
+    first, second, other = (zip_parts(p)['word/document.xml'] for p in paths)
+    assert first == second
+    assert first != other
+
+    texts = []
+    for name in ('a.txt', 'b.txt'):
+        make_markdown(str(tmp_path / name), 200, seed=1)
+        texts.append((tmp_path / name).read_bytes())
+    assert texts[0] == texts[1]
+
+
+# .docx и .txt строятся из одной последовательности блоков
+def test_docx_and_markdown_share_structure(tmp_path):
+    docx, txt = str(tmp_path / 'r.docx'), str(tmp_path / 'r.txt')
+    make_docx(docx, 300, rows=3, cols=2)
+    make_markdown(txt, 300, rows=3, cols=2)
+    doc = Document(docx)
+    lines = (tmp_path / 'r.txt').read_text(encoding='utf-8').splitlines()
+    assert sum(p.style.name == 'Heading 1' for p in doc.paragraphs) == sum(line.startswith('# ') for line in lines)
+    assert len(doc.tables) == sum(set(line) <= set('|-') and line.startswith('|-') for line in lines)
+    assert all(len(t.rows) == 4 and len(t.columns) == 2 for t in doc.tables)
+
+
+def test_measure_reports_every_stage(tmp_path):
+    docx, txt = str(tmp_path / 'r.docx'), str(tmp_path / 'r.txt')
+    make_docx(docx, 100)
+    make_markdown(txt, 100)
+    for make_stages, path in ((docx_stages, docx), (txt_stages, txt)):
+        out = str(tmp_path / 'out.docx')
+        results = measure(make_stages, path, out, 1)
+        assert list(results) == [name for name, _ in make_stages(path, out)]
+        assert all(r['time'] >= 0 and r['peak_kb'] >= 0 for r in results.values())
+        assert os.path.getsize(out)
+
+
+def test_compare_flags_regressions_above_noise():
+    baseline = {'docx': {'parse': {'time': 1.0, 'peak_kb': 10000}, 'save': {'time': 0.01, 'peak_kb': 100}}}
+    results = {'docx': {'parse': {'time': 1.5, 'peak_kb': 10000}, 'save': {'time': 0.02, 'peak_kb': 900},
+                        'new': {'time': 1.0, 'peak_kb': 1}}}
+    # save вдвое медленнее, но на 10 мс и 800 КБ - шум
+    assert compare(results, baseline, 0.15) == ['docx/parse']
+    results['docx']['parse']['time'] = 1.1
+    results['docx']['parse']['peak_kb'] = 20000
+    assert compare(results, baseline, 0.15) == ['docx/parse']
+    assert compare(baseline, baseline, 0.15) == []
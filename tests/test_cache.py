@@ -0,0 +1,122 @@
+# Кэш абзацев между запусками (utils.cache.ParCache): промах после смены версии кода или стилей
+# документа, вытеснение давно не нужных строк, пересоздание базы старой структуры.
+
+import os
+import sqlite3
+
+from docx import Document
+
+from utils import cache as cache_module
+from utils.cache import SCHEMA_VERSION, ParCache
+
+
+def paragraphs(count):
+    doc = Document()
+    for i in range(count):
+        doc.add_paragraph(f"Абзац номер {i} с текстом.")
+    return doc, [p._p for p in doc.paragraphs]
+
+
+# классификация и XML всех абзацев записываются в кэш; возвращает их ключи
+def fill(cache_dir, elements, style_key=b'styles', **options) -> list:
+    cache = ParCache(cache_dir, **options)
+    keys = cache.prepare(elements)
+    for key, p in zip(keys, elements):
+        cache.store_classification(key, 'normal', 0, 0)
+        cache.store_formatted(key, style_key, p)
+    cache.close()
+    return keys
+
+
+def test_hit_after_close(tmp_path):
+    _, elements = paragraphs(5)
+    keys = fill(str(tmp_path), elements)
+    cache = ParCache(str(tmp_path))
+    assert cache.prepare(elements) == keys
+    assert [cache.classification(k) for k in keys] == [('normal', 0, 0)] * 5
+    assert cache.hits == 5 and cache.misses == 0
+    assert cache.formatted(keys[0], b'styles').xpath('string(.)') == "Абзац номер 0 с текстом."
+    cache.close()
+
+
+# другая версия кода - другая соль ключей: прежние строки не находятся
+def test_code_version_invalidates(tmp_path, monkeypatch):
+    _, elements = paragraphs(3)
+    keys = fill(str(tmp_path), elements)
+    monkeypatch.setattr(cache_module, 'CACHE_VERSION', cache_module.CACHE_VERSION + 1)
+    cache = ParCache(str(tmp_path))
+    fresh = cache.prepare(elements)
+    assert not set(fresh) & set(keys)
+    assert [cache.classification(k) for k in fresh] == [None] * 3
+    cache.close()
+
+
+# готовый XML годится только при тех же стилях документа
+def test_style_key_invalidates(tmp_path):
+    doc, elements = paragraphs(2)
+    style_key = ParCache.style_key(doc)
+    keys = fill(str(tmp_path), elements, style_key)
+
+    doc.styles.add_style('Новый стиль', 1)
+    changed = ParCache.style_key(doc)
+    assert changed != style_key
+
+    cache = ParCache(str(tmp_path))
+    cache.prepare(elements)
+    assert cache.formatted_xml(keys[0], changed) is None
+    assert cache.formatted_xml(keys[0], style_key) is not None
+    # тип абзаца от стилей не зависит
+    assert cache.classification(keys[0]) == ('normal', 0, 0)
+    cache.close()
+
+
+def rows(cache_dir) -> dict:
+    with sqlite3.connect(os.path.join(cache_dir, 'paragraphs.sqlite')) as conn:
+        return dict(conn.execute('SELECT key, size FROM pars'))
+
+
+# сверх лимита удаляются самые давно использованные строки, пока не останется 80% лимита
+def test_eviction(tmp_path):
+    cache_dir = str(tmp_path)
+    _, elements = paragraphs(40)
+    keys = []
+    for i in range(0, 40, 10):
+        cache = ParCache(cache_dir, max_size=10**9)
+        cache.now = 1000.0 + i
+        keys += cache.prepare(elements[i:i + 10])
+        for key, p in zip(keys[i:], elements[i:i + 10]):
+            cache.store_classification(key, 'normal', 0, 0)
+            cache.store_formatted(key, b'styles', p)
+        cache.close()
+
+    sizes = rows(cache_dir)
+    total = sum(sizes.values())
+    limit = total * 3 // 4
+    cache = ParCache(cache_dir, max_size=limit)
+    cache.now = 2000.0
+    cache.close()
+
+    left = rows(cache_dir)
+    assert sum(left.values()) <= limit * 4 // 5
+    # удаленные строки использовались не позже оставшихся (номер запуска - по 10 абзацев)
+    removed = [i // 10 for i, k in enumerate(keys) if k not in left]
+    kept = [i // 10 for i, k in enumerate(keys) if k in left]
+    assert removed and kept and max(removed) <= min(kept)
+    assert sum(left.values()) + max(sizes.values()) > limit * 4 // 5
+
+
+def test_old_schema_recreated(tmp_path):
+    path = os.path.join(str(tmp_path), 'paragraphs.sqlite')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE pars (key BLOB PRIMARY KEY, ptype TEXT)')
+        conn.execute("INSERT INTO pars VALUES (x'00', 'normal')")
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION - 1}')
+    conn.close()
+
+    _, elements = paragraphs(2)
+    fill(str(tmp_path), elements)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute('SELECT COUNT(*) FROM pars').fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM pars WHERE key = x'00'").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,126 @@
+# Проверка оформления (--check, utils.check): код выхода 0 - нарушений нет, 1 - есть, 2 - файл не прочитан;
+# JSON-отчет и правила на небольших документах.
+
+import json
+
+import pytest
+from docx import Document
+
+from style_configs.style_config import StyleNames
+from utils.check import check_document, run_check
+from utils.pipeline import load_converter
+
+TEXT = "Текст абзаца, который классифицируется как обычный абзац основного текста."
+
+
+def saved(doc, tmp_path, name='doc.docx') -> str:
+    path = str(tmp_path / name)
+    doc.save(path)
+    return path
+
+
+def formatted(source, tmp_path, style_conf) -> str:
+    out = str(tmp_path / 'formatted.docx')
+    load_converter(source, out, style_conf, jobs=1).start()
+    return out
+
+
+def rules(path, style_conf) -> set:
+    return {v['rule'] for v in check_document(path, style_conf)['violations']}
+
+
+def table(doc):
+    tbl = doc.add_table(rows=2, cols=2)
+    for row, texts in zip(tbl.rows, (("Образец", "Масса"), ("сталь", "12,5"))):
+        for cell, text in zip(row.cells, texts):
+            cell.text = text
+
+
+def test_exit_codes(report_docx, tmp_path, style_conf, capsys):
+    assert run_check([report_docx]) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert not report['ok'] and report['paragraphs'] > 0 and report['tables'] > 0 and report['figures'] > 0
+    assert set(report['counts']) == {v['rule'] for v in report['violations']}
+    assert {'style', 'list_marker', 'caption_format', 'empty_paragraph'} <= set(report['counts'])
+    assert sum(report['counts'].values()) == len(report['violations'])
+
+    # отформатированный отчет (подписи рисунков и таблиц есть у всех) замечаний не вызывает
+    assert run_check([formatted(report_docx, tmp_path, style_conf)]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['ok'] and report['counts'] == {} and report['violations'] == []
+
+    missing = str(tmp_path / 'нет.docx')
+    assert run_check([missing]) == 2
+    assert not json.loads(capsys.readouterr().out)['ok']
+    assert run_check([str(tmp_path)]) == 2
+    capsys.readouterr()
+
+    # несколько файлов - по строке JSON на файл, код - наибольший
+    text = tmp_path / 'отчет.txt'
+    text.write_text("текст", encoding='utf-8')
+    assert run_check([report_docx, str(text)]) == 2
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['file'] for line in lines] == [report_docx, str(text)]
+
+
+def test_style_and_empty_paragraph(tmp_path, style_conf):
+    doc = Document()
+    doc.add_paragraph(TEXT)
+    doc.add_paragraph()
+    doc.add_paragraph()
+    doc.add_paragraph(TEXT)
+    path = saved(doc, tmp_path)
+    report = check_document(path, style_conf)
+    assert report['counts']['style'] == 2
+    # форматирование удаляет оба пустых абзаца между абзацами текста
+    assert report['counts']['empty_paragraph'] == 2
+
+    clean = formatted(path, tmp_path, style_conf)
+    assert check_document(clean, style_conf)['ok']
+
+
+def test_list_marker(tmp_path, style_conf):
+    doc = Document()
+    doc.add_paragraph(TEXT)
+    for text in ("• первый пункт списка", "• второй пункт списка"):
+        doc.add_paragraph(text)
+    doc.add_paragraph(TEXT)
+    report = check_document(saved(doc, tmp_path), style_conf)
+    markers = [v for v in report['violations'] if v['rule'] == 'list_marker']
+    assert [v['type'] for v in markers] == ['list_bullet', 'list_bullet']
+
+    assert 'list_marker' not in rules(formatted(saved(doc, tmp_path), tmp_path, style_conf), style_conf)
+
+
+@pytest.mark.parametrize('caption, above, rule', [
+    ("Таблица 1. Свойства образцов", True, 'caption_format'),
+    ("Таблица 1 − Свойства образцов", False, 'caption_position'),
+    ("Таблица 2 − Свойства образцов", True, 'caption_number'),
+    (None, True, 'caption_missing'),
+])
+def test_table_captions(tmp_path, style_conf, caption, above, rule):
+    doc = Document()
+    doc.add_paragraph(TEXT)
+    if caption and above:
+        doc.add_paragraph(caption)
+    table(doc)
+    if caption and not above:
+        doc.add_paragraph(caption)
+    doc.add_paragraph(TEXT)
+    path = saved(doc, tmp_path)
+    assert [v['rule'] for v in check_document(path, style_conf)['violations'] if v['rule'].startswith('caption')] \
+        == [rule]
+
+    # форматирование ставит подпись над таблицей по форме; без названия остается заглушка "[]"
+    fixed = rules(formatted(path, tmp_path, style_conf), style_conf)
+    assert fixed == ({'caption_missing'} if caption is None else set())
+
+
+def test_gost_styles_accepted(tmp_path, style_conf):
+    doc = Document()
+    doc.add_paragraph(TEXT)
+    path = formatted(saved(doc, tmp_path), tmp_path, style_conf)
+    doc = Document(path)
+    assert doc.paragraphs[0].style.name == StyleNames.normal
+    doc.paragraphs[0].style = doc.styles['Normal']
+    assert rules(saved(doc, tmp_path, 'changed.docx'), style_conf) == {'style'}
@@ -0,0 +1,68 @@
+# Классификация абзацев на пуле процессов (DocParser.classify) совпадает с последовательной.
+
+import pytest
+from docx import Document
+
+from utils import parsers
+from utils.cache import ParCache
+from utils.parsers import DocParser, ParseResult
+
+
+def fields(c: ParseResult) -> dict:
+    return {**{name: getattr(c, name) for name in ParseResult.__slots__}, 'scores': c.scores}
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # порог снижается, а куски мельче, чтобы пул получил несколько задач и на небольшом отчете
+    monkeypatch.setattr(parsers, 'PARALLEL_MIN', 0)
+    monkeypatch.setattr(parsers, '_PAR_CHUNK', 64)
+    calls = []
+    classify_parallel = parsers._classify_parallel
+
+    def counting(elements, jobs, list_formats):
+        calls.append(jobs)
+        return classify_parallel(elements, jobs, list_formats)
+
+    monkeypatch.setattr(parsers, '_classify_parallel', counting)
+    return calls
+
+
+def assert_same(serial, result):
+    assert len(result) == len(serial)
+    for a, b in zip(serial, result):
+        assert fields(a) == fields(b), a.index
+
+
+@pytest.mark.parametrize('jobs', [2, 3])
+def test_parallel_matches_serial(report_docx, parallel, jobs):
+    doc = Document(report_docx)
+    serial = DocParser(doc, jobs=1).parse_with_sections()
+    assert not parallel
+    result = DocParser(doc, jobs=jobs).parse_with_sections()
+    assert parallel == [jobs]
+    assert {c.ptype for c in serial} >= {'heading', 'normal', 'list_bullet', 'list_number', 'tb_caption', 'image'}
+    assert_same(serial, result)
+
+
+# с кэшем на пул идут только абзацы, которых в нем нет; ключи и классы те же
+def test_parallel_with_cache_matches_serial(report_docx, parallel, tmp_path):
+    doc = Document(report_docx)
+    serial = DocParser(doc, jobs=1).parse()
+    cache = ParCache(str(tmp_path))
+    try:
+        cold = DocParser(doc, cache, jobs=2).parse()
+        warm = DocParser(doc, cache, jobs=2).parse()
+    finally:
+        cache.close()
+    assert parallel == [2]
+    for result in (cold, warm):
+        assert [(c.ptype, c.level, c.el, c.index, c.flags) for c in result] == \
+               [(c.ptype, c.level, c.el, c.index, c.flags) for c in serial]
+    assert [c.key for c in cold] == [c.key for c in warm]
+
+
+# без -j большие документы разбираются последовательно
+def test_serial_by_default(report_docx, parallel):
+    DocParser(Document(report_docx)).parse()
+    assert not parallel
@@ -0,0 +1,68 @@
+# Оптимизация рисунков (utils.images): картинки не шире текста при заданном DPI, рисунки не шире текста
+# на странице, дубли сведены, текст документа тот же, результат не зависит от числа потоков.
+
+import os
+
+import pytest
+
+pytest.importorskip('PIL')
+
+from benchmarks.bench_images import make, problems, text
+from conftest import zip_parts
+from utils.converters import Converter
+from utils.images import EMU_PER_INCH, ImageOptions, shrink_image
+from utils.pipeline import load_converter
+
+DPI = 72
+
+
+@pytest.fixture(scope='module')
+def photos(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('photos') / 'photos.docx')
+    # при 72 dpi ширина текста - 469 пикселей, картинки в 800 пикселей шире нее
+    make(path, 8, 800, 0)
+    return path
+
+
+def run(source, out, style_conf, images, jobs):
+    conv = load_converter(source, out, style_conf, jobs=jobs, images=images)
+    conv.start()
+    return conv.image_report
+
+
+def test_optimized_report(photos, tmp_path, style_conf):
+    plain, small = str(tmp_path / 'plain.docx'), str(tmp_path / 'small.docx')
+    run(photos, plain, style_conf, None, 1)
+    report = run(photos, small, style_conf, ImageOptions(DPI, 80), 1)
+
+    max_px = round(Converter.TEXT_WIDTH / EMU_PER_INCH * DPI)
+    assert problems(small, max_px) == []
+    assert problems(plain, max_px) != []
+    assert text(small) == text(plain)
+    assert report['duplicates'] > 0 and report['resized'] > 0
+    assert report['bytes_after'] < report['bytes_before']
+    assert os.path.getsize(small) < os.path.getsize(plain)
+
+    # прежние части уменьшенных картинок и дублей не остаются в пакете
+    parts = zip_parts(small)
+    media = {name for name in parts if name.startswith('word/media/')}
+    assert len(media) == report['images']
+    rels = parts['word/_rels/document.xml.rels'].decode()
+    assert all(f'Target="{name[len("word/"):]}"' in rels for name in media)
+
+
+def test_threads_give_same_result(photos, tmp_path, style_conf):
+    results = []
+    for jobs in (1, 3):
+        out = str(tmp_path / f'{jobs}.docx')
+        run(photos, out, style_conf, ImageOptions(DPI, 80), jobs)
+        results.append(zip_parts(out))
+    assert results[0] == results[1]
+
+
+def test_small_and_broken_images_left_alone(photos):
+    with open(photos, 'rb') as f:
+        assert shrink_image(f.read(), 10, 80, DPI) is None
+    blob = zip_parts(photos)['word/media/image1.png']
+    assert shrink_image(blob, 10_000, 80, DPI) is None
+    assert shrink_image(blob, 100, 80, DPI) is not None
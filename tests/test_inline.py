@@ -0,0 +1,46 @@
+# Строчная разметка Markdown (utils.inline): разбор за один проход и прогоны из готовых w:rPr
+# (benchmarks/bench_inline.py).
+
+import pytest
+from docx.oxml import OxmlElement
+from docx.text.paragraph import Paragraph
+
+from benchmarks.bench_inline import CASES, build, make, reference_runs
+from utils.inline import CODE_FONT, append_runs, parse_inline
+
+
+def paragraph(text):
+    par = Paragraph(OxmlElement('w:p'), None)
+    append_runs(par._p, text)
+    return par
+
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_parse(text, expected):
+    assert parse_inline(text) == expected
+
+
+def test_run_properties():
+    par = paragraph("обычный **жирный *оба*** `код` *курсив*")
+    runs = [(r.text, bool(r.bold), bool(r.italic), r.font.name) for r in par.runs]
+    assert runs == [("обычный ", False, False, None), ("жирный ", True, False, None), ("оба", True, True, None),
+                    (" ", False, False, None), ("код", False, False, CODE_FONT), (" ", False, False, None),
+                    ("курсив", False, True, None)]
+    # шрифт и размер текста задает стиль абзаца
+    assert all(r.font.size is None for r in par.runs)
+    assert par.runs[0]._r.rPr is None
+
+
+def test_spaces_and_tabs_kept():
+    par = paragraph(" a\tb **c** ")
+    assert par.text == " a\tb c "
+    assert par.runs[-1].text == " "
+
+
+# без вложенной и экранированной разметки текст совпадает с прежним способом, элементов XML меньше
+def test_text_matches_reference():
+    texts = make(500, seed=3)
+    _, new_nodes, new_text = build(texts, lambda par, text: append_runs(par._p, text))
+    _, old_nodes, old_text = build(texts, reference_runs)
+    assert new_text == old_text
+    assert new_nodes < old_nodes
@@ -0,0 +1,47 @@
+# Списки ГОСТ через numbering.xml (utils.numbering): тип списка по формату номера, ссылки элементов на
+# определения ГОСТ, неизменный текст и оформление прогонов (benchmarks/bench_lists.py).
+
+import io
+
+import pytest
+from docx import Document
+
+from benchmarks.bench_lists import check, make, parts, run
+from utils.parsers import DocParser
+from utils.streaming import StreamConverter
+
+
+@pytest.fixture(scope='module')
+def report():
+    return make(300, seed=4)
+
+
+def test_list_types_from_number_format(report):
+    blob, expected = report
+    types = [c.ptype for c in DocParser(Document(io.BytesIO(blob)), jobs=1).parse() if c.ptype.startswith('list')]
+    assert types == ['list_bullet' if kind.endswith('bullet') else 'list_number' for kind, *_ in expected]
+
+
+def test_items_reference_gost_lists(report, style_conf):
+    blob, expected = report
+    _, out = run(blob, style_conf)
+    assert check(out, expected) == []
+
+
+def test_second_run_changes_nothing(report, style_conf):
+    _, out = run(report[0], style_conf)
+    _, again = run(out, style_conf)
+    first, second = parts(out), parts(again)
+    for name in ('word/numbering.xml', 'word/document.xml'):
+        assert first[name] == second[name], name
+
+
+# потоковый режим заводит те же определения списков, что и обычный
+def test_stream(report, style_conf, tmp_path):
+    blob, expected = report
+    source, target = tmp_path / 'in.docx', tmp_path / 'out.docx'
+    source.write_bytes(blob)
+    StreamConverter(str(source), str(target), style_conf).start()
+    assert check(target.read_bytes(), expected) == []
+    _, out = run(blob, style_conf)
+    assert parts(target.read_bytes())['word/numbering.xml'] == parts(out)['word/numbering.xml']
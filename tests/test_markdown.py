@@ -0,0 +1,54 @@
+# Markdown (.txt): структура из MdParser передается в Converter без повторной классификации,
+# документ сохраняется один раз.
+
+import os
+
+from docx import Document
+
+from utils import converters
+from utils.converters import MarkdownConverter
+from utils.parsers import DocParser, MdParser
+from utils.pipeline import load_converter
+
+
+def convert(path):
+    with open(path, encoding='utf-8') as text:
+        md = MarkdownConverter(MdParser(text).tokens(), os.devnull)
+        return md, md.convert_to_doc()
+
+
+# типы абзацев, известные из разметки (заголовки, пустые строки), и угаданные по тексту совпадают с тем,
+# что дал бы DocParser на собранном документе; код и маркированные списки Markdown задает явно
+def test_types_match_reclassification(report_txt):
+    md, doc = convert(report_txt)
+    data = DocParser(doc, jobs=1).parse()
+    assert len(md.ctx) == len(data)
+    for known, guessed in zip(md.ctx, data):
+        assert known.el is guessed.el
+        if known.ptype not in ('code', 'list_bullet'):
+            assert (known.ptype, known.level) == (guessed.ptype, guessed.level), guessed.el.xpath('string(.)')
+
+
+def test_markdown_known_types(report_txt):
+    md, _ = convert(report_txt)
+    types = {c.ptype for c in md.ctx}
+    assert {'heading', 'list_bullet', 'list_number', 'code', 'empty', 'normal'} <= types
+
+
+def test_saved_once_without_docparser(report_txt, tmp_path, style_conf, monkeypatch):
+    saves = []
+    save_document = converters.save_document
+
+    def counting(*args, **kwargs):
+        saves.append(args[1])
+        return save_document(*args, **kwargs)
+
+    def parse(self):
+        raise AssertionError("DocParser.parse на пути .txt")
+
+    monkeypatch.setattr(converters, 'save_document', counting)
+    monkeypatch.setattr(DocParser, 'parse', parse)
+    out = str(tmp_path / 'out.docx')
+    load_converter(report_txt, out, style_conf, jobs=1).start()
+    assert saves == [out]
+    assert Document(out).paragraphs
@@ -0,0 +1,67 @@
+# Таблицы Markdown (MarkdownConverter.add_table): таблица собирается целиком, выравнивание столбцов берется
+# из строки-разделителя, для столбцов --- - из содержимого (benchmarks/bench_tables.py).
+
+import os
+
+from docx import Document
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT as JC
+
+from benchmarks.bench_tables import EXPECTED, make, reference, texts
+from utils.converters import Converter, MarkdownConverter, md_cells
+from utils.parsers import DocParser, MdParser
+from utils.streaming import StreamConverter
+
+
+def converted(text, style_conf, path):
+    tokens = MdParser(text).parse_()
+    md = MarkdownConverter(tokens, os.devnull)
+    doc = md.convert_to_doc()
+    Converter(doc, md.ctx, path, style_conf, table_align=md.table_align).start()
+    return tokens, doc
+
+
+def aligned(table) -> list:
+    return [[cell.paragraphs[0].alignment for cell in tr.cells] for tr in table.rows]
+
+
+def test_md_cells():
+    assert md_cells("| a | b |") == ['a', 'b']
+    assert md_cells("a | b") == ['a', 'b']
+    assert md_cells("| a || c |") == ['a', '', 'c']
+    assert md_cells("|:-:|--:|") == [':-:', '--:']
+
+
+def test_column_align():
+    assert MarkdownConverter.column_align("|:-:|:--|--:|---|") == [JC.CENTER, JC.LEFT, JC.RIGHT, None]
+
+
+def test_cells_match_row_by_row_build(style_conf, tmp_path):
+    tokens, doc = converted(make(300, seed=1), style_conf, str(tmp_path / 'out.docx'))
+    assert len(doc.tables) == 1 and len(doc.tables[0].rows) == 301
+    assert texts(doc) == texts(reference(tokens))
+    assert texts(Document(str(tmp_path / 'out.docx'))) == texts(doc)
+
+
+def test_alignment_from_separator_and_content(style_conf, tmp_path):
+    _, doc = converted(make(50, seed=2), style_conf, str(tmp_path / 'out.docx'))
+    rows = aligned(doc.tables[0])
+    assert rows[0] == [JC.CENTER] * len(EXPECTED)
+    assert all(row == EXPECTED for row in rows[1:])
+
+
+def test_short_and_long_rows(style_conf, tmp_path):
+    text = "| a | b | c |\n|---|---|---|\n| 1 |\n| 1 | 2 | 3 | 4 |\n| x || z |\n"
+    _, doc = converted(text, style_conf, str(tmp_path / 'out.docx'))
+    assert [[c.text for c in tr.cells] for tr in doc.tables[0].rows] == \
+        [['a', 'b', 'c'], ['1', '', ''], ['1', '2', '3'], ['x', '', 'z']]
+
+
+# потоковый режим (.docx) не знает выравнивания из Markdown и выравнивает таблицы по содержимому
+def test_stream_formats_tables(report_docx, style_conf, tmp_path):
+    normal, stream = str(tmp_path / 'normal.docx'), str(tmp_path / 'stream.docx')
+    doc = Document(report_docx)
+    Converter(doc, DocParser(doc, jobs=1).parse(), normal, style_conf).start()
+    StreamConverter(report_docx, stream, style_conf).start()
+    first, second = Document(normal), Document(stream)
+    assert first.tables and texts(first) == texts(second)
+    assert [aligned(t) for t in first.tables] == [aligned(t) for t in second.tables]
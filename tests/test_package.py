@@ -0,0 +1,104 @@
+# Сохранение пакета (utils.package): части и их порядок те же, что у Document.save, неизмененные части
+# копируются из исходного архива без повторного сжатия, архив читают zipfile и python-docx. Тесты
+# опираются только на открытые API: если python-docx (requirements.txt) начнет строить пакет иначе,
+# сравнение с Document.save это покажет.
+
+import io
+import os
+import zipfile
+
+import pytest
+from docx import Document
+
+from benchmarks.bench_save import make
+from conftest import zip_parts
+from style_configs.style_config import StyleManager
+from utils.package import PackageZip, save_document
+from utils.pipeline import load_converter
+
+
+@pytest.fixture(scope='module')
+def scans(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('scans') / 'scans.docx')
+    make(path, 3, 200, 0)
+    return path
+
+
+@pytest.fixture(scope='module')
+def formatted(scans):
+    conv = load_converter(scans, os.devnull, StyleManager(), jobs=1)
+    conv.format()
+    return conv.doc
+
+
+def names(blob):
+    with zipfile.ZipFile(io.BytesIO(blob)) as z:
+        assert z.testzip() is None
+        return z.namelist()
+
+
+def saved(doc, **kwargs):
+    out = io.BytesIO()
+    copied = save_document(doc, out, **kwargs)
+    return out.getvalue(), copied
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+@pytest.mark.parametrize('level', [None, 0, 9])
+def test_same_parts_as_python_docx(formatted, jobs, level):
+    reference = io.BytesIO()
+    formatted.save(reference)
+    blob, copied = saved(formatted, level=level, jobs=jobs)
+    assert copied == 0
+    assert names(blob) == names(reference.getvalue())
+    assert zip_parts(blob) == zip_parts(reference.getvalue())
+
+
+def test_unchanged_parts_copied_raw(scans, formatted):
+    blob, copied = saved(formatted, source=scans, jobs=2)
+    reference = io.BytesIO()
+    formatted.save(reference)
+    assert zip_parts(blob) == zip_parts(reference.getvalue())
+
+    with zipfile.ZipFile(scans) as src, zipfile.ZipFile(io.BytesIO(blob)) as out:
+        media = [info for info in src.infolist() if info.filename.startswith('word/media/')]
+        assert copied >= len(media) == 3
+        for info in media:
+            new = out.getinfo(info.filename)
+            # сжатые данные те же: размер, CRC и метод сжатия из исходного архива
+            assert (new.compress_size, new.CRC, new.compress_type, new.date_time) == \
+                   (info.compress_size, info.CRC, info.compress_type, info.date_time)
+    assert Document(io.BytesIO(blob)).inline_shapes
+
+
+@pytest.mark.parametrize('level', [0, 6])
+def test_writer_entries(tmp_path, level):
+    source = str(tmp_path / 'source.zip')
+    with zipfile.ZipFile(source, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('media/картинка.bin', os.urandom(3000))
+    target = str(tmp_path / 'out.zip')
+    with PackageZip(target, level) as zout, zipfile.ZipFile(source) as zin, open(source, 'rb') as raw:
+        zout.writestr('[Content_Types].xml', b'<Types/>')
+        with zout.stream('word/document.xml') as dst:
+            for k in range(100):
+                dst.write(f'<p>{k}</p>'.encode())
+        zout.copy_raw(raw, zin.getinfo('media/картинка.bin'))
+
+    with zipfile.ZipFile(target) as z, zipfile.ZipFile(source) as zin:
+        assert z.testzip() is None
+        assert z.namelist() == ['[Content_Types].xml', 'word/document.xml', 'media/картинка.bin']
+        assert z.read('word/document.xml') == b''.join(f'<p>{k}</p>'.encode() for k in range(100))
+        assert z.read('media/картинка.bin') == zin.read('media/картинка.bin')
+        assert {info.compress_type for info in z.infolist()[:2]} == \
+               {zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED}
+
+
+# при ошибке архив не дописывается, а файл закрывается
+def test_error_leaves_no_central_directory(tmp_path):
+    target = tmp_path / 'out.zip'
+    with pytest.raises(RuntimeError):
+        with PackageZip(str(target)) as zout:
+            zout.writestr('a.xml', b'<a/>')
+            raise RuntimeError
+    with pytest.raises(zipfile.BadZipFile):
+        zipfile.ZipFile(target)
@@ -0,0 +1,83 @@
+# Профайлер (--profile, utils.profiling): после stop() все обернутые атрибуты возвращаются на место,
+# отчет сходится с результатом разбора, формат trace - корректные события Chrome.
+
+import json
+
+import pytest
+from docx.oxml.xmlchemy import BaseOxmlElement
+
+from cli import process_file
+from utils.parsers import DocParser
+from utils.profiling import Profiler, profiler
+
+
+# атрибуты классов, которые подменяет профайлер, как они лежат в __dict__ (с classmethod/staticmethod)
+def patched_attributes():
+    names = DocParser.DETECTORS + ('determine_type',)
+    return ({name: DocParser.__dict__.get(name) for name in names},
+            {name: BaseOxmlElement.__dict__.get(name) for name in ('remove', 'replace')})
+
+
+def test_stop_restores_attributes():
+    before = patched_attributes()
+    prof = Profiler()
+    prof.start(DocParser, trace=True)
+    assert patched_attributes() != before
+    # вид метода сохраняется и у обертки
+    for name, raw in before[0].items():
+        assert type(DocParser.__dict__[name]) is type(raw)
+    prof.stop()
+
+    after = patched_attributes()
+    for old, new in zip(before, after):
+        assert old.keys() == new.keys()
+        assert all(new[name] is old[name] for name in old)
+    # remove/replace унаследованы от lxml: обертка удаляется, а не остается в __dict__
+    assert 'remove' not in BaseOxmlElement.__dict__ and 'replace' not in BaseOxmlElement.__dict__
+    assert not prof.enabled
+
+    # повторный запуск после остановки оборачивает исходные методы, а не прошлые обертки
+    prof.start(DocParser)
+    prof.stop()
+    assert patched_attributes() == before
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_trace(tmp_path, report_docx, stream):
+    before = patched_attributes()
+    path, output = str(tmp_path / 'trace.json'), str(tmp_path / 'out.docx')
+    assert process_file(report_docx, output, stream=stream, cache=False, profile=path, profile_format='trace')
+    # process_file останавливает профайлер и при успехе
+    assert patched_attributes() == before and not profiler.enabled
+
+    with open(path, encoding='utf-8') as f:
+        trace = json.load(f)
+    assert trace['displayTimeUnit'] == 'ms'
+    events = trace['traceEvents']
+    assert events
+    for event in events:
+        assert event['ph'] == 'X' and event['pid'] == 0 and event['tid'] == 0
+        assert isinstance(event['name'], str) and event['cat'] in ('stage', 'detector', 'parse')
+        assert event['ts'] >= 0 and event['dur'] >= 0
+
+    stages = [e for e in events if e['cat'] == 'stage']
+    report = trace['otherData']
+    assert [e['name'] for e in stages] == [s['name'] for s in report['stages']]
+    assert report['output_bytes'] > 0
+    if stream:
+        assert [e['name'] for e in stages] == ['stream']
+        return
+
+    assert {'load', 'parse', 'format_paragraphs', 'save'} <= {e['name'] for e in stages}
+    # вызовы детекторов и determine_type лежат внутри этапа разбора
+    parse = next(e for e in stages if e['name'] == 'parse')
+    calls = [e for e in events if e['cat'] in ('detector', 'parse')]
+    assert calls
+    for event in calls:
+        assert parse['ts'] <= event['ts'] and event['ts'] + event['dur'] <= parse['ts'] + parse['dur'] + 1
+
+    determine = [e for e in calls if e['name'] == 'determine_type']
+    assert len(determine) == report['determine_type']['calls'] == sum(report['ptypes'].values())
+    assert sum(report['determine_type']['resolved_by'].values()) == len(determine)
+    for name, stats in report['detectors'].items():
+        assert stats['calls'] == sum(1 for e in calls if e['name'] == name)
@@ -0,0 +1,126 @@
+# Сервер форматирования (utils.server): ответы локальному клиенту, отказы до чтения тела (404, 413, 503),
+# таймаут с перезапуском процесса (504) и счетчики /metrics.
+
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.generate import make_docx
+from conftest import zip_parts
+from utils.pipeline import load_converter
+from utils.server import WorkerPool, create_server, request
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = WorkerPool(1)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+# сервер на свободном порту; у каждого теста свои настройки и метрики
+@pytest.fixture
+def serve(pool):
+    servers = []
+
+    def start(**options):
+        server = create_server(('127.0.0.1', 0), pool, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope='module')
+def large_docx(tmp_path_factory):
+    # обрабатывается заметно дольше таймаута test_timeout_restarts_worker
+    path = str(tmp_path_factory.mktemp('server') / 'large.docx')
+    make_docx(path, 1000)
+    return path
+
+
+def read(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def metrics(server) -> dict:
+    status, _, body = request(server.server_address, 'GET', '/metrics')
+    assert status == 200
+    return json.loads(body)
+
+
+def test_format_matches_local(serve, report_docx, style_conf):
+    server = serve()
+    status, headers, body = request(server.server_address, 'POST', '/format', read(report_docx))
+    assert status == 200
+    assert headers['Content-Type'].endswith('wordprocessingml.document')
+
+    conv = load_converter(report_docx, None, style_conf, jobs=1)
+    conv.format()
+    out = io.BytesIO()
+    conv.save(out)
+    assert zip_parts(body) == zip_parts(out.getvalue())
+
+
+def test_rejections(serve, report_docx):
+    server = serve(max_size=1000)
+    address = server.server_address
+    assert request(address, 'POST', '/format', read(report_docx))[0] == 413
+    assert request(address, 'POST', '/other', b'text')[0] == 404
+    assert request(address, 'GET', '/other')[0] == 404
+
+    stats = metrics(server)
+    assert stats['requests'] == {'404': 1, '413': 1}
+    assert stats['queue']['depth'] == stats['queue']['busy'] == 0
+    assert stats['latency']['processing']['count'] == 0
+
+
+# место у сервера одно (1 процесс, очередь 0): пока его держит обработка, следующему запросу - 503
+def test_busy_server_rejects(serve, large_docx):
+    server = serve(queue_size=0)
+    address, data = server.server_address, read(large_docx)
+    results = []
+    first = threading.Thread(target=lambda: results.append(request(address, 'POST', '/format', data)))
+    first.start()
+    deadline = time.monotonic() + 30
+    while metrics(server)['queue']['busy'] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    status, headers, _ = request(address, 'POST', '/format', b'text')
+    assert status == 503
+    assert headers['Retry-After'] == '1'
+    first.join()
+    assert results[0][0] == 200
+
+    stats = metrics(server)
+    assert stats['requests'] == {'200': 1, '503': 1}
+    assert stats['queue']['busy'] == stats['queue']['depth'] == 0
+    assert stats['throughput']['completed'] == 1
+    assert stats['throughput']['bytes_in'] == len(data)
+
+
+def test_timeout_restarts_worker(serve, pool, large_docx, report_docx):
+    restarts = pool.restarts
+    server = serve(timeout=0.25)
+    status, _, body = request(server.server_address, 'POST', '/format', read(large_docx))
+    assert status == 504
+    assert 'error' in json.loads(body)
+    stats = metrics(server)
+    assert stats['queue']['worker_restarts'] == restarts + 1
+    assert stats['requests'] == {'504': 1}
+    assert stats['queue']['busy'] == 0
+
+    # новый процесс принимает запросы после запуска
+    server = serve()
+    assert request(server.server_address, 'POST', '/format', read(report_docx))[0] == 200
+    assert pool.idle.qsize() == pool.size
@@ -0,0 +1,60 @@
+# Форматирование тела по главам на пуле процессов (Converter.format_shards) совпадает с последовательным
+# побайтно (benchmarks/bench_shards.py).
+
+import io
+
+import pytest
+
+from conftest import zip_parts
+from utils import converters
+from utils.cache import ParCache
+from utils.pipeline import load_converter
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    # порог снимается, чтобы по главам форматировался и небольшой отчет
+    monkeypatch.setattr(converters, 'SHARD_MIN', 0)
+    calls = []
+    format_shards = converters.Converter.format_shards
+
+    def counting(self, shards, jobs):
+        calls.append(len(shards))
+        return format_shards(self, shards, jobs)
+
+    monkeypatch.setattr(converters.Converter, 'format_shards', counting)
+    return calls
+
+
+def formatted(path, style_conf, jobs=None, cache=None) -> dict:
+    conv = load_converter(path, None, style_conf, cache, jobs)
+    conv.format()
+    out = io.BytesIO()
+    conv.save(out)
+    return zip_parts(out.getvalue())
+
+
+@pytest.mark.parametrize('jobs', [2, 3])
+def test_shards_match_serial(report_docx, style_conf, sharded, jobs):
+    serial = formatted(report_docx, style_conf, 1)
+    assert not sharded
+    assert formatted(report_docx, style_conf, jobs) == serial
+    assert sharded and sharded[0] > 1
+
+
+def test_shards_with_cache_match_serial(report_docx, style_conf, sharded, tmp_path):
+    serial = formatted(report_docx, style_conf, 1)
+    cache = ParCache(str(tmp_path))
+    try:
+        cold = formatted(report_docx, style_conf, 2, cache)
+        warm = formatted(report_docx, style_conf, 2, cache)
+    finally:
+        cache.close()
+    assert len(sharded) == 2
+    assert cold == serial and warm == serial
+
+
+# без -j документ форматируется в текущем процессе
+def test_serial_by_default(report_docx, style_conf, sharded):
+    formatted(report_docx, style_conf)
+    assert not sharded
@@ -0,0 +1,40 @@
+# Определение формул и кода (DocParser.special_scores): баллы совпадают с прежними регулярками,
+# злонамеренные абзацы обрабатываются за линейное время (benchmarks/bench_classifier.py).
+
+import random
+import time
+
+import pytest
+from docx import Document
+
+from benchmarks.bench_classifier import ADVERSARIAL, PARTS, reference_scores
+from utils.parsers import DocParser
+
+
+def test_scores_match_reference():
+    rnd = random.Random(0)
+    for _ in range(3000):
+        text = ''.join(rnd.choice(PARTS) for _ in range(rnd.randrange(1, 25)))
+        assert DocParser.special_scores(text) == reference_scores(text), text
+
+
+# прежние регулярки на 50 000 символах работали бы минуты; новому способу хватает долей секунды
+@pytest.mark.parametrize('unit', ADVERSARIAL.values(), ids=ADVERSARIAL.keys())
+def test_adversarial_paragraph(unit):
+    short = unit * (60 // len(unit))
+    assert DocParser.special_scores(short) == reference_scores(short)
+
+    text = unit * (50000 // len(unit))
+    started = time.perf_counter()
+    DocParser.special_scores(text)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_scores_in_parse_result():
+    doc = Document()
+    doc.add_paragraph("for (i = 0; i < n; i++) { x += a[i]; } // сумма")
+    doc.add_paragraph("Обычный текст без признаков.")
+    code, text = DocParser(doc, jobs=1).parse()
+    assert code.ptype == 'code'
+    assert code.scores['code'] >= DocParser.CODE_THRESHOLD
+    assert text.scores == {'formula': 0, 'code': 0}
@@ -0,0 +1,46 @@
+# Холодный старт cli.py (benchmarks/bench_startup.py): на путях без обработки документа тяжелые модули
+# не загружаются, а время старта сверх пустого интерпретатора укладывается в бюджет. Бюджет, мс, можно
+# задать переменной окружения GOST_STARTUP_BUDGET (например, на медленной машине сборки).
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import BUDGET, HEAVY, ROOT, best, cases, imported
+
+REPEAT = 5
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    return cases(str(tmp_path_factory.mktemp('startup')))
+
+
+@pytest.fixture(scope='module')
+def interpreter():
+    return best(['-c', 'pass'], REPEAT)
+
+
+def test_heavy_modules_not_imported(paths):
+    for name, cmd in paths:
+        modules = imported(cmd)
+        assert [m for m in HEAVY if m in modules] == [], name
+
+
+# модуль cli можно импортировать из других программ: main() при импорте не запускается
+def test_import_has_no_side_effects():
+    result = subprocess.run([sys.executable, '-c', 'import cli'], input='', capture_output=True, text=True,
+                            cwd=ROOT)
+    assert (result.returncode, result.stdout) == (0, '')
+    modules = imported(['-c', 'import cli'])
+    assert 'cli' in modules
+    assert [m for m in HEAVY if m in modules] == []
+
+
+def test_startup_budget(paths, interpreter):
+    budget = float(os.environ.get('GOST_STARTUP_BUDGET', BUDGET))
+    for name, cmd in paths:
+        overhead = (best(cmd, REPEAT) - interpreter) * 1000
+        assert overhead <= budget, f"{name}: {overhead:.1f} мс сверх интерпретатора, бюджет {budget:.0f} мс"
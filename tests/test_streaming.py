@@ -0,0 +1,64 @@
+# Потоковый режим (utils.streaming): части, которых нет во входном пакете (styles.xml, нижний колонтитул
+# с номером страницы), создаются по шаблонам без внутренностей python-docx.
+
+import io
+import re
+import zipfile
+
+from docx import Document
+from docx.oxml.ns import qn
+from lxml import etree
+
+from conftest import zip_parts
+from style_configs.style_config import StyleNames
+from utils.streaming import StreamConverter
+
+TEXT = "Текст абзаца основного текста отчета."
+
+
+# отчет из двух разделов без колонтитулов (разрыв раздела в непустом абзаце); without_styles - пакет без styles.xml
+def make(path, without_styles=False):
+    doc = Document()
+    doc.add_paragraph(TEXT)
+    doc.add_section()
+    doc.paragraphs[-1].add_run(TEXT)
+    doc.add_paragraph(TEXT)
+    blob = io.BytesIO()
+    doc.save(blob)
+    with zipfile.ZipFile(blob) as src, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as out:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if without_styles:
+                if info.filename == 'word/styles.xml':
+                    continue
+                data = re.sub(rb'<Relationship [^>]*Target="styles.xml"/>', b'', data)
+                data = re.sub(rb'<Override PartName="/word/styles.xml"[^>]*/>', b'', data)
+            out.writestr(info, data)
+
+
+def test_missing_styles_part(tmp_path, style_conf):
+    source, target = str(tmp_path / 'in.docx'), str(tmp_path / 'out.docx')
+    make(source, without_styles=True)
+    StreamConverter(source, target, style_conf).start()
+
+    doc = Document(target)
+    assert doc.paragraphs[0].style.name == StyleNames.normal
+    names = {s.name for s in doc.styles}
+    assert {'Normal', StyleNames.normal, StyleNames.h1} <= names
+    assert doc.styles.element.find(qn('w:docDefaults')) is not None
+
+
+def test_new_footer_with_page_number(tmp_path, style_conf):
+    source, target = str(tmp_path / 'in.docx'), str(tmp_path / 'out.docx')
+    make(source)
+    StreamConverter(source, target, style_conf).start()
+
+    footers = [name for name in zip_parts(target) if name.startswith('word/footer')]
+    assert len(footers) == 1
+    ftr = etree.fromstring(zip_parts(target)[footers[0]])
+    assert ftr.tag == qn('w:ftr')
+    assert ftr.xpath('.//w:instrText/text()', namespaces={'w': ftr.nsmap['w']}) == ['PAGE']
+    doc = Document(target)
+    # как в python-docx: колонтитул заводится у первого раздела, второй ссылается на него
+    assert not doc.sections[0].footer.is_linked_to_previous
+    assert doc.sections[1].footer.is_linked_to_previous
@@ -0,0 +1,71 @@
+# Кэш скомпилированных стилей (StyleManager.template): запись только в заданный каталог кэша, через
+# временный файл своего процесса.
+
+import multiprocessing as mp
+import os
+
+import pytest
+from docx import Document
+
+from style_configs import style_config
+from style_configs.style_config import StyleManager
+
+
+@pytest.fixture(autouse=True)
+def fresh_templates(monkeypatch):
+    monkeypatch.setattr(style_config, '_TEMPLATES', {})
+
+
+def test_no_cache_dir_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path))
+    monkeypatch.setenv('HOME', str(tmp_path))
+    names = [name for name, _ in StyleManager().template()]
+    assert style_config.StyleNames.normal in names
+    assert not list(tmp_path.rglob('*'))
+
+
+def test_cache_dir_roundtrip(tmp_path):
+    first = StyleManager(cache_dir=str(tmp_path))
+    compiled = [name for name, _ in first.template()]
+    files = os.listdir(tmp_path / 'styles')
+    assert files == [f'{first.key}.xml']
+
+    # следующий процесс (пустой _TEMPLATES) читает файл, а не собирает стили заново
+    style_config._TEMPLATES.clear()
+    second = StyleManager(cache_dir=str(tmp_path))
+    second.compile_styles = None
+    assert [name for name, _ in second.template()] == compiled
+
+    doc = Document()
+    second.setup_styles(doc)
+    assert doc.styles[style_config.StyleNames.normal].font.name == "Times New Roman"
+
+
+def _compile(cache_dir, rounds):
+    for _ in range(rounds):
+        style_config._TEMPLATES.clear()
+        path = os.path.join(cache_dir, 'styles', f'{StyleManager().key}.xml')
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        StyleManager(cache_dir=cache_dir).template()
+
+
+# процессы, одновременно собирающие стили, не портят файл друг другу и не оставляют временных файлов
+def test_concurrent_writers(tmp_path):
+    ctx = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+    processes = [ctx.Process(target=_compile, args=(str(tmp_path), 20)) for _ in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+
+    key = StyleManager().key
+    assert [f for f in os.listdir(tmp_path / 'styles') if f != f'{key}.xml'] == []
+    style_config._TEMPLATES.clear()
+    manager = StyleManager(cache_dir=str(tmp_path))
+    manager.compile_styles = None
+    assert len(manager.template()) == len(manager.styles)
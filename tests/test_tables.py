@@ -0,0 +1,87 @@
+# Оформление таблиц из готовых фрагментов (Converter.format_table): границы и поля ячеек на уровне
+# таблицы, свойства строк и ячеек, выравнивание по столбцам.
+
+import io
+
+from docx import Document
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT as JC
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from style_configs.style_config import StyleNames
+from utils.converters import Converter
+from utils.parsers import DocParser
+
+# порядок дочерних элементов w:tblPr по схеме
+TBL_PR_ORDER = ['tblStyle', 'tblpPr', 'tblOverlap', 'bidiVisual', 'tblStyleRowBandSize', 'tblStyleColBandSize',
+                'tblW', 'jc', 'tblCellSpacing', 'tblInd', 'tblBorders', 'shd', 'tblLayout', 'tblCellMar',
+                'tblLook', 'tblCaption', 'tblDescription', 'tblPrChange']
+ROWS = [["Образец", "Масса", "Примечание"],
+        ["сталь", "12,5", "без замечаний"],
+        ["медь", "", "с окалиной"],
+        ["латунь", "7", "1 партия"]]
+
+
+def make():
+    doc = Document()
+    doc.add_paragraph("Таблица: Свойства образцов")
+    table = doc.add_table(rows=len(ROWS), cols=len(ROWS[0]))
+    for tr, cells in zip(table.rows, ROWS):
+        for cell, text in zip(tr.cells, cells):
+            cell.text = text
+    # у ячейки уже есть свойства и собственные поля: медленный путь через python-docx
+    tc_pr = table.cell(1, 1)._tc.get_or_add_tcPr()
+    tc_pr.append(parse_xml(f'<w:tcMar {nsdecls("w")}><w:left w:w="500" w:type="dxa"/></w:tcMar>'))
+    doc.add_paragraph("Текст после таблицы.")
+    blob = io.BytesIO()
+    doc.save(blob)
+    return Document(io.BytesIO(blob.getvalue()))
+
+
+def formatted(style_conf):
+    doc = make()
+    conv = Converter(doc, DocParser(doc, jobs=1).parse(), None, style_conf)
+    conv.format_tables()
+    return doc, conv
+
+
+def local(el):
+    return el.tag.rsplit('}', 1)[1]
+
+
+def test_table_properties(style_conf):
+    doc, _ = formatted(style_conf)
+    tbl = doc.tables[0]._tbl
+    names = [local(el) for el in tbl.tblPr]
+    assert names == sorted(names, key=TBL_PR_ORDER.index)
+    assert names.count('tblBorders') == names.count('tblCellMar') == 1
+    borders = tbl.tblPr.find(qn('w:tblBorders'))
+    assert [local(b) for b in borders] == ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']
+    assert {b.get(qn('w:sz')) for b in borders} == {str(style_conf.tb_conf['border_size'])}
+
+    for tr in tbl.tr_lst:
+        assert tr.find(qn('w:trPr')).find(qn('w:trHeight')) is not None
+        for tc in tr.tc_lst:
+            assert tc.tcPr.find(qn('w:tcMar')) is None
+            assert tc.tcPr.find(qn('w:vAlign')).get(qn('w:val')) == 'center'
+
+
+def test_cell_text_and_alignment(style_conf):
+    doc, _ = formatted(style_conf)
+    table = doc.tables[0]
+    assert [[cell.text for cell in tr.cells] for tr in table.rows] == ROWS
+    # заголовок по центру и жирный; числовой столбец (пустая ячейка тоже) вправо, остальные влево
+    expected = [JC.CENTER] * 3, *([JC.LEFT, JC.RIGHT, JC.LEFT] for _ in ROWS[1:])
+    for tr, row in zip(table.rows, expected):
+        for cell, jc in zip(tr.cells, row):
+            par = cell.paragraphs[0]
+            assert par.alignment == jc
+            assert par.style.name == StyleNames.tb_item
+    assert all(run.bold for cell in table.rows[0].cells for run in cell.paragraphs[0].runs)
+
+
+def test_caption_above_table(style_conf):
+    doc, _ = formatted(style_conf)
+    caption = doc.tables[0]._tbl.getprevious()
+    assert caption.xpath('string(.)') == "Таблица 1 − Свойства образцов"
+    assert [p.text for p in doc.paragraphs] == ["Таблица 1 − Свойства образцов", "Текст после таблицы."]
@@ -0,0 +1,103 @@
+# Типографская нормализация за один проход (utils.typography) против прежней цепочки re.sub; правки
+# накладываются на прогоны на месте, оформление прогонов сохраняется.
+
+import random
+import re
+
+import pytest
+from docx.oxml import OxmlElement
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from utils.typography import normalize_paragraph, normalize_text
+
+PARTS = ['"', '1', '23', '-', ' ', '  ', '\t', '\n', 'т.', ' д.', 'т. п.', 'слово', 'г.', 'см.', 'а', '.', ',']
+# "т. д." сразу после другого "т. д.": прежнее правило съедало разделяющий пробел и второе пропускало
+ADJACENT_ETC = re.compile(r'т\.\s*[дп]\.\s+т\.\s*[дп]\.')
+
+
+# прежний способ (до utils.typography) без тождественных правил г. и см.
+def reference(text):
+    if not text:
+        return text
+    text = re.sub(r'"([^"]*)"', r'«\1»', text)
+    text = re.sub(r'(\d+)-(\d+)', r'\1—\2', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'(\s)т\.\s*д\.(\s)', r'\1т.д.\2', text)
+    text = re.sub(r'(\s)т\.\s*п\.(\s)', r'\1т.п.\2', text)
+    return text.strip()
+
+
+def samples(count, seed):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        text = ''.join(rnd.choice(PARTS) for _ in range(rnd.randrange(1, 30)))
+        if not ADJACENT_ETC.search(' ' + text + ' '):
+            yield text
+
+
+# абзац из прогонов с чередующимся оформлением; cuts - границы прогонов в тексте
+def paragraph(text, cuts):
+    par = Paragraph(OxmlElement('w:p'), None)
+    bounds = [0, *cuts, len(text)]
+    for k, (a, b) in enumerate(zip(bounds, bounds[1:])):
+        run = par.add_run(text[a:b])
+        run.bold = k % 2 == 0
+        run.italic = k % 3 == 0
+    return par
+
+
+def runs(par):
+    return [(bool(r.bold), bool(r.italic)) for r in par.runs]
+
+
+def test_matches_reference():
+    checked = 0
+    for text in samples(5000, seed=0):
+        assert normalize_text(text) == reference(text), repr(text)
+        checked += 1
+    assert checked > 4000
+
+
+def test_adjacent_abbreviations():
+    assert normalize_text("и т. д. т. д. конец") == "и т.д. т.д. конец"
+
+
+def test_runs_keep_formatting():
+    rnd = random.Random(1)
+    for text in samples(2000, seed=2):
+        if not text.strip():
+            continue
+        cuts = sorted(rnd.sample(range(1, len(text)), min(3, len(text) - 1))) if len(text) > 1 else []
+        par = paragraph(text, cuts)
+        before = runs(par)
+        normalize_paragraph(par)
+        assert par.text == reference(text), (text, cuts)
+        # прогоны не пересоздаются: их число и оформление те же (опустевшие текстовые прогоны остаются)
+        assert runs(par) == before
+
+
+@pytest.mark.parametrize('pieces, expected', [
+    (['цитата "на', 'чало" и', ' конец'], ['цитата «на', 'чало» и', ' конец']),
+    (['страницы 1', '-2 и 3-', '4'], ['страницы 1', '—2 и 3—', '4']),
+    (['и т.', ' д. далее'], ['и т.', 'д. далее']),
+    (['два  ', '  пробела'], ['два ', 'пробела']),
+])
+def test_edit_inside_run_boundary(pieces, expected):
+    text = ''.join(pieces)
+    cuts, pos = [], 0
+    for piece in pieces[:-1]:
+        pos += len(piece)
+        cuts.append(pos)
+    par = paragraph(text, cuts)
+    before = runs(par)
+    assert normalize_paragraph(par)
+    assert [r.text for r in par.runs] == expected
+    assert runs(par) == before
+
+
+def test_unchanged_paragraph_untouched():
+    par = paragraph("Текст «в кавычках», 1—2 и т.д. конец", [5, 12])
+    xml = etree.tostring(par._p)
+    assert not normalize_paragraph(par)
+    assert etree.tostring(par._p) == xml
@@ -0,0 +1,113 @@
+# Режим наблюдения (utils.watch): запуск после того, как файл перестал меняться, пропуск недописанного
+# сохранения и атомарная замена результата. Время ожидания подменяется, чтобы цикл шел за доли секунды.
+
+import os
+import threading
+import time
+
+import pytest
+from docx import Document
+
+from utils import watch
+
+TEXT = "Текст абзаца основного текста отчета."
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(watch, 'POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(watch, 'SETTLE_TIME', 0.05)
+
+
+def make(path, count):
+    doc = Document()
+    for i in range(count):
+        doc.add_paragraph(f"{TEXT} {i}")
+    doc.save(path)
+
+
+def test_settle_waits_for_last_write(tmp_path):
+    path = str(tmp_path / 'in.docx')
+    make(path, 1)
+
+    # сохранение в несколько приемов: файл пропадает, затем дописывается
+    def save():
+        os.remove(path)
+        time.sleep(0.08)
+        with open(path, 'wb') as f:
+            f.write(b'PK')
+        time.sleep(0.03)
+        make(path, 2)
+
+    writer = threading.Thread(target=save)
+    writer.start()
+    state = watch._settle(path, watch._stat(path))
+    writer.join()
+    assert state == watch._stat(path)
+    assert len(Document(path).paragraphs) == 2
+
+
+def test_one_cycle(tmp_path, monkeypatch, capsys):
+    source, target = str(tmp_path / 'in.docx'), str(tmp_path / 'out.docx')
+    make(source, 1)
+    with open(source, 'rb') as f:
+        full = f.read()
+
+    replaced = []
+    real_replace = os.replace
+
+    # результат появляется только целиком: во время замены выходной файл еще прежний
+    def spy_replace(src, dst):
+        if dst != target:
+            return real_replace(src, dst)
+        assert src == target + '.tmp'
+        replaced.append((open(dst, 'rb').read() if os.path.exists(dst) else None, len(Document(src).paragraphs)))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', spy_replace)
+
+    # файл, который сохраняющая программа еще держит открытым (на Windows - PermissionError при чтении)
+    locked = []
+    real_load = watch.load_converter
+
+    def load_converter(input_file, *args, **kwargs):
+        if locked:
+            raise PermissionError(13, 'Permission denied', locked.pop())
+        return real_load(input_file, *args, **kwargs)
+
+    monkeypatch.setattr(watch, 'load_converter', load_converter)
+
+    def save_locked():
+        make(source, 2)
+        locked.append(source)
+
+    # после каждого запуска - следующее "сохранение"; после последнего наблюдение прерывается
+    saves = [lambda: open(source, 'wb').write(full[:len(full) // 2]), save_locked, lambda: make(source, 3)]
+    runs = []
+    real_run = watch._run
+
+    def run(*args):
+        try:
+            return real_run(*args)
+        finally:
+            runs.append(open(target, 'rb').read() if os.path.exists(target) else None)
+            assert not os.path.exists(target + '.tmp')
+            if len(runs) > len(saves):
+                raise KeyboardInterrupt
+            saves[len(runs) - 1]()
+
+    monkeypatch.setattr(watch, '_run', run)
+    watch.watch_file(source, target, cache_dir=str(tmp_path / 'cache'))
+
+    assert len(runs) == 4
+    # недописанный и заблокированный файлы пропущены: выход не тронут, os.replace не вызывался
+    assert runs[1] == runs[2] == runs[0]
+    assert [(old is None, count) for old, count in replaced] == [(True, 1), (False, 3)]
+    assert replaced[1][0] == runs[0]
+    assert len(Document(target).paragraphs) == 3
+
+    out = capsys.readouterr().out
+    assert out.count("готово за") == 1
+    assert out.count("файл еще не сохранен полностью") == 2
+    assert "ошибка" not in out
+    assert "наблюдение остановлено" in out
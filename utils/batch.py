@@ -0,0 +1,177 @@
+# Пакетная обработка каталогов и масок файлов на пуле процессов.
+#
+# Каждый процесс один раз импортирует python-docx/lxml и создает StyleManager, после чего берет файлы
+# из общей очереди. Сохранение готового документа идет в отдельном потоке, пока процесс уже разбирает
+# следующий файл.
+
+import glob
+import multiprocessing as mp
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SUPPORTED = ('.docx', '.txt')
+
+
+# раскрывает каталоги (рекурсивно) и маски в список файлов без повторов, в исходном порядке
+def collect_files(patterns) -> list[str]:
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = sorted(os.path.join(d, f) for d, _, names in os.walk(pattern) for f in names)
+        else:
+            found = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+
+        for f in found:
+            name = os.path.basename(f)
+            # ~$файл.docx - служебные файлы блокировки Word
+            if name.lower().endswith(SUPPORTED) and not name.startswith('~$') and f not in files:
+                files.append(f)
+    return files
+
+
+# выходные пути повторяют структуру каталогов относительно общего корня входных файлов
+def output_paths(files, out_dir) -> list[str]:
+    if not files:
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    return [os.path.join(out_dir, os.path.splitext(os.path.relpath(os.path.abspath(f), root))[0] + '.docx')
+            for f in files]
+
+
+# индексы файлов, выходной путь которых уже занят более ранним файлом (отчет.txt и отчет.docx в одном
+# каталоге): {индекс: файл, который получил этот путь}
+def output_collisions(files, outputs) -> dict[int, str]:
+    owners, collisions = {}, {}
+    for i, out in enumerate(outputs):
+        key = os.path.normcase(os.path.abspath(out))
+        if key in owners:
+            collisions[i] = files[owners[key]]
+        else:
+            owners[key] = i
+    return collisions
+
+
+def _save(conv, started, format_time):
+    t = time.perf_counter()
+    conv.save()
+    return format_time, time.perf_counter() - t, time.perf_counter() - started
+
+
+def _worker(tasks, results, styles=None, compression=None, images=None, cache_dir=None):
+    # прогрев: тяжелые модули и стили создаются один раз на процесс
+    from style_configs.style_config import StyleManager
+    from utils.pipeline import load_converter
+
+    style_conf = StyleManager(styles, cache_dir)
+    saver = ThreadPoolExecutor(max_workers=1)
+    pending = None
+
+    def finish(job):
+        index, future = job
+        try:
+            results.put((index, 'ok', *future.result(), ''))
+        except Exception as e:
+            results.put((index, 'error', 0.0, 0.0, 0.0, str(e)))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        index, input_file, output_file = task
+        started = time.perf_counter()
+        try:
+            # файлы и так обрабатываются параллельно, а процессы пула не могут заводить свои
+            conv = load_converter(input_file, output_file, style_conf, jobs=1, compression=compression,
+                                  images=images)
+            conv.format()
+            job = (index, saver.submit(_save, conv, started, time.perf_counter() - started))
+        except Exception as e:
+            results.put((index, 'error', 0.0, 0.0, time.perf_counter() - started, str(e)))
+            job = None
+
+        if pending is not None:
+            finish(pending)
+        pending = job
+
+    if pending is not None:
+        finish(pending)
+    saver.shutdown()
+
+
+# styles - профиль стилей (TOML/JSON); каждый процесс загружает его сам. cache_dir - каталог кэша
+# скомпилированных стилей (см. StyleManager) или None
+def run_batch(patterns, out_dir='output', jobs=None, force=False, styles=None, compression=None,
+              images=None, cache_dir=None) -> int:
+    files = collect_files(patterns)
+    if not files:
+        print("не найдено файлов .docx или .txt")
+        return 1
+
+    if styles:
+        # ошибки в профиле видны сразу, а не как аварийное завершение каждого процесса
+        from style_configs.style_config import StyleManager
+        try:
+            StyleManager(styles)
+        except (OSError, ValueError) as e:
+            print(f"ошибка: {e}")
+            return 1
+
+    outputs = output_paths(files, out_dir)
+    collisions = output_collisions(files, outputs)
+    report = {}
+    queue_items = []
+    for i, (f, out) in enumerate(zip(files, outputs)):
+        if i in collisions:
+            report[i] = ('error', 0.0, 0.0, 0.0, f'выходной файл {out} совпадает с файлом для {collisions[i]}')
+        elif os.path.exists(out) and not force:
+            report[i] = ('skipped', 0.0, 0.0, 0.0, 'файл существует, используйте -f')
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+            queue_items.append((i, f, out))
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(queue_items) or 1))
+    started = time.perf_counter()
+
+    if queue_items:
+        tasks, results = mp.Queue(), mp.Queue()
+        workers = [mp.Process(target=_worker, args=(tasks, results, styles, compression, images, cache_dir),
+                              daemon=True) for _ in range(jobs)]
+        for w in workers:
+            w.start()
+        for item in queue_items:
+            tasks.put(item)
+        for _ in workers:
+            tasks.put(None)
+
+        left = len(queue_items)
+        while left:
+            try:
+                index, status, *rest = results.get(timeout=1)
+            except queue.Empty:
+                if not any(w.is_alive() for w in workers):
+                    break
+                continue
+            left -= 1
+            report[index] = (status, *rest)
+            print(f"[{len(report)}/{len(files)}] {status:7} {rest[2]:7.2f} с  {files[index]}")
+
+        for i, _, _ in queue_items:
+            report.setdefault(i, ('error', 0.0, 0.0, 0.0, 'процесс обработки аварийно завершился'))
+
+        for w in workers:
+            w.join()
+
+    total = time.perf_counter() - started
+    print(f"\n{'статус':8} {'разбор':>8} {'запись':>8} {'всего':>8}  файл")
+    for i, f in enumerate(files):
+        status, t_format, t_save, t_total, message = report[i]
+        line = f"{status:8} {t_format:8.2f} {t_save:8.2f} {t_total:8.2f}  {f}"
+        print(line + (f"  ({message})" if message else ''))
+
+    counts = {s: sum(1 for r in report.values() if r[0] == s) for s in ('ok', 'error', 'skipped')}
+    print(f"\nуспешно: {counts['ok']}, ошибок: {counts['error']}, пропущено: {counts['skipped']}, "
+          f"время: {total:.2f} с, процессов: {jobs}")
+    return 1 if counts['error'] else 0
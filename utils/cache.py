@@ -0,0 +1,157 @@
+# Кэш разбора и оформления абзацев между запусками (SQLite).
+#
+# Ключ абзаца - хэш его исходного XML, тегов соседних элементов и версии кода. По ключу хранится
+# результат классификации, а для абзацев, оформление которых зависит только от них самих
+# (LOCAL_TYPES), еще и готовый XML вместе с хэшем стилей документа, при которых он получен.
+# Рисунки, таблицы и пустые абзацы зависят от соседей и сквозной нумерации, а элементы списков - от
+# numbering.xml документа (utils.numbering); они оформляются заново при каждом запуске, поэтому номера
+# всегда остаются правильными.
+
+import hashlib
+import os
+import sqlite3
+import time
+from copy import deepcopy
+
+from docx.oxml import parse_xml
+from lxml import etree
+
+# увеличивается при изменениях, которые не видны по исходникам (например, в собранном .exe)
+CACHE_VERSION = 1
+# версия структуры таблицы: база со старой структурой создается заново
+SCHEMA_VERSION = 2
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+LOCAL_TYPES = frozenset(('normal', 'heading', 'code'))
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SOURCES = ('utils/parsers.py', 'utils/converters.py', 'utils/numbering.py', 'utils/typography.py',
+            'style_configs/style_config.py')
+# сколько ключей подставляется в один запрос IN (...)
+_CHUNK = 500
+
+
+# версия кода: исходники, от которых зависят разбор и оформление, плюс CACHE_VERSION
+def code_version() -> bytes:
+    h = hashlib.blake2b(str(CACHE_VERSION).encode(), digest_size=16)
+    for name in _SOURCES:
+        try:
+            with open(os.path.join(_ROOT, name), 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            pass
+    return h.digest()
+
+
+def default_cache_dir() -> str:
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'gost-report-helper')
+
+
+class ParCache:
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        cache_dir = cache_dir or default_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(cache_dir, 'paragraphs.sqlite'), timeout=30)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            with self.conn:
+                self.conn.execute('DROP TABLE IF EXISTS pars')
+                self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS pars (key BLOB PRIMARY KEY, ptype TEXT, level INTEGER, '
+                          'flags INTEGER, style_key BLOB, xml BLOB, size INTEGER, used REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS pars_used ON pars (used)')
+
+        self.max_size = max_size
+        self.salt = code_version()
+        self.now = time.time()
+
+        # строки, прочитанные из базы и измененные за этот запуск
+        self.rows = {}
+        self.dirty = set()
+        self.hits = self.misses = 0
+
+    # extra - то, от чего кроме самого абзаца зависит его тип (формат уровня списка из numbering.xml)
+    def key(self, p, extra=None) -> bytes:
+        prev, pnext = p.getprevious(), p.getnext()
+        h = hashlib.blake2b(self.salt, digest_size=16)
+        h.update(f'{prev.tag if prev is not None else None}|{pnext.tag if pnext is not None else None}|'
+                 f'{extra}|'.encode())
+        h.update(etree.tostring(p))
+        return h.digest()
+
+    # ключи абзацев и чтение всех известных строк одним проходом по базе
+    def prepare(self, elements, extras=None) -> list[bytes]:
+        keys = [self.key(p, extra) for p, extra in zip(elements, extras or [None] * len(elements))]
+        unique = list(set(keys))
+        for i in range(0, len(unique), _CHUNK):
+            chunk = unique[i:i + _CHUNK]
+            rows = self.conn.execute(f'SELECT key, ptype, level, flags, style_key, xml FROM pars '
+                                     f'WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+            for key, *row in rows:
+                self.rows[key] = row
+        return keys
+
+    # хэш стилей документа после настройки: от него зависят идентификаторы стилей в готовом XML
+    @staticmethod
+    def style_key(doc) -> bytes:
+        return hashlib.blake2b(etree.tostring(doc.styles.element), digest_size=16).digest()
+
+    def classification(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1], row[2]
+
+    def store_classification(self, key, ptype, level, flags):
+        self.rows[key] = [ptype, level, flags, None, None]
+        self.dirty.add(key)
+
+    def formatted(self, key, style_key):
+        xml = self.formatted_xml(key, style_key)
+        return parse_xml(xml) if xml is not None else None
+
+    # то же готовым XML (bytes), без разбора
+    def formatted_xml(self, key, style_key):
+        row = self.rows.get(key)
+        if row is None or row[3] != style_key:
+            return None
+        return row[4]
+
+    def store_formatted(self, key, style_key, p):
+        row = self.rows.get(key)
+        if row is None:
+            return
+        # копия без лишних объявлений пространств имен, унаследованных от корня документа
+        p = deepcopy(p)
+        etree.cleanup_namespaces(p)
+        row[3], row[4] = style_key, etree.tostring(p)
+        self.dirty.add(key)
+
+    # запись новых строк, отметка использованных и вытеснение давно не нужных
+    def close(self):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO pars VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((k, *self.rows[k], len(self.rows[k][4] or b'') + 64, self.now)
+                 for k in self.dirty))
+            self.conn.executemany('UPDATE pars SET used = ? WHERE key = ?',
+                                  ((self.now, k) for k in self.rows.keys() - self.dirty))
+            self.evict()
+        self.conn.close()
+
+    # самые давно использованные строки удаляются, пока кэш не уложится в 80% лимита
+    def evict(self):
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pars').fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        excess, stale = total - self.max_size * 4 // 5, []
+        for key, size in self.conn.execute('SELECT key, size FROM pars ORDER BY used'):
+            if excess <= 0:
+                break
+            stale.append((key,))
+            excess -= size
+        self.conn.executemany('DELETE FROM pars WHERE key = ?', stale)
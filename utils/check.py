@@ -0,0 +1,240 @@
+# Проверка оформления .docx без форматирования и сохранения (--check).
+#
+# Читаются только word/document.xml - потоком, как в utils.streaming, без объектной модели python-docx
+# и с удалением просмотренных элементов тела, - word/styles.xml и word/numbering.xml. Каждый абзац
+# классифицируется так же, как при форматировании (DocParser), и проверяется на то, что форматирование изменило бы:
+#   style            - стиль абзаца не тот, что ГОСТ требует для его типа;
+#   style_definition - стиль ГОСТ в документе оформлен не так, как в настройках (или профиле стилей);
+#   caption_*        - подписи таблиц (над таблицей) и рисунков (под рисунком): нет подписи, не та форма
+#                      "Таблица N − Название", не то место или сбита сквозная нумерация;
+#   empty_paragraph  - пустой абзац, который форматирование удалило бы;
+#   list_marker      - элемент списка с маркером, набранным в тексте, или со списком Word не по ГОСТ
+#                      (маркер «−», номера «1)», «а)» - определения utils.numbering); нумерованный
+#                      список может быть и набран в тексте: «1)», «а)».
+# Отчет - JSON со списком нарушений по абзацам; код выхода 0 - нарушений нет, 1 - есть, 2 - файл
+# не удалось прочитать.
+
+import json
+import re
+import zipfile
+from copy import deepcopy
+
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from lxml import etree
+
+from style_configs.style_config import StyleManager, StyleNames
+from utils.converters import Converter
+from utils.numbering import BULLET, NUMBERED, gost_nums, numbering_formats
+from utils.parsers import DocParser, ParFeatures, ParseResult, FLAG_BR, FLAG_DRAWING, FLAG_PICT
+from utils.streaming import _Package, _Window, iter_body
+
+_P, _TBL = qn('w:p'), qn('w:tbl')
+_STYLE, _STYLE_ID, _NAME, _VAL, _DEFAULT = qn('w:style'), qn('w:styleId'), qn('w:name'), qn('w:val'), qn('w:default')
+
+# стиль, который форматирование назначает абзацу каждого типа (заголовки - по уровню)
+EXPECTED_STYLES = {
+    'normal': StyleNames.normal,
+    'list_bullet': StyleNames.list,
+    'list_number': StyleNames.list,
+    'code': StyleNames.code,
+    'tb_caption': StyleNames.caption,
+    'img_caption': StyleNames.caption,
+}
+HEADING_STYLES = {1: StyleNames.h1, 2: StyleNames.h2, 3: StyleNames.h3}
+
+CAPTION_RE = re.compile(r'^(?P<kind>Таблица|Рисунок) (?P<number>\d+) − (?P<name>.+)$')
+NUMBERED_ITEM_RE = re.compile(r'^[\dа-яa-z]+[).]\s+.+', re.IGNORECASE)
+EXCERPT = 60
+
+
+class _Checker:
+    def __init__(self, style_conf: StyleManager, styles, numbering):
+        self.style_conf = style_conf
+        self.parser = DocParser(None)
+        self.parser.list_formats = numbering_formats(numbering)
+        # списки Word, которые ссылаются на определения ГОСТ: numId -> BULLET или NUMBERED
+        self.gost_lists = gost_nums(numbering)
+        self.violations = []
+
+        # styleId -> имя стиля абзаца; без w:pStyle действует стиль абзаца по умолчанию
+        self.names, self.default_style = {}, None
+        if styles is not None:
+            for style in styles.iterchildren(_STYLE):
+                name = style.find(_NAME)
+                self.names[style.get(_STYLE_ID)] = name.get(_VAL) if name is not None else style.get(_STYLE_ID)
+                if style.get(qn('w:type')) == 'paragraph' and style.get(_DEFAULT) in ('1', 'true', 'on'):
+                    self.default_style = self.names[style.get(_STYLE_ID)]
+            self.check_styles(styles)
+
+        # абзацы по глобальному индексу (как у Converter.keep_empty) и пустые, ждущие следующего абзаца
+        self.data = _Window()
+        self.empty = []
+        self.tables = self.figures = 0
+        self.prev_tag = self.prev_text = None
+
+    def add(self, rule, message, **where):
+        self.violations.append({'rule': rule, 'message': message, **where})
+
+    # стили ГОСТ, которые в документе есть, сравниваются с теми, что вставило бы форматирование
+    def check_styles(self, styles):
+        by_name = {}
+        for style in styles.iterchildren(_STYLE):
+            name = style.find(_NAME)
+            if name is not None:
+                by_name.setdefault(name.get(_VAL), style)
+
+        for name, compiled in self.style_conf.template():
+            style = by_name.get(name)
+            if style is not None and _canonical(style) != _canonical(compiled):
+                self.add('style_definition', "оформление стиля отличается от настроек ГОСТ", style=name)
+
+    # el - просмотренный потомок тела, nxt - следующий за ним (None в конце тела)
+    def visit(self, el, nxt):
+        if el.tag == _TBL:
+            self.tables += 1
+            text = self.prev_text if self.prev_tag == _P else None
+            after = nxt.text.strip() if nxt is not None and nxt.tag == _P else None
+            self.check_caption('Таблица', self.tables, text, after, table=self.tables)
+        elif el.tag == _P:
+            self.visit_paragraph(el, nxt)
+
+        self.prev_tag = el.tag
+        self.prev_text = el.text.strip() if el.tag == _P else None
+
+    def visit_paragraph(self, el, nxt):
+        f = ParFeatures(el, neighbours=(self.prev_tag, nxt.tag if nxt is not None else None))
+        pt, lvl = self.parser.determine_type(f)
+        if pt == 'normal':
+            # подписи, которые пишет само форматирование ("Рисунок N − ..." вне соседства с рисунком),
+            # классификатор входных файлов не узнает
+            m = CAPTION_RE.match(f.text)
+            if m is not None:
+                pt = 'img_caption' if m['kind'] == 'Рисунок' else 'tb_caption'
+        c = ParseResult(pt, lvl, el, len(self.data), f.flags)
+        c.section = self.parser.cur_section = self.parser.det_section(c)
+        where = {'paragraph': c.index, 'type': pt, 'section': c.section, 'text': f.text[:EXCERPT]}
+
+        self.data.append(c)
+        for k in self.empty:
+            self.check_empty(k)
+        self.empty = []
+        self.data.trim(c.index - 1)
+
+        expected = HEADING_STYLES.get(lvl) if pt == 'heading' else EXPECTED_STYLES.get(pt)
+        actual = self.names.get(f.style, f.style) if f.style else self.default_style
+        # короткий код и формулы классификатор от текста не отличает: их стиль ГОСТ, заданный автором, верен
+        if pt == 'normal' and actual in (StyleNames.code, StyleNames.formula):
+            expected = actual
+        if expected is not None and actual != expected:
+            self.add('style', f"стиль «{actual}», нужен «{expected}»", **where)
+
+        # элемент списка Word (numId 0 снимает нумерацию)
+        word_list = f.num_pr and f.num_id != '0'
+        if pt == 'image' or pt == 'empty' and c.flags & (FLAG_DRAWING | FLAG_PICT):
+            self.figures += 1
+            text = nxt.text.strip() if nxt is not None and nxt.tag == _P else None
+            before = self.prev_text if self.prev_tag == _P else None
+            self.check_caption('Рисунок', self.figures, text, before, figure=self.figures, paragraph=c.index)
+        elif pt == 'empty' and not c.flags & FLAG_BR:
+            self.empty.append(c.index)
+        elif pt == 'list_bullet':
+            if not word_list:
+                self.add('list_marker', "маркер набран в тексте, нужен маркированный список ГОСТ", **where)
+            elif self.gost_lists.get(f.num_id) != BULLET:
+                self.add('list_marker', "маркер списка Word не по ГОСТ, нужен «−»", **where)
+        elif pt == 'list_number':
+            if word_list and self.gost_lists.get(f.num_id) != NUMBERED:
+                self.add('list_marker', "нумерация списка Word не по ГОСТ, нужны номера «1)», «а)»", **where)
+            elif not word_list and not NUMBERED_ITEM_RE.match(f.text):
+                self.add('list_marker', "номер элемента списка должен быть в тексте: «1)», «а)»", **where)
+
+    # пустой абзац проверяется, когда известен следующий за ним абзац (или что его нет)
+    def check_empty(self, index):
+        if not Converter.keep_empty(index, self.data):
+            self.add('empty_paragraph', "лишний пустой абзац", paragraph=index, section=self.data[index].section)
+
+    # text - абзац на месте подписи (над таблицей, под рисунком), other - с другой стороны от элемента
+    def check_caption(self, kind, number, text, other, **where):
+        m = CAPTION_RE.match(text or '')
+        if m is not None and m['kind'] == kind:
+            if int(m['number']) != number:
+                self.add('caption_number', f"номер подписи {m['number']}, нужен {number}", text=text[:EXCERPT], **where)
+            elif m['name'].strip() == '[]':
+                self.add('caption_missing', "подпись без названия", text=text[:EXCERPT], **where)
+        elif text and text.startswith(kind):
+            self.add('caption_format', f"подпись не по форме «{kind} {number} − Название»", text=text[:EXCERPT],
+                     **where)
+        elif other and other.startswith(kind):
+            place = "над таблицей" if kind == 'Таблица' else "под рисунком"
+            self.add('caption_position', f"подпись должна быть {place}", text=other[:EXCERPT], **where)
+        else:
+            self.add('caption_missing', "нет подписи", **where)
+
+    def run(self, stream):
+        body = pending = None
+        for event, el in iter_body(stream):
+            if event == 'body':
+                body = el
+            elif event == 'child' and el.getparent() is body:
+                if pending is not None:
+                    self.visit(pending, el)
+                    body.remove(pending)
+                pending = el
+            elif event == 'child':
+                el.getparent().remove(el)
+            elif event == 'body_end' and pending is not None:
+                self.visit(pending, None)
+                body.remove(pending)
+        for k in self.empty:
+            self.check_empty(k)
+
+
+def _canonical(style) -> bytes:
+    style = deepcopy(style)
+    style.attrib.pop(_STYLE_ID, None)
+    return etree.tostring(style, method='c14n')
+
+
+# отчет о проверке одного .docx: число абзацев, таблиц, рисунков и нарушения
+def check_document(path: str, style_conf: StyleManager = None) -> dict:
+    style_conf = style_conf or StyleManager()
+    with zipfile.ZipFile(path) as zin:
+        pkg = _Package(zin)
+        styles_name = pkg.part_by_type(RT.STYLES)
+        styles = etree.fromstring(zin.read(styles_name)) if styles_name in pkg.names else None
+        numbering_name = pkg.part_by_type(RT.NUMBERING)
+        numbering = etree.fromstring(zin.read(numbering_name)) if numbering_name in pkg.names else None
+        checker = _Checker(style_conf, styles, numbering)
+        with zin.open(pkg.main) as src:
+            checker.run(src)
+
+    counts = {}
+    for v in checker.violations:
+        counts[v['rule']] = counts.get(v['rule'], 0) + 1
+    return {'file': path, 'ok': not checker.violations, 'paragraphs': len(checker.data), 'tables': checker.tables,
+            'figures': checker.figures, 'counts': counts, 'violations': checker.violations}
+
+
+# проверка файлов с выводом JSON: один файл - отчет целиком, несколько - по строке на файл (JSON Lines).
+# Возвращает код выхода: 0 - нарушений нет, 1 - есть, 2 - хотя бы один файл не прочитан.
+# cache_dir - каталог кэша скомпилированных стилей (см. StyleManager) или None
+def run_check(files, styles=None, cache_dir=None) -> int:
+    try:
+        style_conf = StyleManager(styles, cache_dir)
+    except (OSError, ValueError) as e:
+        print(f"ошибка: {e}")
+        return 2
+
+    code = 0
+    for path in files:
+        try:
+            if not path.lower().endswith('.docx'):
+                raise ValueError("проверяются только файлы .docx")
+            report = check_document(path, style_conf)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile, etree.XMLSyntaxError) as e:
+            report, code = {'file': path, 'ok': False, 'error': str(e)}, 2
+        else:
+            code = max(code, 0 if report['ok'] else 1)
+        print(json.dumps(report, ensure_ascii=False, indent=1 if len(files) == 1 else None))
+    return code
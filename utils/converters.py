@@ -1,187 +1,323 @@
 from style_configs.style_config import StyleNames, StyleManager
 from docx.document import Document
 from docx import Document as Doc
+import logging
 import re
-from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_TABLE_ALIGNMENT, WD_ROW_HEIGHT_RULE
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from functools import cached_property, lru_cache
+from types import SimpleNamespace
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.enum.section import WD_ORIENTATION
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.shared import Pt, Cm
-from docx.oxml import parse_xml, OxmlElement
+from docx.shared import Pt, Cm, Emu, Length
+from docx.oxml import OxmlElement, parse_xml
 from docx.oxml.ns import qn
 from docx.text.paragraph import Paragraph
+from lxml import etree
+from utils.cache import LOCAL_TYPES, ParCache
+from utils.images import ImageOptions, optimize_images
+from utils.inline import append_runs
+from utils.numbering import ListNumbering, list_item, numbering_part, register_lists
+from utils.package import save_document
+from utils.parsers import DocParser, ParFeatures, ParseResult, FLAG_BR, FLAG_DRAWING, FLAG_PICT
+from utils.profiling import profiler
+from utils.typography import normalize_paragraph
 
-def normalize_text(text: str) -> str:
-    if not text:
-        return text
+log = logging.getLogger(__name__)
 
-    text = re.sub(r'"([^"]*)"', r'«\1»', text)
-    text = re.sub(r'(\d+)-(\d+)', r'\1—\2', text)
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'(\s)г\.(\s)', r'\1г.\2', text)
-    text = re.sub(r'(\s)см\.(\s)', r'\1см.\2', text)
-    text = re.sub(r'(\s)т\.\s*д\.(\s)', r'\1т.д.\2', text)
-    text = re.sub(r'(\s)т\.\s*п\.(\s)', r'\1т.п.\2', text)
 
-    return text.strip()
+_T, _P_PR, _TR_PR, _TBL_PR_EX, _TC_PR, _TC_MAR = (qn(f'w:{n}') for n in ('t', 'pPr', 'trPr', 'tblPrEx', 'tcPr', 'tcMar'))
+_TC, _R_PR = qn('w:tc'), qn('w:rPr')
+_P, _TBL, _SECT_PR = qn('w:p'), qn('w:tbl'), qn('w:sectPr')
+# маркер, набранный в начале текста элемента маркированного списка (см. DocParser.LIST_BULLET_RE)
+_BULLET_MARKERS = frozenset('-*+•−')
+_V_ALIGN_SUCCESSORS = {qn(f'w:{n}') for n in ('hideMark', 'headers', 'cellIns', 'cellDel', 'cellMerge', 'tcPrChange')}
+
+# с какого числа абзацев тело документа форматируется по главам на пуле процессов (см. Converter.shards)
+SHARD_MIN = 5000
+
+
+# подпись, набранная автором: "Таблица 2 - ", "Рис. А.3. ", "Таблица: " и т. п. перед названием
+_CAPTION_NAME_RE = re.compile(r'^(?:Таблица|Рисунок|Рис\.)\s*(?:[A-ZА-Я]?\s*\.?\d+(?:\.\d+)*)?\s*[:.\-−—]?'
+                              r'\s*(?P<name>.*)$', re.IGNORECASE)
+_FIGURE_CAPTION_RE = re.compile(r'^(?:Рисунок|Рис\.)', re.IGNORECASE)
+
+
+# название из подписи автора; номер не переносится - сквозную нумерацию ставит форматирование.
+# "[]" - названия нет
+def caption_name(text: str) -> str:
+    m = _CAPTION_NAME_RE.match(text.strip())
+    return m['name'].strip() if m is not None and m['name'].strip() else '[]'
+
+
+# неизменяемые фрагменты оформления таблиц: строятся один раз, в таблицы вставляются копии
+@lru_cache
+def table_fragments(border_size, row_height):
+    borders = OxmlElement('w:tblBorders')
+    for border_name in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
+        borders.append(OxmlElement(f'w:{border_name}', attrs={
+            qn('w:val'): 'single', qn('w:sz'): str(border_size), qn('w:space'): '0', qn('w:color'): '000000'}))
+
+    cell_mar = OxmlElement('w:tblCellMar')
+    for side in ['left', 'right']:
+        cell_mar.append(OxmlElement(f'w:{side}', attrs={qn('w:w'): '100', qn('w:type'): 'dxa'}))
+
+    tr_height = OxmlElement('w:trHeight', attrs={qn('w:val'): str(Emu(row_height).twips), qn('w:hRule'): 'atLeast'})
+    v_align = OxmlElement('w:vAlign', attrs={qn('w:val'): 'center'})
+    return borders, cell_mar, tr_height, v_align
+
+
+# ячейки строки таблицы Markdown: крайние | необязательны, пустая ячейка (||) остается на своем месте
+def md_cells(line: str) -> list[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
 
 class Converter:
-    def __init__(self, doc: Document, data: list, output_path: str):
-        # главные параметры: объект документа, данные парсинга и место для сохранения
+    NUMBER_RE = re.compile(r"\d+")
+
+    # лист A4 и поля по ГОСТ; ширина текста ограничивает ширину рисунков (см. utils.images)
+    PAGE_WIDTH, PAGE_HEIGHT = Cm(21), Cm(29.7)
+    LEFT_MARGIN, RIGHT_MARGIN, TOP_MARGIN, BOTTOM_MARGIN = Cm(3), Cm(1.5), Cm(2), Cm(2)
+    TEXT_WIDTH = PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN
+
+    def __init__(self, doc: Document, data: list, output_path: str, style_conf: StyleManager = None,
+                 cache: ParCache = None, source: str = None, compression: int = None, jobs: int = None,
+                 images: ImageOptions = None, table_align: dict = None):
+        # место для сохранения; объект документа и данные парсинга - в _init_formatting
+        self.output_path = output_path
+
+        # исходный .docx, из которого при сохранении копируются неизмененные части (см. utils.package),
+        # уровень сжатия остальных и число потоков для их сжатия
+        self.source = source
+        self.compression = compression
+        self.jobs = jobs
+
+        # оптимизация рисунков (DPI и качество) или None; отчет о ней - после format()
+        self.images = images
+        self.image_report = None
+
+        # объект класса стилей (в пакетном режиме один на процесс)
+        style_conf = style_conf or StyleManager()
+        with profiler.stage('setup_styles', doc.styles.element):
+            style_conf.setup_styles(doc)
+        # определения списков ГОСТ в numbering.xml (utils.numbering); кэш между запусками: готовый XML абзаца
+        # годится только при тех же стилях документа
+        self._init_formatting(doc, data, style_conf, register_lists(numbering_part(doc, create=True).element),
+                              cache, cache.style_key(doc) if cache is not None else None, table_align)
+
+    # состояние форматирования тела, общее для документа целиком, его кусков в пуле (_ShardConverter)
+    # и потокового режима (utils.streaming.StreamConverter)
+    def _init_formatting(self, doc, data, style_conf, lists=None, cache=None, style_key=None, table_align=None,
+                         img_counter=1):
         self.doc = doc
         self.data = data
-        self.output_path = output_path
+        self.style_conf = style_conf
+        self.lists = lists
+        # выравнивание столбцов таблиц, заданное во входном файле (w:tbl -> список, None - по содержимому)
+        self.table_align = table_align or {}
+        self.cache = cache
+        self.style_key = style_key
 
-        # объект класса стилей
-        self.style_conf = StyleManager()
-        self.style_conf.setup_styles(self.doc)
+        # родитель для новых абзацев (подписей), еще не вставленных в документ
+        self._story = doc._body if doc is not None else None
 
         # переменные для сквозной нумерации (для таблиц не надо)
-        self.img_counter = 1
+        self.img_counter = img_counter
         self.formula_counter = 1
 
+    # новый абзац вне документа: его вставляют на нужное место сами методы форматирования
+    def _new_par(self, text=None) -> Paragraph:
+        par = Paragraph(OxmlElement('w:p'), self._story)
+        if text:
+            par.add_run(text)
+        return par
+
     def format_pages(self):
         for i, page in enumerate(self.doc.sections):
-            page.page_height = Cm(29.7)
-            page.page_width = Cm(21)
-            page.orientation = WD_ORIENTATION.PORTRAIT
-            page.top_margin = Cm(2)
-            page.bottom_margin = Cm(2)
-            page.left_margin = Cm(3)
-            page.right_margin = Cm(1.5)
+            self.conf_section(page)
 
             if i > 0:
-                p = page.footer.add_paragraph()
-                p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                p.style = StyleNames.normal
-                p.paragraph_format.first_line_indent = Cm(0)
-                p.paragraph_format.left_indent = Cm(0)
+                self.add_page_number(page.footer.add_paragraph())
+
+    @classmethod
+    def conf_section(cls, page):
+        page.page_height = cls.PAGE_HEIGHT
+        page.page_width = cls.PAGE_WIDTH
+        page.orientation = WD_ORIENTATION.PORTRAIT
+        page.top_margin = cls.TOP_MARGIN
+        page.bottom_margin = cls.BOTTOM_MARGIN
+        page.left_margin = cls.LEFT_MARGIN
+        page.right_margin = cls.RIGHT_MARGIN
 
-                run = p.add_run()
+    @staticmethod
+    def add_page_number(p: Paragraph):
+        p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        p.style = StyleNames.normal
+        p.paragraph_format.first_line_indent = Cm(0)
+        p.paragraph_format.left_indent = Cm(0)
 
-                fld_char_begin = OxmlElement('w:fldChar')
-                fld_char_begin.set(qn('w:fldCharType'), 'begin')
+        run = p.add_run()
 
-                instr_text = OxmlElement('w:instrText')
-                instr_text.set(qn('xml:space'), 'preserve')
-                instr_text.text = 'PAGE'
+        fld_char_begin = OxmlElement('w:fldChar')
+        fld_char_begin.set(qn('w:fldCharType'), 'begin')
 
-                fld_char_end = OxmlElement('w:fldChar')
-                fld_char_end.set(qn('w:fldCharType'), 'end')
+        instr_text = OxmlElement('w:instrText')
+        instr_text.set(qn('xml:space'), 'preserve')
+        instr_text.text = 'PAGE'
 
-                run._element.append(fld_char_begin)
-                run._element.append(instr_text)
-                run._element.append(fld_char_end)
+        fld_char_end = OxmlElement('w:fldChar')
+        fld_char_end.set(qn('w:fldCharType'), 'end')
 
-    # форматирование таблиц
-    def format_tables(self):
-        for i, tb in enumerate(self.doc.tables, 1):
-            elem = tb._element
-            tb.alignment = WD_TABLE_ALIGNMENT.CENTER
+        run._element.append(fld_char_begin)
+        run._element.append(instr_text)
+        run._element.append(fld_char_end)
 
-            parent = elem.getparent()
-            prev, pnext = elem.getprevious(), elem.getnext()
+    # форматирование таблиц; start - номер первой таблицы
+    def format_tables(self, start=1):
+        for i, tb in enumerate(self.doc.tables, start):
+            self.format_table(tb, i)
 
-            if prev is not None and (prev.tag.endswith('p') and "таблица" in
-                     prev.text.lower()):
-                text = prev.text
+    def format_table(self, tb, i):
+        elem = tb._element
+        tb.alignment = WD_TABLE_ALIGNMENT.CENTER
 
-                tname = re.findall(r"^Таблица[\s:\-−.]?(.+)", text)
-                if tname:
-                    fcap = self.doc.add_paragraph(text=f"Таблица {i} − {tname[0].strip()}")
-                else:
-                    fcap = self.doc.add_paragraph(text=f"Таблица {i} − []")
-
-                fcap.style = StyleNames.caption
-                parent.insert(parent.index(prev), fcap._element)
-                parent.remove(prev)
-            elif pnext is not None and (pnext.tag.endswith('p') and "таблица" in
-                    pnext.text.lower()):
-                text = pnext.text
-
-                tname = re.findall(r"^Таблица[\s:\-.]?(.+)", text)
-                if tname:
-                    fcap = self.doc.add_paragraph(text=f"Таблица {i} − {tname[0].strip()}")
-                else:
-                    fcap = self.doc.add_paragraph(text=f"Таблица {i} − []")
+        # подписи вставляются рядом с элементом по связям соседей (addprevious/addnext), без поиска
+        # позиции в теле: на документах с сотнями таблиц и рисунков index/insert давали O(n^2)
+        parent = elem.getparent()
+        prev, pnext = elem.getprevious(), elem.getnext()
 
-                fcap.style = StyleNames.caption
-                parent.insert(parent.index(elem), fcap._element)
-                parent.remove(pnext)
+        if prev is not None and (prev.tag.endswith('p') and "таблица" in
+                 prev.text.lower()):
+            fcap = self._new_par(f"Таблица {i} − {caption_name(prev.text)}")
+            fcap.style = StyleNames.caption
+            prev.addprevious(fcap._element)
+            parent.remove(prev)
+        elif pnext is not None and (pnext.tag.endswith('p') and "таблица" in
+                pnext.text.lower()):
+            fcap = self._new_par(f"Таблица {i} − {caption_name(pnext.text)}")
+            fcap.style = StyleNames.caption
+            elem.addprevious(fcap._element)
+            parent.remove(pnext)
+        else:
+            fcap = self._new_par(f"Таблица {i} − []")
+            fcap.style = StyleNames.caption
+            elem.addprevious(fcap._element)
+
+        fcap.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
+
+        conf = self.style_conf.tb_conf
+        borders, cell_mar, tr_height, v_align = table_fragments(conf.get("border_size"), conf.get("row_height"))
+
+        # границы и поля ячеек по умолчанию задаются на уровне таблицы, поля отдельных ячеек снимаются
+        tbl_pr = elem.tblPr
+        for tag in ('w:tblBorders', 'w:tblCellMar'):
+            for old in tbl_pr.findall(qn(tag)):
+                tbl_pr.remove(old)
+        tbl_pr.insert_element_before(deepcopy(borders), 'w:shd', 'w:tblLayout', 'w:tblCellMar', 'w:tblLook',
+                                     'w:tblCaption', 'w:tblDescription', 'w:tblPrChange')
+        tbl_pr.insert_element_before(deepcopy(cell_mar), 'w:tblLook', 'w:tblCaption', 'w:tblDescription',
+                                     'w:tblPrChange')
+
+        style_id = tb.part.get_style_id(StyleNames.tb_item, WD_STYLE_TYPE.PARAGRAPH)
+        tr_pr_tmpl, tc_pr_tmpl = OxmlElement('w:trPr'), OxmlElement('w:tcPr')
+        tr_pr_tmpl.append(deepcopy(tr_height))
+        tc_pr_tmpl.append(deepcopy(v_align))
+
+        # абзацы ячеек: (элемент, столбец сетки или None для строки заголовка)
+        cells = []
+        for ix, tr in enumerate(elem.tr_lst):
+            # быстрый путь - вставка готовой копии; python-docx нужен, только если свойства уже заданы
+            tr_pr = tr.find(_TR_PR)
+            if tr_pr is None:
+                tr.insert(1 if len(tr) and tr[0].tag == _TBL_PR_EX else 0, deepcopy(tr_pr_tmpl))
             else:
-                fcap = self.doc.add_paragraph()
-                fcap.style = StyleNames.caption
-                fcap.add_run(f"Таблица {i} − []")
-                parent.insert(parent.index(elem), fcap._element)
-
-            fcap.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            tbl_pr = tb._element.tblPr
-
-            borders_xml = f'<w:tblBorders xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
-            for border_name in ['top', 'left', 'bottom', 'right', 'insideH', 'insideV']:
-                borders_xml += (f'<w:{border_name} w:val="single" w:sz="{self.style_conf.tb_conf.get("border_size")}" '
-                                f'w:space="0" w:color="000000"/>')
-            borders_xml += '</w:tblBorders>'
-
-            for b in tbl_pr.xpath('.//w:tblBorders'):
-                b.getparent().remove(b)
-
-            tbl_pr.append(parse_xml(borders_xml))
-
-            for ix, row in enumerate(tb.rows):
-                row.height = self.style_conf.tb_conf.get("row_height")
-                row.height_rule = WD_ROW_HEIGHT_RULE.AT_LEAST
-
-                for cell in row.cells:
-                    tc_pr = cell._element.tcPr
-                    cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-                    mar = tc_pr.find(qn("w:tcMar"))
+                tr_pr._remove_trHeight()
+                tr_pr._insert_trHeight(deepcopy(tr_height))
+
+            col = tr.grid_before
+            for tc in tr.tc_lst:
+                tc_pr = tc[0] if len(tc) and tc[0].tag == _TC_PR else None
+                if tc_pr is None:
+                    tc.insert(0, deepcopy(tc_pr_tmpl))
+                else:
+                    mar = tc_pr.find(_TC_MAR)
                     if mar is not None:
                         tc_pr.remove(mar)
+                    tc_pr._remove_vAlign()
+                    if len(tc_pr) and tc_pr[-1].tag in _V_ALIGN_SUCCESSORS:
+                        tc_pr._insert_vAlign(deepcopy(v_align))
+                    else:
+                        tc_pr.append(deepcopy(v_align))
+
+                for p in tc.p_lst:
+                    par = Paragraph(p, tb)
+                    normalize_paragraph(par)
+                    if ix == 0:
+                        for r in par.runs:
+                            r.bold = True
+                    cells.append((p, None if ix == 0 else col))
+                col += tc.grid_span
+
+        # выравнивание выбирается один раз на столбец: заданное во входном файле (строка-разделитель
+        # Markdown) или по содержимому - числовой столбец (все непустые ячейки начинаются с цифры) вправо
+        align = self.table_align.get(elem, ())
+        numeric = {}
+        for p, col in cells:
+            if col is not None and col < len(align) and align[col] is not None:
+                continue
+            if col is not None and numeric.get(col, True) is not False:
+                text = ''.join(p.itertext(_T))
+                if text:
+                    numeric[col] = bool(self.NUMBER_RE.match(text))
+
+        templates = {}
+        for jc in (WD_PARAGRAPH_ALIGNMENT.CENTER, WD_PARAGRAPH_ALIGNMENT.RIGHT, WD_PARAGRAPH_ALIGNMENT.LEFT):
+            templates[jc] = OxmlElement('w:pPr')
+            templates[jc].style = style_id
+            templates[jc].jc_val = jc
+
+        for p, col in cells:
+            if col is None:
+                jc = WD_PARAGRAPH_ALIGNMENT.CENTER
+            elif col < len(align) and align[col] is not None:
+                jc = align[col]
+            elif numeric.get(col):
+                jc = WD_PARAGRAPH_ALIGNMENT.RIGHT
+            else:
+                jc = WD_PARAGRAPH_ALIGNMENT.LEFT
 
-                    mar = OxmlElement("w:tcMar")
-                    for side in ['left', 'right']:
-                        mr_e = OxmlElement(f"w:{side}")
-                        mr_e.set(qn("w:w"), "100")
-                        mr_e.set(qn("w:type"), "dxa")
-
-                        mar.append(mr_e)
-                    tc_pr.append(mar)
-
-                    for p in cell.paragraphs:
-                        p.style = StyleNames.tb_item
-
-                        nt = normalize_text(p.text)
-                        if nt:
-                            p.text = nt
-                        if ix == 0:
-                            p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            for r in p.runs:
-                                r.bold = True
-                        else:
-                            if re.match(r"\d+", p.text):
-                                p.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                            else:
-                                p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-
-    def format_doc(self, c):
-
-        if "heading" in c["ptype"]:
-            self.format_headings(c["par"], c["level"])
-        if c["ptype"] == 'list_bullet':
-            print(c["par"].text)
-            self.format_bullet(c["par"])
-        if c["ptype"] == "list_number":
-            print(c["par"].text)
-            self.format_numbered(c["par"])
-        if c["ptype"] == "normal":
-            self.format_normal(c["par"])
-        if c["ptype"] == 'image':
-            self.format_image(c["par"])
-        if c["ptype"] == "code":
-            self.format_code(c["par"])
-        if c["ptype"] == "empty":
-            self.format_empty(c["par"], c["index"])
+            if len(p) and p[0].tag == _P_PR:
+                p[0].style = style_id
+                p[0].jc_val = jc
+            else:
+                p.insert(0, deepcopy(templates[jc]))
+
+    def format_doc(self, c: ParseResult):
+        par = Paragraph(c.el, self._story)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s (%s): %s", c.ptype, c.level, par.text)
+
+        if "heading" in c.ptype:
+            self.format_headings(par, c.level)
+        if c.ptype == 'list_bullet':
+            self.format_bullet(par)
+        if c.ptype == "list_number":
+            self.format_numbered(par)
+        if c.ptype == "normal":
+            self.format_normal(par)
+        if c.ptype == 'image':
+            self.format_image(par)
+        if c.ptype == "code":
+            self.format_code(par)
+        if c.ptype == "empty":
+            self.format_empty(par, c)
 
     @staticmethod
     def format_code(par: Paragraph):
@@ -215,43 +351,59 @@ class Converter:
             if dig.endswith('.'):
                 par.text = dig[:-1] + ' ' + text.capitalize()
 
-        nt = normalize_text(par.text)
-        if nt:
-            par.text = nt
+        normalize_paragraph(par)
 
+    # элемент маркированного списка ссылается на маркер ГОСТ; маркер, набранный в тексте, убирается
+    def format_bullet(self, par: Paragraph):
+        p = par._p
+        num_id, ilvl = list_item(p)
+        if num_id is None:
+            self.strip_marker(p)
+        p.style = self.list_style_id
+        self.set_numbering(p, self.lists.bullet, ilvl)
+
+        normalize_paragraph(par)
+
+    # styleId стиля списков: python-docx ищет стиль по имени заново для каждого абзаца
+    @cached_property
+    def list_style_id(self):
+        return self._story.part.get_style_id(StyleNames.list, WD_STYLE_TYPE.PARAGRAPH)
+
+    # элемент списка ссылается на определение ГОСТ одним w:numPr; отступы задает уровень списка
     @staticmethod
-    def format_bullet(par: Paragraph):
-        p_elem = par._element
-        p_pr = p_elem.get_or_add_pPr()
-        for elem_name in ['numPr', 'numId', 'ilvl', 'numbering']:
-            elem = p_pr.find(qn(f'w:{elem_name}'))
-            if elem is not None:
-                p_pr.remove(elem)
-        if p_pr.numPr is not None:
-            p_pr.remove(p_pr.numPr)
-        par.style = StyleNames.list
-        par.paragraph_format.first_line_indent = Cm(0)
-        par.paragraph_format.left_indent = Cm(1.25)
-
-        nt = normalize_text(par.text)
-        if nt:
-            par.text = nt
-
-        text = par.text.strip()
-        if text and not text.startswith('− '):
-            for run in par.runs:
-                run.text = ""
-            par.add_run('− ' + re.sub(r"^[*•\-]\s?", "", text))
-
-    def format_empty(self, p, index):
-        if ('<w:drawing' in p._element.xml) or ('<w:pict' in p._element.xml):
+    def set_numbering(p, num_id, ilvl):
+        p_pr = p.get_or_add_pPr()
+        p_pr._remove_numPr()
+        p_pr._remove_ind()
+        p_pr._insert_numPr(ListNumbering.num_pr(num_id, ilvl))
+
+    # первый непробельный знак текста, если это маркер и за ним пробел (или конец прогона): "-5" - не
+    # маркер. Пробелы после маркера убирает normalize_paragraph, остальные прогоны не меняются
+    @staticmethod
+    def strip_marker(p):
+        for t in p.iter(_T):
+            text = t.text or ''
+            stripped = text.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] in _BULLET_MARKERS and (len(stripped) == 1 or stripped[1].isspace()):
+                t.text = text[:len(text) - len(stripped)] + stripped[1:]
+                # прогон, в котором был только маркер, не нужен
+                run = t.getparent()
+                if not t.text.strip() and all(child is t or child.tag == _R_PR for child in run):
+                    run.getparent().remove(run)
+            return
+
+    # пустой абзац: признаки рисунка и разрыва известны из разбора (ParseResult.flags)
+    def format_empty(self, p: Paragraph, c: ParseResult):
+        if c.flags & (FLAG_DRAWING | FLAG_PICT):
             self.format_image(p)
             return
 
-        if "w:br" in p._element.xml:
+        if c.flags & FLAG_BR:
             return
 
-        if not self.keep_empty(index, self.data):
+        if not self.keep_empty(c.index, self.data):
             p_element = p._element
             p_element.getparent().remove(p_element)
 
@@ -260,31 +412,35 @@ class Converter:
         if index in [0, len(allp) - 1]:
             return False
 
-        if (((None, allp[index - 1]['ptype'])[index > 0], (None, allp[index + 1]['ptype'])[index < len(allp) - 1]) in
+        if (((None, allp[index - 1].ptype)[index > 0], (None, allp[index + 1].ptype)[index < len(allp) - 1]) in
                 [('header', 'normal'),
                  ('header', 'header'),
                  ('caption', 'normal')]):
             return True
         return False
 
+    # элемент нумерованного списка Word ссылается на свой список ГОСТ; номер, набранный в тексте, остается
     def format_numbered(self, par: Paragraph):
-        par.style = StyleNames.list
-
-        if not re.match(r'^[\dа-яa-z]+[).]\s+.+', par.text, re.IGNORECASE):
+        p = par._p
+        num_id, ilvl = list_item(p)
+        target = self.lists.number(num_id) if num_id is not None else None
+        if target is not None:
+            p.style = self.list_style_id
+            self.set_numbering(p, target, ilvl)
+        elif num_id is not None or not re.match(r'^[\dа-яa-z]+[).]\s+.+', par.text, re.IGNORECASE):
             self.format_bullet(par)
+            return
+        else:
+            p.style = self.list_style_id
 
-        nt = normalize_text(par.text)
-        if nt:
-            par.text = nt
+        normalize_paragraph(par)
 
     @staticmethod
     def format_normal(par: Paragraph):
         par.style = StyleNames.normal
         par.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.JUSTIFY
 
-        nt = normalize_text(par.text)
-        if nt:
-            par.text = nt
+        normalize_paragraph(par)
 
     def format_image(self, par: Paragraph):
         elem = par._element
@@ -292,32 +448,21 @@ class Converter:
         prev, pnext = elem.getprevious(), elem.getnext()
         parent = elem.getparent()
 
-        if prev is not None and (prev.tag.endswith('p') and
-                re.match(r"^Рисунок|Рис\.\s.+", prev.text.lower())):
-            text = prev.text
-
-            tname = re.findall(r"^(?:Рисунок|Рис\.)[\s:\-.]?(.+)", text)
-            if tname:
-                fcap = self.doc.add_paragraph(text=f"Таблица {self.img_counter} − {tname[0].strip()}")
-            else:
-                fcap = self.doc.add_paragraph(text=f"Таблица {self.img_counter} − []")
-            parent.insert(parent.index(elem) + 1, fcap._element)
-            parent.remove(prev)
-        elif pnext is not None and (pnext.tag.endswith('p') and
-              re.match(r"^Рисунок|Рис\.\s.+", pnext.text.lower())):
-            text = pnext.text
-
-            tname = re.findall(r"^(?:Рисунок|Рис\.)[\s:\-.]?(.+)", text)
-            if tname:
-                fcap = self.doc.add_paragraph(text=f"Рисунок {self.img_counter} − {tname[0].strip()}")
-            else:
-                fcap = self.doc.add_paragraph(text=f"Рисунок {self.img_counter} − []")
-            parent.insert(parent.index(elem) + 1, fcap._element)
+        # подпись ставится под рисунком: сначала берется подпись под ним, затем над ним, если это не
+        # уже оформленная подпись предыдущего рисунка
+        caption_id = self._story.part.get_style_id(StyleNames.caption, WD_STYLE_TYPE.PARAGRAPH)
+        if pnext is not None and pnext.tag == _P and _FIGURE_CAPTION_RE.match(pnext.text):
+            fcap = self._new_par(f"Рисунок {self.img_counter} − {caption_name(pnext.text)}")
+            elem.addnext(fcap._element)
             parent.remove(pnext)
+        elif (prev is not None and prev.tag == _P and _FIGURE_CAPTION_RE.match(prev.text)
+              and prev.style != caption_id):
+            fcap = self._new_par(f"Рисунок {self.img_counter} − {caption_name(prev.text)}")
+            elem.addnext(fcap._element)
+            parent.remove(prev)
         else:
-            fcap = self.doc.add_paragraph()
-            fcap.add_run(f"Рисунок {self.img_counter} − []")
-            parent.insert(parent.index(elem) + 1, fcap.element)
+            fcap = self._new_par(f"Рисунок {self.img_counter} − []")
+            elem.addnext(fcap._element)
 
         fcap.paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
         fcap.style = StyleNames.caption
@@ -328,14 +473,181 @@ class Converter:
 
         self.img_counter += 1
 
-    def start(self):
-        self.format_pages()
-        self.format_tables()
+    def format(self):
+        body = self.doc.element
+        profiler.count_types(self.data)
+        with profiler.stage('format_pages', body):
+            self.format_pages()
+
+        # пул только по явной просьбе (-j N): его запуск окупается не на всех документах и машинах
+        jobs = self.jobs or 1
+        shards = self.shards(2 * jobs) if jobs > 1 and len(self.data) >= SHARD_MIN else None
+        if shards:
+            with profiler.stage('format_shards', body):
+                self.format_shards(shards, jobs)
+        else:
+            with profiler.stage('format_tables', body):
+                self.format_tables()
+
+            with profiler.stage('format_paragraphs', body):
+                self.format_paragraphs()
+
+        if self.images is not None:
+            with profiler.stage('optimize_images'):
+                self.image_report = optimize_images(self.doc, self.images, self.TEXT_WIDTH, self.jobs)
 
+    def format_paragraphs(self):
         for c in self.data:
+            if self.cache is not None and c.ptype in LOCAL_TYPES and c.key:
+                self.format_cached(c)
+            else:
+                self.format_doc(c)
+
+    # деление тела на count примерно равных по числу абзацев кусков из целых глав: [(элементы тела,
+    # их ParseResult)] или None, если делить нечего. Глава начинается заголовком 1 уровня, перед которым
+    # обычный абзац: форматирование таблиц, рисунков и пустых абзацев смотрит на соседей, и через такую
+    # границу ни один кусок не заглядывает в другой
+    def shards(self, count):
+        children = [el for el in self.doc.element.body if el.tag != _SECT_PR]
+        cuts, k = [(0, 0)], 0
+        for pos, el in enumerate(children):
+            if el.tag != _P:
+                continue
+            # разбор мог прерваться на ошибке - тогда абзацы тела и данные разбора не совпадают
+            if k >= len(self.data) or self.data[k].el is not el:
+                return None
+            c = self.data[k]
+            if (c.ptype == 'heading' and c.level == 1 and k and children[pos - 1] is self.data[k - 1].el
+                    and self.data[k - 1].ptype not in ('empty', 'image')):
+                cuts.append((pos, k))
+            k += 1
+        if k != len(self.data):
+            return None
+
+        shards, target = [], len(self.data) / count
+        for (pos, k), (next_pos, next_k) in zip(cuts, cuts[1:] + [(len(children), len(self.data))]):
+            if shards and shards[-1][3] - shards[-1][2] < target:
+                shards[-1][1], shards[-1][3] = next_pos, next_k
+            else:
+                shards.append([pos, next_pos, k, next_k])
+        if len(shards) < 2:
+            return None
+        return [(children[start:end], self.data[first:last]) for start, end, first, last in shards]
+
+    # куски тела (см. shards) форматируются на пуле процессов и встают обратно на свои места по порядку.
+    # Сквозная нумерация известна заранее: номера первых рисунка и таблицы куска считаются по данным
+    # разбора и таблицам предыдущих кусков, нумерованные списки ГОСТ заводятся здесь в порядке документа.
+    # Стили документа передаются в процессы готовым XML, кэш абзацев - найденным в нем XML; новый XML
+    # абзацев возвращается и сохраняется в кэш здесь
+    def format_shards(self, shards, jobs):
+        body = self.doc.element.body
+        for c in self.data:
+            if c.ptype == 'list_number':
+                num_id, _ = list_item(c.el)
+                if num_id is not None:
+                    self.lists.number(num_id)
+        lists = self.lists.detached()
+        styles = etree.tostring(self.doc.styles.element)
+        # длины python-docx (Cm, Pt) после pickle в процессе пула неверны (Cm(x) принимает сантиметры),
+        # поэтому настройки таблиц передаются в EMU
+        tb_conf = {k: Emu(v) if isinstance(v, Length) else v for k, v in self.style_conf.tb_conf.items()
+                   if not isinstance(v, dict)}
+        first_image, first_table = self.img_counter, 1
+        with ProcessPoolExecutor(min(jobs, len(shards))) as pool:
+            futures = []
+            for children, results in shards:
+                tables = [el for el in children if el.tag == _TBL]
+                # кусок переносится в отдельный w:body с пространствами имен документа: они объявляются
+                # один раз на кусок, а не на каждом элементе
+                wrapper = etree.Element(body.tag, nsmap=self.doc.element.nsmap)
+                wrapper.extend(children)
+                found = None
+                if self.cache is not None:
+                    found = {c.key: self.cache.formatted_xml(c.key, self.style_key) for c in results
+                             if c.ptype in LOCAL_TYPES and c.key}
+                futures.append(pool.submit(_format_shard, styles, etree.tostring(wrapper),
+                                           [(c.ptype, c.level, c.flags, c.key) for c in results], found,
+                                           first_image, first_table, [self.table_align.get(el) for el in tables],
+                                           tb_conf, lists))
+                first_table += len(tables)
+                first_image += sum(1 for c in results if c.ptype == 'image'
+                                   or c.ptype == 'empty' and c.flags & (FLAG_DRAWING | FLAG_PICT))
+
+            pos = 0
+            for future in futures:
+                blob, formatted = future.result()
+                children = list(parse_xml(blob))
+                body[pos:pos] = children
+                pos += len(children)
+                for key, xml in formatted.items():
+                    self.cache.store_formatted(key, self.style_key, parse_xml(xml))
+        self.img_counter = first_image
+
+    # абзац без нумерации и зависимости от соседей: готовый XML берется из кэша или сохраняется в него
+    def format_cached(self, c: ParseResult):
+        el = c.el
+        cached = self.cache.formatted(c.key, self.style_key)
+        if cached is None:
             self.format_doc(c)
+            self.cache.store_formatted(c.key, self.style_key, c.el)
+        elif el.getparent() is not None:
+            el.getparent().replace(el, cached)
+            c.el = cached
+
+    # target - путь или файловый объект (по умолчанию output_path)
+    def save(self, target=None):
+        save_document(self.doc, target or self.output_path, self.source, self.compression, self.jobs)
+
+    def start(self):
+        self.format()
+        with profiler.stage('save'):
+            self.save()
+        profiler.output_size(self.output_path)
+
+# кэш абзацев в процессе пула: найденный XML приходит из главного процесса (None - абзаца в кэше нет),
+# новый копится в new и возвращается в него
+class _ShardCache:
+    def __init__(self, found: dict):
+        self.found = found
+        self.new = {}
+
+    def formatted(self, key, style_key):
+        xml = self.found.get(key)
+        return parse_xml(xml) if xml is not None else None
+
+    def store_formatted(self, key, style_key, p):
+        self.new[key] = etree.tostring(p)
+
+
+# кусок тела документа в процессе пула: форматирование без разметки страниц и сохранения
+class _ShardConverter(Converter):
+    def __init__(self, doc: Document, classes: list, cache: _ShardCache, tb_conf: dict, img_counter: int,
+                 table_align: list, lists: ListNumbering):
+        body = doc.element.body
+        data = [ParseResult(pt, lvl, el, i, flags, key)
+                for i, (el, (pt, lvl, flags, key)) in enumerate(zip(body.findall(_P), classes, strict=True))]
+        # из настроек стилей форматированию тела нужны только настройки таблиц
+        self._init_formatting(doc, data, SimpleNamespace(tb_conf=tb_conf), lists, cache,
+                              table_align={el: align for el, align in zip(body.findall(_TBL), table_align)
+                                           if align is not None},
+                              img_counter=img_counter)
+
+
+# задача процесса пула: кусок тела (w:body), (тип, уровень, признаки, ключ кэша) его абзацев и найденный
+# в кэше XML (None - без кэша) -> отформатированный кусок и новый XML абзацев для кэша
+def _format_shard(styles, blob, classes, found, first_image, first_table, table_align, tb_conf,
+                  lists) -> tuple[bytes, dict]:
+    doc = Doc()
+    doc.styles.element[:] = list(parse_xml(styles))
+    body = parse_xml(blob)
+    doc.element.replace(doc.element.body, body)
+
+    cache = _ShardCache(found) if found is not None else None
+    conv = _ShardConverter(doc, classes, cache, tb_conf, first_image, table_align, lists)
+    conv.format_tables(first_table)
+    conv.format_paragraphs()
+    return etree.tostring(body), cache.new if cache is not None else {}
 
-        self.doc.save(self.output_path)
 
 class MarkdownConverter:
     def __init__(self, data: list, output_path: str):
@@ -343,108 +655,116 @@ class MarkdownConverter:
         self.doc = Doc()
         self.output_path = output_path
 
+        # шрифт и размер текста задаются стилем Normal, на котором основаны остальные, а не каждому прогону
+        font = self.doc.styles['Normal'].font
+        font.name, font.size = "Times New Roman", Pt(14)
+
+        # результат разбора для Converter: структура Markdown известна и повторно не угадывается
+        self.ctx: list[ParseResult] = []
+        # выравнивание столбцов из строк-разделителей (:---:), для Converter.format_table
+        self.table_align: dict = {}
+
     def convert_to_doc(self):
-        last_p, tb = {}, None
+        # строки текущей таблицы: таблица строится целиком, когда она закончилась
+        rows, align = [], []
+
+        # абзацы, тип которых зависит только от текста (подписи, формулы, код, списки):
+        # классифицируются после сборки документа, когда известны их соседи
+        by_content = []
 
         index = -1
         for p in self.data:
-            cur_el = {}
+            if "table" in p["type"]:
+                if p["type"] == "table_del" and rows:
+                    if len(rows) == 1:
+                        align = self.column_align(p["text"])
+                else:
+                    rows.append(md_cells(p["text"]))
+                continue
 
-            if "table" not in p["type"]:
-                par = self.doc.add_paragraph()
+            if rows:
+                self.add_table(rows, align)
+                rows, align = [], []
 
-                if p["type"] == 'page_break':
-                    par.paragraph_format.page_break_before = True
+            par = self.doc.add_paragraph()
+            index += 1
+            ptype, level = 'empty', 0
 
-                if p["type"] == "header":
-                    par.style = f"Heading {min(3, int(p["level"]))}"
-                    cur_el["par"], cur_el["text"] = par, p["text"].replace('**', '').strip()
-                    cur_el["ptype"] = "header"
-                    par.add_run(p["text"].replace('**', '').strip())
+            if p["type"] == 'page_break':
+                par.paragraph_format.page_break_before = True
 
-                if p["type"] == 'normal':
-                    par.style = "Normal"
-                    cur_el["text"] = p["text"]
-                    cur_el["ptype"] = "normal"
-                    self._add_run_f(par, p["text"])
+            if p["type"] == "header":
+                level = min(3, int(p["level"]))
+                par.style = f"Heading {level}"
+                par.add_run(p["text"].replace('**', '').strip())
+                ptype = 'heading'
 
-                if p["type"] in ['ord_list', 'unord_list']:
-                    par.style = "List Number"
-                    cur_el["text"] = p["text"]
-                    cur_el["ptype"] = "list_item"
-                    if p["type"] == "unord_list":
-                        par.style = "List Bullet"
-                        par.add_run("— ")
+            if p["type"] == 'normal':
+                par.style = "Normal"
+                append_runs(par._p, p["text"])
+                by_content.append(index)
 
-                    self._add_run_f(par, p["text"])
+            # маркер ставит Converter.format_bullet (список ГОСТ в numbering.xml), номер остается в тексте
+            if p["type"] == 'unord_list':
+                par.style = "List Bullet"
+                append_runs(par._p, p["text"])
+                ptype, level = 'list_bullet', 1
 
-                if p["type"] == "empty":
-                    cur_el["par"], cur_el["text"] = par, p
-                    cur_el["ptype"] = "empty"
+            if p["type"] == 'ord_list':
+                par.style = "List Number"
+                append_runs(par._p, p["text"])
+                by_content.append(index)
 
-                index += 1
-            else:
-                col_text = [i.strip() for i in p["text"].split('|') if i]
-                if "table" in last_p["type"]:
-                    if p["type"] == "table":
-                        c_row = tb.add_row()
-                        for k, text in enumerate(col_text):
-                            if text:
-                                if re.fullmatch(r'[\d., ]+', text):
-                                    (c_row.cells[k].paragraphs[0]
-                                     .paragraph_format.alignment) = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                                else:
-                                    c_row.cells[k].paragraphs[
-                                        0].paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-                                self._add_run_f(c_row.cells[k].paragraphs[0], text)
-                else:
-                    tb = self.doc.add_table(rows=1, cols=len(col_text))
-                    for k, i in enumerate(col_text):
-                        if i:
-                            tb.rows[0].cells[k].paragraphs[0].paragraph_format.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-                            self._add_run_f(tb.rows[0].cells[k].paragraphs[0], i)
-
-            last_p = p
-        self.doc.save(self.output_path)
-        return self.doc
+            if p["type"] == 'code':
+                par.add_run(p["text"])
+                ptype = 'code'
 
-    @staticmethod
-    def detect_inline_format( text):
-        b_pat, ind = r"\*\*(.*?)\*\*", []
-        italic_pat = r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)'
+            self.ctx.append(ParseResult(ptype, level, par._p, index))
 
-        for match in re.finditer(italic_pat, text):
-            ind += [[match.span(), 'italic']]
+        if rows:
+            self.add_table(rows, align)
 
-        for match in re.finditer(b_pat, text):
-            ind += [[match.span(), 'bold']]
+        parser = DocParser(None)
+        for i in by_content:
+            c = self.ctx[i]
+            c.ptype, c.level = parser.determine_type(ParFeatures(c.el))
 
-        if ind:
-            ind.sort(key=lambda x: x[0][0])
-            bounds = [[(0, ind[0][0][0]), 'normal']]
-            for i in range(len(ind)):
-                bounds += [ind[i]]
+        return self.doc
 
-                if i < len(ind) - 1:
-                    bounds += [[(ind[i][0][1], ind[i + 1][0][0]), 'normal']]
-                else:
-                    bounds += [[(ind[i][0][1], len(text)), 'normal']]
-        else:
-            bounds = [[(0, len(text)), 'normal']]
-        return bounds
-
-    def _add_run_f(self, pg, text):
-        bounds = self.detect_inline_format(text)
-        bounds.sort(key=lambda x: x[0][0])
-
-        for i in bounds:
-            (st, e), style = i
-            cur_run = pg.add_run(text[st:e].replace("*", ""))
-            cur_run.font.size = Pt(14)
-            cur_run.font.name = "Times New Roman"
-
-            match style:
-                case "bold":
-                    cur_run.bold = True
-                case "italic":
-                    cur_run.italic = True
+    # выравнивание столбцов по строке-разделителю: :--- влево, :---: по центру, ---: вправо, --- по содержимому
+    @staticmethod
+    def column_align(line) -> list:
+        align = []
+        for cell in md_cells(line):
+            left, right = cell.startswith(':'), cell.endswith(':')
+            if left and right:
+                align.append(WD_PARAGRAPH_ALIGNMENT.CENTER)
+            elif right:
+                align.append(WD_PARAGRAPH_ALIGNMENT.RIGHT)
+            elif left:
+                align.append(WD_PARAGRAPH_ALIGNMENT.LEFT)
+            else:
+                align.append(None)
+        return align
+
+    # таблица Markdown целиком: строки - копии пустой строки, созданной python-docx, ячейки заполняются
+    # прогонами разметки (utils.inline). Лишние ячейки строки отбрасываются, недостающие остаются пустыми.
+    # Выравнивание и стиль абзацев ячеек задает Converter.format_table
+    def add_table(self, rows, align):
+        tbl = self.doc.add_table(rows=1, cols=len(rows[0]))._tbl
+        header = tbl.tr_lst[0]
+        template = deepcopy(header)
+
+        self._fill_row(header, rows[0])
+        for cells in rows[1:]:
+            tr = deepcopy(template)
+            self._fill_row(tr, cells)
+            tbl.append(tr)
+
+        if any(a is not None for a in align):
+            self.table_align[tbl] = align
+
+    def _fill_row(self, tr, cells):
+        for tc, text in zip(tr.iterchildren(_TC), cells):
+            if text:
+                append_runs(tc[-1], text)
@@ -0,0 +1,138 @@
+# Оптимизация рисунков отчета: сканы и фотографии в тысячи пикселей шириной при печати на ширину
+# текста не нужны, а отчет из-за них весит десятки мегабайт.
+#
+# Картинка (JPEG, PNG), которая при заданном DPI шире ширины текста, уменьшается до нее и сжимается
+# заново в том же формате; результат берется, только если он меньше исходного. Одинаковые картинки
+# (по SHA-1) сводятся к одной части пакета. Рисунок, размер которого на странице больше ширины
+# текста, уменьшается до нее с сохранением пропорций. Картинки обрабатываются в jobs потоков:
+# декодирование, масштабирование и сжатие в Pillow отпускают GIL.
+
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from docx.oxml.ns import qn
+
+EMU_PER_INCH = 914400
+_FORMATS = ('JPEG', 'PNG')
+
+
+class ImageOptions(NamedTuple):
+    dpi: int = 300
+    quality: int = 85
+
+
+# новое содержимое картинки не шире max_px пикселей или None, если уменьшать нечего или не выгодно
+def shrink_image(blob: bytes, max_px: int, quality: int, dpi: int):
+    from PIL import Image
+
+    try:
+        return _shrink(Image, blob, max_px, quality, dpi)
+    except (OSError, ValueError):
+        # поврежденная или непонятная Pillow картинка остается как есть
+        return None
+
+
+def _shrink(Image, blob, max_px, quality, dpi):
+    with Image.open(io.BytesIO(blob)) as im:
+        fmt, (width, height) = im.format, im.size
+        if fmt not in _FORMATS or width <= max_px:
+            return None
+        size = (max_px, max(1, round(height * max_px / width)))
+        info = {k: im.info[k] for k in ('exif', 'icc_profile') if im.info.get(k)}
+        if fmt == 'JPEG':
+            # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8), не меньше нужного
+            im.draft(im.mode, size)
+        elif im.mode in ('1', 'P'):
+            # палитру Pillow масштабирует только по ближайшему соседу
+            im = im.convert('RGBA' if 'transparency' in im.info else 'RGB')
+        im = im.resize(size, Image.LANCZOS)
+
+        out = io.BytesIO()
+        if fmt == 'JPEG':
+            im.save(out, 'JPEG', quality=quality, optimize=True, dpi=(dpi, dpi), **info)
+        else:
+            # optimize перебирает фильтры и на скане в 2000 пикселей в разы дольше ради 2-4% размера
+            im.save(out, 'PNG', dpi=(dpi, dpi), **info)
+    data = out.getvalue()
+    return data if len(data) < len(blob) else None
+
+
+# размеры рисунка на странице (wp:extent и a:ext картинки) не больше max_width EMU
+def _fit_extent(drawing, max_width) -> bool:
+    extent = drawing.find(qn('wp:extent'))
+    if extent is None or int(extent.get('cx')) <= max_width:
+        return False
+    height = str(round(int(extent.get('cy')) * max_width / int(extent.get('cx'))))
+    for ext in [extent] + drawing.xpath('.//pic:spPr/a:xfrm/a:ext'):
+        ext.set('cx', str(max_width))
+        ext.set('cy', height)
+    return True
+
+
+# рисунки основного текста документа: сведение дублей, уменьшение картинок и размеров на странице.
+# max_width - ширина текста, EMU. Возвращает отчет: число картинок, уменьшенных картинок, удаленных
+# дублей, рисунков с исправленным размером и байты картинок до и после
+def optimize_images(doc, options: ImageOptions, max_width: int, jobs=None) -> dict:
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.parts.image import ImagePart
+
+    part, embed = doc.part, qn('r:embed')
+    report = dict(images=0, resized=0, duplicates=0, extents=0, bytes_before=0, bytes_after=0)
+
+    # первая картинка с таким SHA-1 остается, ссылки на остальные переводятся на нее
+    canonical, blips, duplicates, drawings = {}, {}, set(), {}
+    for blip in doc.element.body.xpath('.//a:blip[@r:embed]'):
+        rel = part.rels.get(blip.get(embed))
+        if rel is None or rel.is_external or not isinstance(rel.target_part, ImagePart):
+            continue
+        first = canonical.setdefault(hashlib.sha1(rel.target_part.blob).digest(), rel.target_part)
+        if first is not rel.target_part:
+            duplicates.add(rel.rId)
+            blip.set(embed, part.relate_to(first, RT.IMAGE))
+        blips.setdefault(first, []).append(blip)
+        for drawing in blip.xpath('ancestor::wp:inline | ancestor::wp:anchor')[-1:]:
+            drawings[drawing] = None
+
+    # уменьшенная картинка - новая часть пакета: рисунки основного текста ссылаются на нее, прежняя
+    # остается у остальных ссылок (колонтитулы, v:imagedata)
+    images = list(canonical.values())
+    max_px = round(max_width / EMU_PER_INCH * options.dpi)
+    with ThreadPoolExecutor(jobs or os.cpu_count() or 1) as ex:
+        shrunk = list(ex.map(lambda image: shrink_image(image.blob, max_px, options.quality, options.dpi),
+                             images))
+    replaced = set()
+    for image, blob in zip(images, shrunk):
+        report['bytes_before'] += len(image.blob)
+        if blob is not None:
+            partname = part.package.next_partname(f'{image.partname.baseURI}/image%d.{image.partname.ext}')
+            rId = part.relate_to(ImagePart(partname, image.content_type, blob), RT.IMAGE)
+            for blip in blips[image]:
+                replaced.add(blip.get(embed))
+                blip.set(embed, rId)
+            report['resized'] += 1
+        report['bytes_after'] += len(blob if blob is not None else image.blob)
+    report['images'] = len(images)
+
+    # связь удаляется, только если на нее больше ничего не ссылается (например, v:imagedata)
+    used = set(part.element.xpath('//@r:embed | //@r:id | //@r:link'))
+    for rId in duplicates - used:
+        report['duplicates'] += 1
+        report['bytes_before'] += len(part.rels[rId].target_part.blob)
+        part.drop_rel(rId)
+    for rId in replaced - used:
+        part.drop_rel(rId)
+
+    report['extents'] = sum(_fit_extent(drawing, max_width) for drawing in drawings)
+    return report
+
+
+# одна строка отчета для вывода в консоль
+def image_summary(report: dict) -> str:
+    saved = report['bytes_before'] - report['bytes_after']
+    return (f"рисунки: {report['images']}, уменьшено {report['resized']}, дублей удалено {report['duplicates']}, "
+            f"размер на странице исправлен у {report['extents']}; "
+            f"{report['bytes_before'] / 2**20:.1f} -> {report['bytes_after'] / 2**20:.1f} МБ "
+            f"(сэкономлено {saved / 2**20:.1f} МБ)")
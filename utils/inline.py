@@ -0,0 +1,134 @@
+# Строчная разметка Markdown за один проход: **жирный**, *курсив*, `код`, экранирование (\*)
+# и вложенность (**жирный и *курсив***).
+#
+# Текст просматривается слева направо одной регуляркой. Открывающие звездочки кладутся в стек,
+# закрывающие снимают ближайший подходящий открывающий; оставшиеся над ним, как и не нашедшие пары
+# до конца строки, остаются в тексте как есть. Звездочки открывают, только если за ними не пробел,
+# и закрывают, только если перед ними не пробел, поэтому "2 * 3" остается умножением. Внутри `кода`
+# разметка не действует.
+#
+# Прогоны строятся копированием готовых w:rPr, в которых только то, чего нет в стиле абзаца: жирный,
+# курсив и моноширинный шрифт кода. Шрифт и размер текста задает стиль.
+
+import re
+from copy import deepcopy
+from functools import lru_cache
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+BOLD, ITALIC, CODE = 1, 2, 4
+CODE_FONT = "Courier New"
+
+# экранированный знак препинания ASCII | апострофы кода | звездочки | обычный текст
+_TOKEN_RE = re.compile(r'\\([!-/:-@\[-`{-~])|(`+)|(\*+)|([^\\`*]+|\\)')
+_TICKS_RE = re.compile(r'`+')
+_MARKUP = frozenset('\\`*')
+_EMPHASIS = {1: ITALIC, 2: BOLD}
+_R, _T, _XML_SPACE = qn('w:r'), qn('w:t'), qn('xml:space')
+
+
+# открывающие звездочки: пока не найдена пара, неизвестно, разметка это или текст
+class _Opener:
+    __slots__ = ('marker', 'active', 'matched')
+
+    def __init__(self, marker, active):
+        self.marker, self.active, self.matched = marker, active, False
+
+
+# куски текста с начертанием: [(текст, BOLD | ITALIC | CODE)], соседние с одинаковым начертанием слиты
+def parse_inline(text: str) -> list[tuple[str, int]]:
+    # кусок - (текст, открывающие над ним, флаги) или сам _Opener
+    pieces, stack, pos = [], [], 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        escaped, ticks, stars, plain = m.groups()
+        start, pos = pos, m.end()
+
+        if ticks:
+            # код - до такой же серии апострофов; без пары апострофы остаются текстом
+            end = next((t for t in _TICKS_RE.finditer(text, pos) if len(t.group()) == len(ticks)), None)
+            if end is None:
+                pieces.append((ticks, tuple(stack), 0))
+            else:
+                code = text[pos:end.start()]
+                if code[:1] == code[-1:] == ' ' and code.strip():
+                    code = code[1:-1]
+                pieces.append((code, tuple(stack), CODE))
+                pos = end.end()
+            continue
+
+        if not stars:
+            pieces.append((escaped or plain, tuple(stack), 0))
+            continue
+
+        left = len(stars)
+        if start and not text[start - 1].isspace():
+            while left:
+                k = next((i for i in range(len(stack) - 1, -1, -1) if len(stack[i].marker) <= left), None)
+                if k is None:
+                    break
+                opener = stack[k]
+                opener.matched = True
+                left -= len(opener.marker)
+                del stack[k:]
+        if left and pos < len(text) and not text[pos].isspace() and left <= 3:
+            for size in ((2, 1) if left == 3 else (left,)):
+                opener = _Opener('*' * size, tuple(stack))
+                pieces.append(opener)
+                stack.append(opener)
+        elif left:
+            pieces.append(('*' * left, tuple(stack), 0))
+
+    result = []
+    for piece in pieces:
+        if isinstance(piece, _Opener):
+            if piece.matched:
+                continue
+            piece = (piece.marker, piece.active, 0)
+        part, active, flags = piece
+        for opener in active:
+            if opener.matched:
+                flags |= _EMPHASIS[len(opener.marker)]
+        if not part:
+            continue
+        if result and result[-1][1] == flags:
+            result[-1] = (result[-1][0] + part, flags)
+        else:
+            result.append((part, flags))
+    return result
+
+
+# w:rPr для сочетания флагов; None - прогону хватает стиля абзаца
+@lru_cache
+def run_properties(flags: int):
+    if not flags:
+        return None
+    run = Paragraph(OxmlElement('w:p'), None).add_run()
+    if flags & CODE:
+        run.font.name = CODE_FONT
+    if flags & BOLD:
+        run.bold = True
+    if flags & ITALIC:
+        run.italic = True
+    return run._r.rPr
+
+
+# прогоны размеченного текста в конец абзаца p (w:p)
+def append_runs(p, text: str):
+    pieces = parse_inline(text) if _MARKUP.intersection(text) else [(text, 0)]
+    for part, flags in pieces:
+        run = etree.SubElement(p, _R)
+        rpr = run_properties(flags)
+        if rpr is not None:
+            run.append(deepcopy(rpr))
+        if '\t' in part or '\n' in part or '\r' in part:
+            # табуляции и переводы строк - отдельными элементами, как в python-docx
+            run.text = part
+            continue
+        t = etree.SubElement(run, _T)
+        t.text = part
+        if part[0].isspace() or part[-1].isspace():
+            t.set(_XML_SPACE, 'preserve')
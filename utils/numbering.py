@@ -0,0 +1,244 @@
+# Списки по ГОСТ через определения нумерации (word/numbering.xml).
+#
+# Маркированный («−») и нумерованный («1)», «а)») списки ГОСТ описываются в numbering.xml один раз -
+# двумя w:abstractNum, - а элемент списка ссылается на них одним w:numPr: текст и прогоны элемента
+# (жирный, курсив, ссылки) не переписываются. Все маркированные списки документа ссылаются на один w:num.
+# Нумерованный список считает свои номера сам, поэтому каждому нумерованному списку исходного документа
+# (w:num) при первом его элементе заводится свой w:num ГОСТ с тем же начальным номером. Номера w:num
+# идут в порядке первых элементов списков и одинаковы в обычном и потоковом режимах и в процессах пула.
+# Повторный запуск на оформленном документе находит определения ГОСТ по имени и ничего не добавляет.
+#
+# Тип списка (маркированный или нумерованный) определяется по формату номера уровня (w:numFmt).
+
+from copy import deepcopy
+from functools import lru_cache
+
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.parts.numbering import NumberingPart
+
+BULLET, NUMBERED = "ГОСТ_маркированный", "ГОСТ_нумерованный"
+LEVELS = 9
+# отступ уровня списка - абзацный отступ 1,25 см (в twips) на каждый уровень
+INDENT = 709
+# маркер и формат номера уровней ГОСТ: «−» на всех уровнях; «1)», «а)», «1)», ...
+BULLET_TEXT = "−"
+NUMBER_FORMATS = ('decimal', 'russianLower')
+
+_ABSTRACT, _NUM, _LVL, _NAME, _VAL = qn('w:abstractNum'), qn('w:num'), qn('w:lvl'), qn('w:name'), qn('w:val')
+# w:abstractNumId - и атрибут w:abstractNum, и ссылка на него внутри w:num
+_ABSTRACT_ID, _NUM_ID = qn('w:abstractNumId'), qn('w:numId')
+_ILVL, _NUM_FMT, _START = qn('w:ilvl'), qn('w:numFmt'), qn('w:start')
+_LVL_OVERRIDE, _START_OVERRIDE, _CLEANUP = qn('w:lvlOverride'), qn('w:startOverride'), qn('w:numIdMacAtCleanup')
+_P_PR, _NUM_PR = qn('w:pPr'), qn('w:numPr')
+
+
+# numbering.xml документа python-docx; create=True - пустая часть добавляется, если ее нет
+def numbering_part(doc, create=False):
+    try:
+        return doc.part.part_related_by(RT.NUMBERING)
+    except KeyError:
+        if not create:
+            return None
+    package = doc.part.package
+    part = NumberingPart(package.next_partname('/word/numbering%d.xml'), CT.WML_NUMBERING, new_numbering(),
+                         package)
+    doc.part.relate_to(part, RT.NUMBERING)
+    return part
+
+
+def new_numbering():
+    return parse_xml(f'<w:numbering {nsdecls("w")}/>')
+
+
+# формат номера по уровням каждого w:num: {numId: {уровень: numFmt}} с учетом переопределений уровней
+def numbering_formats(numbering) -> dict[str, dict[int, str]]:
+    if numbering is None:
+        return {}
+    abstract = {el.get(_ABSTRACT_ID): _level_formats(el) for el in numbering.iterchildren(_ABSTRACT)}
+    formats = {}
+    for num in numbering.iterchildren(_NUM):
+        levels = dict(abstract.get(_ref(num), {}))
+        for override in num.iterchildren(_LVL_OVERRIDE):
+            levels.update(_level_formats(override))
+        formats[num.get(_NUM_ID)] = levels
+    return formats
+
+
+# маркированный уровень: маркер или без номера; неизвестный формат считается маркером
+def is_bullet(fmt) -> bool:
+    return fmt is None or fmt in ('bullet', 'none')
+
+
+def _level_formats(parent) -> dict[int, str]:
+    levels = {}
+    for lvl in parent.iterchildren(_LVL):
+        # формат бывает и внутри mc:AlternateContent (Word 2010+): подойдет любой из вариантов
+        fmt = next(lvl.iter(_NUM_FMT), None)
+        if fmt is not None:
+            levels[_int(lvl.get(_ILVL), 0)] = fmt.get(_VAL)
+    return levels
+
+
+def _ref(num):
+    ref = num.find(_ABSTRACT_ID)
+    return ref.get(_VAL) if ref is not None else None
+
+
+def _int(value, default) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# номер (numId) и уровень списка абзаца w:p; (None, 0) - абзац не в списке (numId 0 снимает нумерацию)
+def list_item(p) -> tuple[str | None, int]:
+    p_pr = p.find(_P_PR)
+    num_pr = p_pr.find(_NUM_PR) if p_pr is not None else None
+    num_id = num_pr.find(_NUM_ID) if num_pr is not None else None
+    if num_id is None or num_id.get(_VAL) in (None, '0'):
+        return None, 0
+    ilvl = num_pr.find(_ILVL)
+    return num_id.get(_VAL), _int(ilvl.get(_VAL), 0) if ilvl is not None else 0
+
+
+# w:num, которые ссылаются на определения ГОСТ: {numId: BULLET или NUMBERED}
+def gost_nums(numbering) -> dict[str, str]:
+    if numbering is None:
+        return {}
+    names = {}
+    for el in numbering.iterchildren(_ABSTRACT):
+        name = el.find(_NAME)
+        if name is not None and name.get(_VAL) in (BULLET, NUMBERED):
+            names.setdefault(el.get(_ABSTRACT_ID), name.get(_VAL))
+    return {num.get(_NUM_ID): names[_ref(num)] for num in numbering.iterchildren(_NUM) if _ref(num) in names}
+
+
+# ссылки элементов списков на определения ГОСТ: numId маркированного списка и numId ГОСТ для каждого
+# исходного нумерованного (w:num). Свой w:num ГОСТ заводится при первом элементе списка, поэтому в
+# оформленном документе на исходные списки не остается ссылок и повторный запуск ничего не добавляет
+class ListNumbering:
+    __slots__ = ('bullet', 'numbered', 'numbering', 'abstract')
+
+    # numbering - w:numbering документа и abstractNumId нумерованного списка ГОСТ; без них (в процессе
+    # пула, см. detached) новые списки не заводятся
+    def __init__(self, bullet: str, numbered: dict[str, str] = None, numbering=None, abstract: str = None):
+        self.bullet = bullet
+        self.numbered = numbered if numbered is not None else {}
+        self.numbering = numbering
+        self.abstract = abstract
+
+    # numId ГОСТ для элемента нумерованного списка с исходным numId (None - список не заведен)
+    def number(self, num_id: str) -> str | None:
+        if num_id not in self.numbered and self.numbering is not None:
+            num = next((el for el in self.numbering.iterchildren(_NUM) if el.get(_NUM_ID) == num_id), None)
+            if num is not None and _ref(num) == self.abstract:
+                self.numbered[num_id] = num_id
+            else:
+                start = _start(self.numbering, num) if num is not None else 1
+                self.numbered[num_id] = _add_num(self.numbering, self.abstract, start)
+        return self.numbered.get(num_id)
+
+    # копия без numbering.xml для процессов пула: только уже заведенные списки
+    def detached(self) -> 'ListNumbering':
+        return ListNumbering(self.bullet, dict(self.numbered))
+
+    # w:numPr элемента списка (копия, ее можно вставлять в абзац)
+    @staticmethod
+    def num_pr(num_id: str, ilvl: int):
+        return deepcopy(_num_pr(num_id, min(max(ilvl, 0), LEVELS - 1)))
+
+
+@lru_cache
+def _num_pr(num_id, ilvl):
+    num_pr = OxmlElement('w:numPr')
+    num_pr.append(OxmlElement('w:ilvl', attrs={_VAL: str(ilvl)}))
+    num_pr.append(OxmlElement('w:numId', attrs={_VAL: num_id}))
+    return num_pr
+
+
+# определения ГОСТ в w:numbering (добавляются, если их еще нет) и w:num маркированного списка
+def register_lists(numbering) -> ListNumbering:
+    abstract = {}
+    for el in numbering.iterchildren(_ABSTRACT):
+        name = el.find(_NAME)
+        if name is not None and name.get(_VAL) in (BULLET, NUMBERED):
+            abstract.setdefault(name.get(_VAL), el.get(_ABSTRACT_ID))
+    for name in (BULLET, NUMBERED):
+        if name not in abstract:
+            abstract[name] = _next_id(numbering.iterchildren(_ABSTRACT), _ABSTRACT_ID)
+            _insert_abstract(numbering, _abstract_num(abstract[name], name))
+
+    bullet = next((num.get(_NUM_ID) for num in numbering.iterchildren(_NUM)
+                   if _ref(num) == abstract[BULLET] and num.find(_LVL_OVERRIDE) is None), None)
+    if bullet is None:
+        bullet = _add_num(numbering, abstract[BULLET])
+    return ListNumbering(bullet, numbering=numbering, abstract=abstract[NUMBERED])
+
+
+def _next_id(elements, attr) -> str:
+    return str(max((_int(el.get(attr), -1) for el in elements), default=-1) + 1)
+
+
+# w:abstractNum идут перед всеми w:num
+def _insert_abstract(numbering, el):
+    last = None
+    for last in numbering.iterchildren(_ABSTRACT):
+        pass
+    following = next(numbering.iterchildren(_NUM, _CLEANUP), None)
+    if last is not None:
+        last.addnext(el)
+    elif following is not None:
+        following.addprevious(el)
+    else:
+        numbering.append(el)
+
+
+def _add_num(numbering, abstract_id, start=None) -> str:
+    # номера w:num начинаются с 1
+    num_id = str(max(int(_next_id(numbering.iterchildren(_NUM), _NUM_ID)), 1))
+    num = OxmlElement('w:num', attrs={_NUM_ID: num_id})
+    num.append(OxmlElement('w:abstractNumId', attrs={_VAL: abstract_id}))
+    if start is not None:
+        override = OxmlElement('w:lvlOverride', attrs={_ILVL: '0'})
+        override.append(OxmlElement('w:startOverride', attrs={_VAL: str(start)}))
+        num.append(override)
+    cleanup = numbering.find(_CLEANUP)
+    if cleanup is not None:
+        cleanup.addprevious(num)
+    else:
+        numbering.append(num)
+    return num_id
+
+
+# начальный номер первого уровня исходного списка: переопределенный в w:num или заданный в w:abstractNum
+def _start(numbering, num) -> int:
+    for override in num.iterchildren(_LVL_OVERRIDE):
+        if _int(override.get(_ILVL), 0) == 0:
+            start = override.find(_START_OVERRIDE)
+            if start is not None:
+                return _int(start.get(_VAL), 1)
+    for el in numbering.iterchildren(_ABSTRACT):
+        if el.get(_ABSTRACT_ID) == _ref(num):
+            for lvl in el.iterchildren(_LVL):
+                start = lvl.find(_START)
+                if _int(lvl.get(_ILVL), 0) == 0 and start is not None:
+                    return _int(start.get(_VAL), 1)
+    return 1
+
+
+def _abstract_num(abstract_id, name):
+    levels = []
+    for ilvl in range(LEVELS):
+        if name == BULLET:
+            fmt, text = 'bullet', BULLET_TEXT
+        else:
+            fmt, text = NUMBER_FORMATS[ilvl % len(NUMBER_FORMATS)], f'%{ilvl + 1})'
+        levels.append(f'<w:lvl w:ilvl="{ilvl}"><w:start w:val="1"/><w:numFmt w:val="{fmt}"/>'
+                      f'<w:suff w:val="space"/><w:lvlText w:val="{text}"/><w:lvlJc w:val="left"/>'
+                      f'<w:pPr><w:ind w:left="{INDENT * (ilvl + 1)}" w:firstLine="0"/></w:pPr></w:lvl>')
+    return parse_xml(f'<w:abstractNum {nsdecls("w")} w:abstractNumId="{abstract_id}">'
+                     f'<w:multiLevelType w:val="multilevel"/><w:name w:val="{name}"/>{"".join(levels)}'
+                     f'</w:abstractNum>')
@@ -0,0 +1,274 @@
+# Сохранение .docx без повторного сжатия того, что не менялось.
+#
+# python-docx при сохранении заново сжимает каждую часть пакета, в том числе картинки, которые
+# форматирование не трогает. Здесь часть, совпадающая с исходным пакетом по CRC и размеру, копируется
+# из исходного архива как есть - сжатым потоком, без распаковки. Остальные части сжимаются
+# параллельно (zlib отпускает GIL) и пишутся в выходной файл по мере готовности в исходном порядке,
+# архив целиком в памяти не собирается.
+#
+# zipfile не умеет записывать уже сжатые данные, поэтому архив пишется здесь же по формату ZIP
+# (заголовки через struct); из zipfile и python-docx берутся только их открытые API.
+
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.opc.oxml import CT_Types, serialize_part_xml
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.spec import default_content_types
+
+# уровень сжатия zlib (0 - без сжатия); 6 - то же, что дает python-docx
+COMPRESSION = 6
+CHUNK_SIZE = 1 << 20
+# части меньше этого сжимаются сразу: передача в поток дороже самого сжатия
+_PARALLEL_MIN = 64 * 1024
+
+# заголовки ZIP: локальный заголовок части, дескриптор данных, запись центрального каталога и его конец
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_DATA_DESCRIPTOR = struct.Struct('<4sIII')
+_CENTRAL_HEADER = struct.Struct('<4sHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<4sHHHHIIH')
+_VERSION = 20
+# бит 3 - CRC и размеры в дескрипторе после данных, бит 11 - имя в UTF-8
+_FLAG_DESCRIPTOR, _FLAG_UTF8 = 0x08, 0x800
+_LIMIT = 0xFFFFFFFF
+
+
+class PackageZip:
+    # file - путь или файловый объект, открытый на запись
+    def __init__(self, file, level=COMPRESSION):
+        self.level = COMPRESSION if level is None else level
+        self.own = isinstance(file, (str, os.PathLike))
+        self.fp = open(file, 'wb') if self.own else file
+        self.offset = 0
+        self.central = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, tb):
+        try:
+            if kind is None:
+                self.close()
+        finally:
+            if self.own:
+                self.fp.close()
+
+    # центральный каталог и его конец; больше 4 ГБ и 65535 частей (ZIP64) .docx не бывает
+    def close(self):
+        start = self.offset
+        for record in self.central:
+            self._write(record)
+        if len(self.central) > 0xFFFF or self.offset > _LIMIT:
+            raise zipfile.LargeZipFile("пакет больше 4 ГБ")
+        self._write(_END_RECORD.pack(b'PK\x05\x06', 0, 0, len(self.central), len(self.central),
+                                     self.offset - start, start, 0))
+        self.central = []
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    @property
+    def method(self):
+        return zipfile.ZIP_DEFLATED if self.level else zipfile.ZIP_STORED
+
+    # часть с известными CRC и размерами: локальный заголовок, данные и запись для центрального каталога
+    def _entry(self, name, method, crc, file_size, compress_size, date_time, chunks, flags=0):
+        encoded = name.encode('utf-8')
+        flags |= 0 if name.isascii() else _FLAG_UTF8
+        dos_time, dos_date = _dos_time(date_time)
+        offset = self.offset
+        if offset > _LIMIT:
+            raise zipfile.LargeZipFile("пакет больше 4 ГБ")
+        known = not flags & _FLAG_DESCRIPTOR
+        self._write(_LOCAL_HEADER.pack(b'PK\x03\x04', _VERSION, flags, method, dos_time, dos_date,
+                                       crc if known else 0, compress_size if known else 0,
+                                       file_size if known else 0, len(encoded), 0) + encoded)
+        for chunk in chunks:
+            self._write(chunk)
+        return encoded, flags, dos_time, dos_date, offset
+
+    def _central(self, encoded, flags, method, dos_time, dos_date, crc, file_size, compress_size, offset):
+        self.central.append(_CENTRAL_HEADER.pack(b'PK\x01\x02', _VERSION, _VERSION, flags, method, dos_time,
+                                                 dos_date, crc, compress_size, file_size, len(encoded), 0, 0, 0,
+                                                 0, 0o600 << 16, offset) + encoded)
+
+    def _write_raw(self, name, method, crc, file_size, compress_size, chunks, date_time=None):
+        if file_size > _LIMIT or compress_size > _LIMIT:
+            raise zipfile.LargeZipFile(f"часть {name} больше 4 ГБ")
+        encoded, flags, dos_time, dos_date, offset = self._entry(
+            name, method, crc, file_size, compress_size, date_time or time.localtime(time.time())[:6], chunks)
+        self._central(encoded, flags, method, dos_time, dos_date, crc, file_size, compress_size, offset)
+
+    def compress(self, blob: bytes) -> bytes:
+        if not self.level:
+            return blob
+        c = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        return c.compress(blob) + c.flush()
+
+    def write_compressed(self, name, blob: bytes, data: bytes):
+        self._write_raw(name, self.method, zlib.crc32(blob), len(blob), len(data), [data])
+
+    def writestr(self, name, blob: bytes):
+        self.write_compressed(name, blob, self.compress(blob))
+
+    # часть, содержимое которой пишется по кускам (размер заранее не известен): CRC и размеры -
+    # в дескрипторе данных после нее
+    def stream(self, name) -> '_PartStream':
+        return _PartStream(self, name)
+
+    # часть исходного архива сжатым потоком, без распаковки и повторного сжатия; raw - исходный архив,
+    # открытый как двоичный файл
+    def copy_raw(self, raw, info: zipfile.ZipInfo):
+        if info.flag_bits & 0x1:
+            raise ValueError(f"зашифрованная часть {info.filename}")
+
+        def chunks():
+            raw.seek(info.header_offset)
+            header = raw.read(_LOCAL_HEADER.size)
+            if len(header) != _LOCAL_HEADER.size or header[:4] != b'PK\x03\x04':
+                raise zipfile.BadZipFile(f"поврежден заголовок части {info.filename}")
+            *_, name_len, extra_len = _LOCAL_HEADER.unpack(header)
+            raw.seek(name_len + extra_len, os.SEEK_CUR)
+            left = info.compress_size
+            while left:
+                chunk = raw.read(min(left, CHUNK_SIZE))
+                if not chunk:
+                    raise zipfile.BadZipFile(f"часть {info.filename} обрезана")
+                left -= len(chunk)
+                yield chunk
+
+        # размеры известны заранее, поэтому дескриптор данных (бит 3) не нужен
+        self._write_raw(info.filename, info.compress_type, info.CRC, info.file_size, info.compress_size, chunks(),
+                        info.date_time)
+
+    # части (имя, содержимое) в заданном порядке. Совпадающие с частями source (путь к исходному
+    # архиву) по CRC и размеру копируются из него как есть, остальные сжимаются в jobs потоков. Вперед
+    # сжимается не больше 2 * jobs частей, так что в памяти одновременно лишь несколько частей.
+    # Возвращает число скопированных
+    def write_parts(self, parts, source: str = None, jobs=None) -> int:
+        if source is None:
+            return self._write_parts(parts, {}, None, jobs)
+        with zipfile.ZipFile(source) as zin, open(source, 'rb') as raw:
+            return self._write_parts(parts, {info.filename: info for info in zin.infolist()}, raw, jobs)
+
+    def _write_parts(self, parts, known, raw, jobs) -> int:
+        jobs = jobs or os.cpu_count() or 1
+        ex = ThreadPoolExecutor(jobs) if jobs > 1 else None
+        pending, copied = deque(), 0
+
+        def flush(count):
+            nonlocal copied
+            while len(pending) > count:
+                name, blob, info, data = pending.popleft()
+                if info is not None:
+                    self.copy_raw(raw, info)
+                    copied += 1
+                else:
+                    self.write_compressed(name, blob, data if isinstance(data, bytes) else data.result())
+
+        try:
+            for name, blob in parts:
+                info = known.get(name)
+                if (info is None or info.file_size != len(blob) or info.flag_bits & 0x1
+                        or info.CRC != zlib.crc32(blob)):
+                    info = None
+                    parallel = ex is not None and len(blob) >= _PARALLEL_MIN
+                    data = ex.submit(self.compress, blob) if parallel else self.compress(blob)
+                else:
+                    data = None
+                pending.append((name, blob, info, data))
+                flush(2 * jobs)
+            flush(0)
+        finally:
+            if ex is not None:
+                ex.shutdown(cancel_futures=True)
+        return copied
+
+
+# запись одной части по кускам (PackageZip.stream): with zout.stream(name) as dst: dst.write(...)
+class _PartStream:
+    def __init__(self, zout: PackageZip, name):
+        self.zout, self.name = zout, name
+        self.crc = self.size = self.compressed = 0
+        self.compressor = zlib.compressobj(zout.level, zlib.DEFLATED, -15) if zout.level else None
+        self.header = zout._entry(name, zout.method, 0, 0, 0, time.localtime(time.time())[:6], (),
+                                  _FLAG_DESCRIPTOR)
+
+    def __enter__(self):
+        return self
+
+    def write(self, data: bytes):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        self._out(self.compressor.compress(data) if self.compressor is not None else data)
+
+    def _out(self, data):
+        self.compressed += len(data)
+        self.zout._write(data)
+
+    def __exit__(self, kind, value, tb):
+        if kind is not None:
+            return
+        if self.compressor is not None:
+            self._out(self.compressor.flush())
+        if self.size > _LIMIT or self.compressed > _LIMIT:
+            raise zipfile.LargeZipFile(f"часть {self.name} больше 4 ГБ")
+        self.zout._write(_DATA_DESCRIPTOR.pack(b'PK\x07\x08', self.crc, self.compressed, self.size))
+        encoded, flags, dos_time, dos_date, offset = self.header
+        self.zout._central(encoded, flags, self.zout.method, dos_time, dos_date, self.crc, self.size,
+                           self.compressed, offset)
+
+
+# дата и время части в формате MS-DOS (как их пишет zipfile)
+def _dos_time(date_time) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+# [Content_Types].xml так же, как его строит python-docx при сохранении: расширения из стандартных
+# сочетаний (расширение, тип) - элементами Default, остальные части - Override
+def _content_types(parts) -> bytes:
+    defaults = {'rels': CT.OPC_RELATIONSHIPS, 'xml': CT.XML}
+    overrides = {}
+    for part in parts:
+        ext = part.partname.ext
+        if (ext.lower(), part.content_type) in default_content_types:
+            defaults[ext.lower()] = part.content_type
+        else:
+            overrides[part.partname] = part.content_type
+    types = CT_Types.new()
+    for ext in sorted(defaults):
+        types.add_default(ext, defaults[ext])
+    for partname in sorted(overrides):
+        types.add_override(partname, overrides[partname])
+    return serialize_part_xml(types)
+
+
+# части пакета python-docx в том порядке, в каком их пишет Document.save
+def _package_parts(doc):
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    yield CONTENT_TYPES_URI.membername, _content_types(parts)
+    yield PACKAGE_URI.rels_uri.membername, package.rels.xml
+    for part in parts:
+        yield part.partname.membername, part.blob
+        if len(part.rels):
+            yield part.partname.rels_uri.membername, part.rels.xml
+
+
+# замена doc.save: target - путь или файловый объект, source - исходный .docx (путь), из которого
+# неизмененные части копируются без повторного сжатия
+def save_document(doc, target, source=None, level=COMPRESSION, jobs=None) -> int:
+    with PackageZip(target, level) as zout:
+        return zout.write_parts(_package_parts(doc), source, jobs)
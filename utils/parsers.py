@@ -1,87 +1,312 @@
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 from docx.text.paragraph import Paragraph
+from docx.oxml import parse_xml
 from docx.oxml.ns import qn
+from lxml import etree
+import io
+import logging
 import re
-from typing import TypedDict, List
+from typing import List
+
+from utils.numbering import is_bullet, list_item, numbering_formats, numbering_part
+
+log = logging.getLogger(__name__)
+
+# структурные признаки абзаца (ParseResult.flags): рисунок, объект VML, разрыв строки или страницы
+FLAG_DRAWING, FLAG_PICT, FLAG_BR = 1, 2, 4
+
+# результат разбора одного абзаца. Хранится ссылка на сам w:p, а не обертка Paragraph и не копия
+# текста: обертку создает конвертер при оформлении, текст при необходимости читается из элемента
+class ParseResult:
+    __slots__ = ('ptype', 'level', 'el', 'index', 'flags', 'key', 'section')
+
+    def __init__(self, ptype: str, level: int, el, index: int, flags: int = 0, key: bytes = None):
+        self.ptype = ptype
+        self.level = level
+        self.el = el
+        self.index = index
+        self.flags = flags
+        # ключ абзаца в кэше между запусками (utils.cache), если кэш включен
+        self.key = key
+        # раздел документа (DocParser.parse_with_sections)
+        self.section = None
+
+    @property
+    def text(self) -> str:
+        return self.el.text
+
+    # баллы формулы и кода (DocParser.special_scores), по которым их определяет det_special_blocks
+    @property
+    def scores(self) -> dict[str, int]:
+        formula, code = DocParser.special_scores(self.text.strip())
+        return {'formula': formula, 'code': code}
+
+_P_PR, _P_STYLE, _OUTLINE, _NUM_PR = qn('w:pPr'), qn('w:pStyle'), qn('w:outlineLvl'), qn('w:numPr')
+_ILVL, _NUM_ID, _VAL = qn('w:ilvl'), qn('w:numId'), qn('w:val')
+_RUN = qn('w:r')
+_DRAWING, _PICT, _BR = qn('w:drawing'), qn('w:pict'), qn('w:br')
+
+# признаки, без которых ни один "тяжелый" детектор не сработает (см. ParFeatures.plain)
+_MARKED_RE = re.compile(r'(?:таблица|рис|реферат|введение|заключение|список литературы|приложени|глава|раздел|часть)',
+                        re.IGNORECASE)
+_SPECIAL_CHARS_RE = re.compile(r'[{;/>=≠≈<≤≥∝→←↑↓↔_^]')
+
+
+# есть ли в одной строке text подряд (не обязательно вплотную) first, затем каждая из rest - как
+# .*A.*B.* без перехода через \n. Первое вхождение в строке лучшее из возможных, поэтому каждая
+# строка просматривается один раз, и время линейно от длины текста
+def _in_line_order(text, first, *rest) -> bool:
+    pos = 0
+    while True:
+        if isinstance(first, str):
+            start = text.find(first, pos)
+            end = start + len(first)
+        else:
+            m = first.search(text, pos)
+            start, end = (m.start(), m.end()) if m is not None else (-1, -1)
+        if start < 0:
+            return False
+
+        line_end = text.find('\n', end)
+        line_end = len(text) if line_end < 0 else line_end
+        for part in rest:
+            end = text.find(part, end, line_end)
+            if end < 0:
+                break
+            end += len(part)
+        else:
+            return True
+        pos = line_end + 1
+
+
+# с какого числа абзацев классификация идет на пуле процессов и сколько абзацев в одной задаче
+PARALLEL_MIN = 20000
+_PAR_CHUNK = 2000
+
+# признаки абзаца, собранные за один проход по w:p; их читают все детекторы DocParser
+class ParFeatures:
+    __slots__ = ('style', 'outline', 'num_pr', 'ilvl', 'num_id', 'has_drawing', 'has_pict', 'has_br',
+                 'text', 'prev_tag', 'next_tag')
+
+    # neighbours - теги соседей (prev, next), если элемент уже вынут из документа (потоковый режим)
+    def __init__(self, p, neighbours=None):
+        self.style = self.outline = self.ilvl = self.num_id = None
+        self.num_pr = self.has_drawing = self.has_pict = self.has_br = False
+
+        for child in p:
+            tag = child.tag
+            if tag == _P_PR:
+                for pr in child:
+                    if pr.tag == _P_STYLE:
+                        self.style = pr.get(_VAL)
+                    elif pr.tag == _OUTLINE:
+                        self.outline = pr.get(_VAL)
+                    elif pr.tag == _NUM_PR:
+                        self.num_pr = True
+                        for num in pr:
+                            if num.tag == _ILVL:
+                                self.ilvl = num.get(_VAL)
+                            elif num.tag == _NUM_ID:
+                                self.num_id = num.get(_VAL)
+            else:
+                # не только w:r: рисунки и разрывы бывают и внутри гиперссылок, правок и т.п.
+                for e in child.iter(_DRAWING, _PICT, _BR):
+                    if e.tag == _DRAWING:
+                        self.has_drawing = True
+                    elif e.tag == _PICT:
+                        self.has_pict = True
+                    else:
+                        self.has_br = True
 
-@dataclass
-class ParseResult(TypedDict):
-    level: int
-    ptype: str
-    par: Paragraph | None
-    text: str
-    index: int
+        self.text = p.text.strip()
 
-class MdParser:
-    def __init__(self, text):
-        self.text = text
+        if neighbours is None:
+            prev, nxt = p.getprevious(), p.getnext()
+            neighbours = (prev.tag if prev is not None else None, nxt.tag if nxt is not None else None)
+        self.prev_tag, self.next_tag = neighbours
 
-    @staticmethod
-    def parse_paragraph(line) -> tuple[str, int | None, str]:
-        if re.match(r'-{3,}', line):
-            return 'page_break', 0, ''
+    @property
+    def flags(self) -> int:
+        return ((FLAG_DRAWING if self.has_drawing else 0) | (FLAG_PICT if self.has_pict else 0)
+                | (FLAG_BR if self.has_br else 0))
 
-        if re.match(r"^(>)+ .*", line):
-            return 'normal', 0, re.sub(r"^(> )+", "", line)
+    # обычный текст: ни стиля заголовка, ни списка, ни картинки, ни ключевых слов подписей и разделов
+    @property
+    def plain(self) -> bool:
+        return (self.text != '' and not self.num_pr and not self.has_drawing
+                and (self.style is None or not any(tp in self.style.lower() for tp in ["heading", "заголовок", "title"]))
+                and _MARKED_RE.match(self.text) is None)
 
-        if re.match(r"^```.+", line):
-            return 'normal', 0, re.sub(r"^(> )+", "", re.sub(r"^```", "", line))
+# регулярное выражение (или список выражений) класса, которое компилируется при первом обращении и
+# заменяет собой атрибут: разбор .docx не компилирует выражения Markdown, и наоборот
+class _LazyRe:
+    def __init__(self, pattern, flags=0):
+        self.pattern, self.flags = pattern, flags
 
-        for i in range(1, 7):
-            pat = f'^{"#" * i} (.+)$'
-            if re.fullmatch(pat, line):
-                return 'header', i, re.sub(f'{"#" * i} ', '', line.strip())
+    def __set_name__(self, owner, name):
+        self.name = name
 
-        if re.match(r'^ *[-*+] (.+)$', line):
-            return 'unord_list', 0, re.sub(r'^[-*+] ', '', line.strip())
+    def __get__(self, obj, owner=None):
+        if isinstance(self.pattern, list):
+            compiled = [re.compile(p, self.flags) for p in self.pattern]
+        else:
+            compiled = re.compile(self.pattern, self.flags)
+        setattr(owner, self.name, compiled)
+        return compiled
 
-        if re.match(r'^ *\d+\. (.+)$', line):
+
+class MdParser:
+    # одна регулярка на строку; альтернативы идут в порядке приоритета проверок
+    LINE_RE = _LazyRe(r"""
+          (?P<page_break>-{3,})
+        | (?P<quote>>+\ )
+        | (?P<fence>```)(?=[^`]*$)
+        | (?P<header>\#{1,6})\ (?=.)
+        | \ *(?P<unord_list>[-*+])\ (?=.)
+        | \ *(?P<ord_list>\d+\.)\ (?=.)
+    """, re.VERBOSE)
+    QUOTE_RE = _LazyRe(r"^(> )+")
+    UNORD_RE = _LazyRe(r'^[-*+] ')
+    TABLE_DEL_RE = _LazyRe(r"^\|(-+)(?:\|(-+))+\|$")
+    # разделитель под строкой заголовка таблицы, в том числе с выравниванием (:---:)
+    TABLE_SEP_RE = _LazyRe(r"^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$")
+    HTML_RE = _LazyRe(r"^<.+>")
+
+    # source - строка или открытый файл (читается построчно)
+    def __init__(self, source):
+        self.source = source
+
+    @classmethod
+    def parse_paragraph(cls, line) -> tuple[str, int | None, str]:
+        m = cls.LINE_RE.match(line)
+        if m:
+            kind = m.lastgroup
+            if kind == 'page_break':
+                return 'page_break', 0, ''
+            if kind == 'quote':
+                return 'normal', 0, cls.QUOTE_RE.sub("", line)
+            if kind == 'fence':
+                return 'fence', 0, line[3:].strip()
+            if kind == 'header':
+                level = len(m.group('header'))
+                return 'header', level, line.strip().replace('#' * level + ' ', '')
+            if kind == 'unord_list':
+                return 'unord_list', 0, cls.UNORD_RE.sub('', line.strip())
             return 'ord_list', 0, line.strip()
 
-        if '|' in line and line.count('|') >= 2:
-            if re.match(r"^\|(-+)(?:\|(-+))+\|$", line):
+        if line.count('|') >= 2:
+            if cls.TABLE_DEL_RE.match(line):
                 return 'table_del', None, line
             else:
                 return 'table', None, line
 
-        if re.match(r"^ *\S+ *", line):
+        if line.lstrip(' ')[:1].strip():
             return 'normal', 0, line
 
         return 'empty', 0, line
 
-    def parse_(self):
-        parse_data = []
-        pars = self.text.split('\n')
+    # потоковый разбор: по одному токену на строку, состояние - блок кода и таблица
+    def tokens(self):
+        lines = io.StringIO(self.source) if isinstance(self.source, str) else self.source
+        in_code, table_row = False, 0
+
+        for line in lines:
+            line = line.rstrip('\n')
 
-        for i, p in enumerate(pars):
-            if not re.match("^<.+>", p):
-                parse_data += [dict(zip(["type", "level", "text"], [*self.parse_paragraph(p)]))]
+            if in_code:
+                if line.startswith('```'):
+                    in_code = False
+                else:
+                    yield {"type": "code", "level": 0, "text": line}
+                continue
+
+            if self.HTML_RE.match(line):
+                continue
+
+            if table_row and '|' in line:
+                # строка под заголовком таблицы может быть разделителем с выравниванием
+                if table_row == 1 and self.TABLE_SEP_RE.match(line):
+                    kind = 'table_del'
+                else:
+                    kind = 'table'
+                table_row += 1
+                yield {"type": kind, "level": None, "text": line}
+                continue
 
-        return parse_data
+            kind, level, text = self.parse_paragraph(line)
+            if kind == 'fence':
+                in_code, table_row = True, 0
+                continue
+
+            table_row = table_row + 1 if kind in ('table', 'table_del') else 0
+            yield {"type": kind, "level": level, "text": text}
+
+    def parse_(self):
+        return list(self.tokens())
 
 class DocParser:
-    def __init__(self, document):
+    # детекторы, которые опрашивает determine_type (по ним же собирается профиль, utils.profiling)
+    DETECTORS = ('det_heading', 'det_caption', 'det_img_caption', 'det_image', 'det_non_text',
+                 'det_special_blocks', 'det_list')
+
+    HEADING_PATTERNS = _LazyRe([
+        r'^(РЕФЕРАТ|ВВЕДЕНИЕ|ЗАКЛЮЧЕНИЕ|СПИСОК ЛИТЕРАТУРЫ|ПРИЛОЖЕНИЯ?)$',
+        r'^ГЛАВА\s+\d+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$',
+        r'^РАЗДЕЛ\s+\d+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$',
+        r'^ЧАСТЬ\s+[IVXLCDM]+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$'
+    ])
+    # признаки формул и кода (см. special_scores): выражения без .* и вложенных повторов, каждое
+    # просматривает текст за линейное время. Ключевые слова обеих категорий ищутся одним выражением
+    SIGN_KEYWORDS_RE = _LazyRe(r'\b(?:(?P<function>sin|cos|tan|log|ln|exp|sqrt|sum|prod|int|lim)'
+                               r'|(?P<greek>alpha|beta|gamma|delta|epsilon|zeta|theta|lambda|mu|nu|xi|pi|rho|sigma'
+                               r'|tau|phi|chi|psi|omega))\b', re.IGNORECASE)
+    RELATION_RE = _LazyRe(r'[=≠≈<>≤≥∝→←↑↓↔]')
+    FRACTION_RE = _LazyRe(r'\d/\d')
+    SUBSCRIPT_RE = _LazyRe(r'[a-zA-Z]_\{', re.IGNORECASE)
+    SUPERSCRIPT_RE = _LazyRe(r'[a-zA-Z]\^\{', re.IGNORECASE)
+    CODE_START_RE = _LazyRe(r'\s*(?:if|else|for|while|def|class|function|return|import|from)\b', re.IGNORECASE)
+    # сколько признаков нужно, чтобы абзац считался формулой или кодом (из 6 и 5)
+    FORMULA_THRESHOLD = 4
+    CODE_THRESHOLD = 4
+    # маркеры, набранные текстом; «−» ставили прежние версии форматирования
+    LIST_BULLET_RE = _LazyRe(r'^[\-*+•−]\s+.+')
+    LIST_NUMBER_RE = _LazyRe(r'^[\dа-яa-z]+[).]\s+.+', re.IGNORECASE)
+    TB_CAPTION_RE = _LazyRe(r'^Таблица\s+\d+[.\-—].+|^Таблица\s+[A-ZА-Я]+\s*\.\d+[.\-—].+')
+    TB_CAPTION_LOOSE_RE = _LazyRe(r'^Таблица\s.+')
+    IMG_CAPTION_RE = _LazyRe(r'^Рисунок\s+\d+[.\-].+|^Рис.\s+[A-ZА-Я]+\s*\.\d+[.\-].+')
+    IMG_CAPTION_LOOSE_RE = _LazyRe(r'^Рисунок\s.+')
+
+    # jobs - число процессов для классификации больших документов (None или 1 - без пула)
+    def __init__(self, document, cache=None, jobs=None):
         self.doc = document
-        self.pars = document.paragraphs
+        self.pars = document.paragraphs if document is not None else []
         self.cur_section = 'content'
-
-    # Определяет тип содержимого
-    def determine_type(self, p: Paragraph) -> tuple[str, int]:
-        return (self.det_heading(p) or self.det_caption(p)
-                or self.det_img_caption(p) or self.det_image(p)
-                or self.det_non_text(p) or self.det_special_blocks(p) or self.det_list(p) or ('normal', 1))
+        self.cache = cache
+        self.jobs = jobs
+        # формат номера уровней списков документа (utils.numbering): по нему det_list отличает
+        # маркированные списки от нумерованных
+        numbering = numbering_part(document) if document is not None else None
+        self.list_formats = numbering_formats(numbering.element if numbering is not None else None)
+
+    # Определяет тип содержимого. Все детекторы читают признаки, собранные одним проходом по абзацу;
+    # обычный текст сразу идет к проверкам формул/кода и списков.
+    def determine_type(self, p: Paragraph | ParFeatures) -> tuple[str, int]:
+        f = p if isinstance(p, ParFeatures) else ParFeatures(p._p)
+        if f.plain:
+            return self.det_special_blocks(f) or self.det_list(f) or ('normal', 1)
+
+        return (self.det_heading(f) or self.det_caption(f)
+                or self.det_img_caption(f) or self.det_image(f)
+                or self.det_non_text(f) or self.det_special_blocks(f) or self.det_list(f) or ('normal', 1))
 
     # Определение заголовка
-    @staticmethod
-    def det_heading(p: Paragraph):
+    @classmethod
+    def det_heading(cls, f: ParFeatures):
         # основной путь - определение на основе xml-разметки
-        xml = p._p
-
-        xml_style, xml_outline = (xml.xpath('.//w:pStyle/@w:val')[0].lower() if xml.xpath('.//w:pStyle/@w:val') else None,
-                                  xml.xpath('.//w:outlineLvl/@w:val')[0] if xml.xpath('.//w:outlineLvl/@w:val') else None)
+        xml_style, xml_outline = (f.style.lower() if f.style else None), f.outline
         if xml_style:
             if any(tp in xml_style for tp in ["heading", "заголовок", "title"]):
-                if re.search(r'\d$', xml_style):
+                if xml_style[-1].isdecimal():
                     level = int(xml_style[-1])
                 elif xml_outline is not None:
                     level = min(3, int(xml_outline) + 1)
@@ -95,136 +320,121 @@ class DocParser:
                 return 'heading', level
 
         # запасной метод: на основе текстовых паттернов
-        text = p.text.strip().upper()
-
-        for pattern in [
-            r'^(РЕФЕРАТ|ВВЕДЕНИЕ|ЗАКЛЮЧЕНИЕ|СПИСОК ЛИТЕРАТУРЫ|ПРИЛОЖЕНИЯ?)$',
-            r'^ГЛАВА\s+\d+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$',
-            r'^РАЗДЕЛ\s+\d+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$',
-            r'^ЧАСТЬ\s+[IVXLCDM]+[.:]?\s+[А-Я][А-Яа-яё\s\d\-]{10,}$'
-        ]:
-            if re.fullmatch(pattern, text.upper()):
+        text = f.text.upper()
+
+        for pattern in cls.HEADING_PATTERNS:
+            if pattern.fullmatch(text):
                 return 'heading', 1
 
         return None
 
     # Определяет специальные блоки (в пределах ГОСТа нужны только формулы и код)
-    @staticmethod
-    def det_special_blocks(p: Paragraph):
-        text = p.text.strip()
+    @classmethod
+    def det_special_blocks(cls, f: ParFeatures):
+        text = f.text
 
-        if not text:
+        # каждый признак формулы и кода, кроме ключевых слов, требует одного из этих символов
+        if not text or _SPECIAL_CHARS_RE.search(text) is None:
             return None
 
-        formula_signs = [
-            r'.*[=≠≈<>≤≥∝→←↑↓↔].*',
-            r'.*\b(sin|cos|tan|log|ln|exp|sqrt|sum|prod|int|lim)\b.*',
-            r'.*\d+/\d+.*',
-            r'.*[a-zA-Z]_{.*}.*',
-            r'.*[a-zA-Z]\^\{.*\}.*',
-            r'.*\b(alpha|beta|gamma|delta|epsilon|zeta|theta|lambda|mu|nu|xi|pi|rho|sigma|tau|phi|chi|psi|omega)\b.*',
-        ]
-        res = 0
-        for pat in formula_signs:
-            if re.search(pat, text, flags=re.IGNORECASE):
-                res += 1
-
-        if res > 3:
+        formula, code = cls.special_scores(text)
+        if formula >= cls.FORMULA_THRESHOLD:
             return "formula", 1
-
-        code_signs = [
-            r'^\s*(if|else|for|while|def|class|function|return|import|from)\b',
-            r'.*\{.*\}.*',
-            r'.*\(.*\).*;.*',
-            r'.*//.*|.*/\*.*\*/.*',
-            r'.*->.*|.*=>.*',
-        ]
-        res = 0
-        for pat in code_signs:
-            if re.search(pat, text, flags=re.IGNORECASE):
-                res += 1
-
-        if res > 3:
+        if code >= cls.CODE_THRESHOLD:
             return "code", 1
-
         return None
 
-    # Комплексное определение списка
-    @staticmethod
-    def det_list(p: Paragraph):
-        text = p.text.strip()
-        if re.match(r'^[\-*+•]\s+.+', text):
+    # баллы (формула, код) - число сработавших признаков. Формула: знак отношения или стрелка,
+    # функция, дробь a/b, индекс x_{..}, степень x^{..}, греческая буква. Код: начинается с ключевого
+    # слова, {..}, (..)..;, комментарий // или /*..*/, -> или =>. Парные признаки ищутся в пределах
+    # одной строки абзаца
+    @classmethod
+    def special_scores(cls, text: str) -> tuple[int, int]:
+        keywords = set()
+        for m in cls.SIGN_KEYWORDS_RE.finditer(text):
+            keywords.add(m.lastgroup)
+            if len(keywords) == 2:
+                break
+
+        formula = (('function' in keywords) + ('greek' in keywords)
+                   + (cls.RELATION_RE.search(text) is not None)
+                   + (cls.FRACTION_RE.search(text) is not None)
+                   + _in_line_order(text, cls.SUBSCRIPT_RE, '}')
+                   + _in_line_order(text, cls.SUPERSCRIPT_RE, '}'))
+        code = ((cls.CODE_START_RE.match(text) is not None)
+                + _in_line_order(text, '{', '}')
+                + _in_line_order(text, '(', ')', ';')
+                + ('//' in text or _in_line_order(text, '/*', '*/'))
+                + ('->' in text or '=>' in text))
+        return formula, code
+
+    # Комплексное определение списка: элемент списка Word - по формату номера своего уровня,
+    # остальные - по маркеру или номеру, набранному в тексте. numId 0 снимает нумерацию
+    def det_list(self, f: ParFeatures):
+        if f.num_pr and f.num_id != '0':
+            level = int(f.ilvl) + 1 if f.ilvl is not None else 1
+            list_type = 'bullet' if is_bullet(self.list_format(f.num_id, level - 1)) else 'number'
+            return f'list_{list_type}', level
+
+        text = f.text
+        if self.LIST_BULLET_RE.match(text):
             return 'list_bullet', 1
-        elif re.match(r'^[\dа-яa-z]+[).]\s+.+', text, re.IGNORECASE):
+        elif self.LIST_NUMBER_RE.match(text):
             return 'list_number', 1
-        xml = p._p
-        num_pr = xml.xpath('.//w:numPr')
-        if num_pr:
-            level = int(xml.xpath('.//w:ilvl/@w:val')[0]) + 1 if xml.xpath('.//w:ilvl/@w:val') else 1
-            num_id = xml.xpath('.//w:numId/@w:val')
-            if num_id:
-                list_type = 'bullet' if int(num_id[0]) % 2 else 'number'
-                return f'list_{list_type}', level
-            else:
-                return 'list_bullet', level
-
         return None
 
+    # формат номера (bullet, decimal, ...) уровня ilvl списка numId или None, если его нет в numbering.xml
+    def list_format(self, num_id, ilvl) -> str | None:
+        return self.list_formats.get(num_id, {}).get(int(ilvl))
+
     # Определение подписи к таблице
-    @staticmethod
-    def det_caption(p: Paragraph):
-        xml, text = p._p, p.text.strip()
+    @classmethod
+    def det_caption(cls, f: ParFeatures):
+        text = f.text
 
-        if (re.match(r'^Таблица\s+\d+[.\-—].+', text)
-                or re.match( r'^Таблица\s+[A-ZА-Я]+\s*\.\d+[.\-—].+',  text)):
+        if cls.TB_CAPTION_RE.match(text):
             return 'tb_caption', 1
 
-        xml_prev = xml.getprevious()
-        text_match = re.match( r'^Таблица\s.+',  text)
-        if xml_prev is not None and xml_prev.tag.endswith('tbl') and text_match:
+        text_match = cls.TB_CAPTION_LOOSE_RE.match(text)
+        if f.prev_tag is not None and f.prev_tag.endswith('tbl') and text_match:
             return 'tb_caption', 1
 
-        xml_next = xml.getnext()
-        if xml_next is not None and xml_next.tag.endswith('tbl') and text_match:
+        if f.next_tag is not None and f.next_tag.endswith('tbl') and text_match:
             return 'tb_caption', 1
         return None
 
     # Определение картинки
     @staticmethod
-    def det_image(p: Paragraph):
-        for r in p.runs:
-            if r._element.find('.//' + qn('w:drawing')) is not None:
-                return 'image', 1
+    def det_image(f: ParFeatures):
+        if f.has_drawing:
+            return 'image', 1
         return None
 
     # Определение подписи к картинке
-    @staticmethod
-    def det_img_caption(p: Paragraph):
-        xml, text = p._p, p.text.strip()
+    @classmethod
+    def det_img_caption(cls, f: ParFeatures):
+        text = f.text
 
-        if (re.match(r'^Рисунок\s+\d+[.\-].+', text)
-                or re.match(r'^Рис.\s+[A-ZА-Я]+\s*\.\d+[.\-].+', text)):
+        if cls.IMG_CAPTION_RE.match(text):
             return 'img_caption', 1
 
-        xml_prev = xml.getprevious()
-        text_match = re.match(r'^Рисунок\s.+', text)
-        if xml_prev is not None and xml_prev.tag.endswith('drawing') and text_match:
+        text_match = cls.IMG_CAPTION_LOOSE_RE.match(text)
+        if f.prev_tag is not None and f.prev_tag.endswith('drawing') and text_match:
             return 'img_caption', 1
 
-        xml_next = xml.getnext()
-        if xml_next is not None and xml_next.tag.endswith('drawing') and text_match:
+        if f.next_tag is not None and f.next_tag.endswith('drawing') and text_match:
             return 'img_caption', 1
         return None
 
     # определение всего остального
     @staticmethod
-    def det_non_text(p: Paragraph):
-        if not p.text or re.fullmatch(r'^\s*$', p.text):
+    def det_non_text(f: ParFeatures):
+        if not f.text:
             return 'empty', 0
         return None
 
     def det_section(self, p: ParseResult):
-        text = p["text"].strip()
+        text = p.text.strip()
         section_keywords = {
             'title_page': [
                 'МИНИСТЕРСТВО', 'УНИВЕРСИТЕТ', 'КАФЕДРА', 'КУРСОВАЯ', 'ДИПЛОМ',
@@ -241,27 +451,88 @@ class DocParser:
         }
         for section, keywords in section_keywords.items():
             for keyword in keywords:
-                if keyword in text.upper() and p["ptype"] == 'heading':
+                if keyword in text.upper() and p.ptype == 'heading':
                     return section
-        if p["ptype"] == 'heading' and re.match(r'^(ГЛАВА|РАЗДЕЛ)\s+[IVXLCDM\d]', text.upper()):
+        if p.ptype == 'heading' and re.match(r'^(ГЛАВА|РАЗДЕЛ)\s+[IVXLCDM\d]', text.upper()):
             return 'content'
 
         return self.cur_section
 
-    def parse_with_sections(self):
+    # разбор с разделами документа: раздел записывается в ParseResult.section
+    def parse_with_sections(self) -> List[ParseResult]:
         ctx = self.parse()
-        structure = []
         for p in ctx:
-            structure += [(p["index"], p["par"], self.det_section(p))]
-        return ctx, structure
+            p.section = self.det_section(p)
+        return ctx
 
     def parse(self) -> List[ParseResult]:
         parse_ctx = []
         try:
-            for i, par in enumerate(self.pars):
-                pt, lvl = self.determine_type(par)
-                parse_ctx += [ParseResult(level=lvl, ptype=pt, par=par, text=par.text, index=i)]
+            if self.cache is None:
+                elements = [par._p for par in self.pars]
+                for i, (el, (pt, lvl, flags)) in enumerate(zip(elements, self.classify(elements))):
+                    parse_ctx.append(ParseResult(pt, lvl, el, i, flags))
+                return parse_ctx
+
+            # с кэшем классифицируются только абзацы, которых в нем еще нет
+            # тип элемента списка зависит и от numbering.xml: формат его уровня входит в ключ
+            elements = [par._p for par in self.pars]
+            keys = self.cache.prepare(elements, [self.list_format(*list_item(p)) for p in elements])
+            classes = [self.cache.classification(key) for key in keys]
+            missing = [i for i, known in enumerate(classes) if not known]
+            for i, known in zip(missing, self.classify([elements[i] for i in missing])):
+                classes[i] = known
+                self.cache.store_classification(keys[i], *known)
+
+            for i, (el, key, (pt, lvl, flags)) in enumerate(zip(elements, keys, classes)):
+                parse_ctx.append(ParseResult(pt, lvl, el, i, flags, key))
         except Exception as e:
-            print(e)
-
-        return parse_ctx
\ No newline at end of file
+            log.error("ошибка разбора: %s", e, exc_info=log.isEnabledFor(logging.DEBUG))
+
+        return parse_ctx
+
+    # (тип, уровень, признаки) для каждого w:p; большие документы классифицируются на пуле процессов
+    def classify(self, elements) -> list[tuple[str, int, int]]:
+        # пул только по явной просьбе (-j N): на одном ядре он медленнее последовательного разбора
+        jobs = self.jobs or 1
+        # меньше двух кусков делить нечего
+        if jobs > 1 and len(elements) >= max(PARALLEL_MIN, 2 * _PAR_CHUNK):
+            return _classify_parallel(elements, jobs, self.list_formats)
+
+        classes = []
+        for p in elements:
+            f = ParFeatures(p)
+            classes.append((*self.determine_type(f), f.flags))
+        return classes
+
+
+def _neighbour_tags(p) -> tuple[str | None, str | None]:
+    prev, nxt = p.getprevious(), p.getnext()
+    return prev.tag if prev is not None else None, nxt.tag if nxt is not None else None
+
+
+# задача процесса пула: кусок абзацев одним XML, соседи - только тегами (больше детекторы о них не знают),
+# и форматы списков документа
+def _classify_chunk(blob, neighbours, list_formats):
+    parser = DocParser(None)
+    parser.list_formats = list_formats
+    classes = []
+    for p, tags in zip(parse_xml(blob), neighbours):
+        f = ParFeatures(p, tags)
+        classes.append((*parser.determine_type(f), f.flags))
+    return classes
+
+
+# абзацы режутся на куски по порядку и собираются обратно в том же порядке. Исключающая
+# каноникализация оставляет у каждого абзаца только нужные ему пространства имен, а не все
+# объявления корня документа, - так кусок в несколько раз меньше и быстрее разбирается в процессе пула.
+# Вызовы детекторов в дочерних процессах в профиль (utils.profiling) не попадают.
+def _classify_parallel(elements, jobs, list_formats):
+    with ProcessPoolExecutor(min(jobs, -(-len(elements) // _PAR_CHUNK))) as pool:
+        futures = []
+        for i in range(0, len(elements), _PAR_CHUNK):
+            chunk = elements[i:i + _PAR_CHUNK]
+            blob = b''.join(etree.tostring(p, method='c14n', exclusive=True) for p in chunk)
+            futures.append(pool.submit(_classify_chunk, b'<chunk>' + blob + b'</chunk>',
+                                       [_neighbour_tags(p) for p in chunk], list_formats))
+        return [known for future in futures for known in future.result()]
@@ -0,0 +1,30 @@
+from docx import Document
+
+from style_configs.style_config import StyleManager
+from utils.cache import ParCache
+from utils.converters import Converter, MarkdownConverter
+from utils.images import ImageOptions
+from utils.parsers import DocParser, MdParser
+from utils.profiling import profiler
+
+
+# разбор входного файла (.docx или .txt) и подготовка конвертера; сохранение остается за вызывающим.
+# jobs - число процессов для классификации абзацев больших .docx (см. DocParser) и потоков сжатия
+# при сохранении и оптимизации рисунков, compression - уровень сжатия измененных частей пакета
+# (см. utils.package), images - параметры оптимизации рисунков или None (см. utils.images)
+def load_converter(input_file: str, output_file: str, style_conf: StyleManager = None,
+                   cache: ParCache = None, jobs: int = None, compression: int = None,
+                   images: ImageOptions = None) -> Converter:
+    if input_file.endswith(".txt"):
+        # токены читаются из файла построчно по мере сборки документа
+        with open(input_file, encoding="utf-8") as text, profiler.stage('parse'):
+            md = MarkdownConverter(MdParser(text).tokens(), output_file)
+            doc = md.convert_to_doc()
+        return Converter(doc, md.ctx, output_file, style_conf, compression=compression, jobs=jobs, images=images,
+                         table_align=md.table_align)
+
+    with profiler.stage('load'):
+        doc = Document(input_file)
+    with profiler.stage('parse'):
+        data = DocParser(doc, cache, jobs).parse()
+    return Converter(doc, data, output_file, style_conf, cache, input_file, compression, jobs, images)
@@ -0,0 +1,189 @@
+# Профилирование запуска (--profile): время этапов, работа детекторов классификации, число типов
+# абзацев, созданные и удаленные XML-элементы и размер результата.
+#
+# Выключенный профайлер почти ничего не стоит: этапы получают общий пустой контекст, а детекторы
+# DocParser и удаление элементов оборачиваются только на время включенного профилирования.
+# Отчет пишется в JSON; в формате trace - в формате событий Chrome (chrome://tracing, Perfetto,
+# speedscope), где этапы и вызовы детекторов видны как флеймграф.
+
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from docx.oxml.xmlchemy import BaseOxmlElement
+
+_NULL = nullcontext()
+
+
+def _size(el) -> int:
+    return sum(1 for _ in el.iter())
+
+
+class _DetectorStats:
+    __slots__ = ('calls', 'hits', 'hit_time', 'miss_time')
+
+    def __init__(self):
+        self.calls = self.hits = 0
+        self.hit_time = self.miss_time = 0.0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'hits': self.hits, 'misses': self.calls - self.hits,
+                'hit_time': round(self.hit_time, 6), 'miss_time': round(self.miss_time, 6)}
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        self._patched = []
+        self._reset()
+
+    def _reset(self):
+        self.started, self.cpu_started = time.perf_counter(), time.process_time()
+        self.stages = []
+        self.events = []
+        self.detectors = {}
+        self.resolved = Counter()
+        self.determine_calls, self.determine_time = 0, 0.0
+        self.ptypes = Counter()
+        self.removed = 0
+        self.output_bytes = None
+        self._resolved_by = None
+
+    # trace=True дополнительно записывает каждый вызов детектора как событие
+    def start(self, parser_cls, trace=False):
+        self._reset()
+        self.enabled, self.trace = True, trace
+        for name in parser_cls.DETECTORS:
+            self._wrap(parser_cls, name, self._detector(name))
+        self._wrap(parser_cls, 'determine_type', self._determine)
+        for name in ('remove', 'replace'):
+            self._wrap(BaseOxmlElement, name, self._removal)
+
+    def stop(self):
+        for owner, name, raw in reversed(self._patched):
+            if raw is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, raw)
+        self._patched.clear()
+        self.enabled = False
+
+    # замена атрибута класса оберткой с сохранением вида метода (classmethod, staticmethod)
+    def _wrap(self, owner, name, make):
+        raw = owner.__dict__.get(name)
+        if isinstance(raw, classmethod):
+            wrapped = classmethod(make(raw.__func__))
+        elif isinstance(raw, staticmethod):
+            wrapped = staticmethod(make(raw.__func__))
+        else:
+            wrapped = make(raw if raw is not None else getattr(owner, name))
+        self._patched.append((owner, name, raw))
+        setattr(owner, name, wrapped)
+
+    def _event(self, name, cat, start, duration, args=None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': 0, 'tid': 0,
+                 'ts': round((start - self.started) * 1e6, 1), 'dur': round(duration * 1e6, 1)}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def _detector(self, name):
+        stats = self.detectors.setdefault(name, _DetectorStats())
+
+        def make(func):
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                result = func(*args, **kwargs)
+                elapsed = time.perf_counter() - started
+                stats.calls += 1
+                if result is None:
+                    stats.miss_time += elapsed
+                else:
+                    stats.hits += 1
+                    stats.hit_time += elapsed
+                    self._resolved_by = name
+                if self.trace:
+                    self._event(name, 'detector', started, elapsed)
+                return result
+            return wrapper
+        return make
+
+    # какой детектор определил тип абзаца; без попаданий тип назначается по умолчанию
+    def _determine(self, func):
+        def wrapper(*args, **kwargs):
+            self._resolved_by = None
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            self.determine_calls += 1
+            self.determine_time += elapsed
+            self.resolved[self._resolved_by or 'default'] += 1
+            if self.trace:
+                self._event('determine_type', 'parse', started, elapsed, {'ptype': result[0]})
+            return result
+        return wrapper
+
+    # удаление через элементы python-docx; считается все удаленное поддерево
+    def _removal(self, func):
+        def wrapper(el, child, *args):
+            self.removed += _size(child)
+            return func(el, child, *args)
+        return wrapper
+
+    # этап конвейера; если передан корень XML, считаются созданные и удаленные на этапе элементы
+    def stage(self, name, root=None):
+        if not self.enabled:
+            return _NULL
+        return self._stage(name, root)
+
+    @contextmanager
+    def _stage(self, name, root):
+        before, removed = (_size(root) if root is not None else None), self.removed
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {'name': name, 'wall': round(time.perf_counter() - wall, 6),
+                      'cpu': round(time.process_time() - cpu, 6)}
+            if root is not None:
+                record['removed'] = self.removed - removed
+                record['created'] = _size(root) - before + record['removed']
+            self.stages.append(record)
+            self._event(name, 'stage', wall, record['wall'])
+
+    def count_types(self, data):
+        if self.enabled:
+            self.ptypes.update(c.ptype for c in data)
+
+    def output_size(self, path):
+        if self.enabled:
+            self.output_bytes = os.path.getsize(path)
+
+    def report(self) -> dict:
+        elements = [s for s in self.stages if 'created' in s]
+        return {
+            'total': {'wall': round(time.perf_counter() - self.started, 6),
+                      'cpu': round(time.process_time() - self.cpu_started, 6)},
+            'stages': self.stages,
+            'determine_type': {'calls': self.determine_calls, 'time': round(self.determine_time, 6),
+                               'resolved_by': dict(self.resolved.most_common())},
+            'detectors': {name: s.as_dict() for name, s in self.detectors.items()},
+            'ptypes': dict(self.ptypes.most_common()),
+            'elements': {'created': sum(s['created'] for s in elements),
+                         'removed': sum(s['removed'] for s in elements)},
+            'output_bytes': self.output_bytes,
+        }
+
+    def save(self, path, fmt='json'):
+        report = self.report()
+        if fmt == 'trace':
+            report = {'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': report}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=None if fmt == 'trace' else 2)
+
+
+# общий профайлер процесса; включается из cli.py
+profiler = Profiler()
@@ -0,0 +1,487 @@
+# Сервер форматирования (--serve): HTTP на localhost или на Unix-сокете.
+#
+#   POST /format   тело - байты .docx или текста .txt (UTF-8), ответ - байты готового .docx
+#   GET  /metrics  JSON: гистограммы задержек, глубина очереди, пропускная способность, ошибки
+#   GET  /health   JSON: число процессов и свободных из них
+#
+# Документы обрабатывают заранее запущенные процессы: модули, стили и регулярки загружаются
+# в каждом один раз, до первого запроса. Одновременно принимается не больше запросов, чем процессов
+# плюс длина очереди; остальным сразу отвечает 503 с Retry-After, а не копит их в памяти. Запрос,
+# не уложившийся в таймаут, получает 504, а занятый им процесс перезапускается.
+# Тип входного файла определяется по содержимому: .docx - zip-архив, все остальное - текст.
+
+import io
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+# границы гистограмм задержек, с
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# окно, по которому считается текущая пропускная способность, с
+RATE_WINDOW = 60
+
+# небольшой документ, который каждый процесс оформляет при запуске: после него импортированы все
+# модули обработки, собраны стили и скомпилированы регулярки разбора
+_WARMUP = "# Введение\n\nТекст абзаца.\n\n- пункт списка\n\n| a | b |\n|---|---|\n| 1 | 2 |\n"
+
+
+def _suffix(data: bytes) -> str:
+    return '.docx' if data[:4] == b'PK\x03\x04' else '.txt'
+
+
+def _worker(conn, styles, compression, images, cache_dir):
+    from style_configs.style_config import StyleManager
+    from utils.pipeline import load_converter
+
+    def convert(path):
+        conv = load_converter(path, os.devnull, style_conf, jobs=1, compression=compression, images=images)
+        conv.format()
+        out = io.BytesIO()
+        conv.save(out)
+        return out.getvalue()
+
+    style_conf = StyleManager(styles, cache_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        warmup = os.path.join(tmp, 'warmup.txt')
+        with open(warmup, 'w', encoding='utf-8') as f:
+            f.write(_WARMUP)
+        convert(warmup)
+        conn.send(('ready', None, 0.0))
+
+        while True:
+            try:
+                data = conn.recv()
+            except EOFError:
+                break
+            if data is None:
+                break
+
+            started = time.perf_counter()
+            path = os.path.join(tmp, 'input' + _suffix(data))
+            try:
+                with open(path, 'wb') as f:
+                    f.write(data)
+                conn.send(('ok', convert(path), time.perf_counter() - started))
+            except Exception as e:
+                # путь временного файла клиенту ничего не говорит
+                conn.send(('error', str(e).replace(path, 'файл'), time.perf_counter() - started))
+
+
+class _Process:
+    def __init__(self, ctx, styles, compression, images, cache_dir):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker, args=(child, styles, compression, images, cache_dir),
+                                   daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    # следующее сообщение процесса; None - не дождались
+    def _recv(self, timeout):
+        if not self.conn.poll(max(timeout, 0)):
+            return None
+        message = self.conn.recv()
+        if message[0] == 'ready':
+            self.ready = True
+        return message
+
+    def wait_ready(self, timeout) -> bool:
+        deadline = time.monotonic() + timeout
+        try:
+            while not self.ready:
+                if self._recv(deadline - time.monotonic()) is None:
+                    return False
+        except (EOFError, OSError):
+            return False
+        return True
+
+    # (статус, результат или текст ошибки, время обработки); TimeoutError, если не уложились в срок
+    def call(self, data: bytes, deadline: float):
+        self.conn.send(data)
+        while True:
+            message = self._recv(deadline - time.monotonic())
+            if message is None:
+                raise TimeoutError
+            if message[0] != 'ready':
+                return message
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# процессы обработки. spawn вместо fork: процессы перезапускаются, пока у сервера уже работают потоки
+class WorkerPool:
+    # cache_dir - каталог кэша скомпилированных стилей (см. StyleManager) или None
+    def __init__(self, size=None, styles=None, compression=None, images=None, cache_dir=None):
+        self.size = max(1, size or os.cpu_count() or 1)
+        self.styles, self.compression, self.images, self.cache_dir = styles, compression, images, cache_dir
+        self.ctx = mp.get_context('spawn')
+        # последним освободившийся процесс берется первым: у него "теплее" кэши
+        self.idle = queue.LifoQueue()
+        self.restarts = 0
+        self.processes = [_Process(self.ctx, styles, compression, images, cache_dir) for _ in range(self.size)]
+
+    def start(self, timeout=120):
+        for p in self.processes:
+            if not p.wait_ready(timeout):
+                self.close()
+                raise RuntimeError("процесс обработки не запустился")
+            self.idle.put(p)
+
+    def _replace(self, p):
+        p.kill()
+        self.restarts += 1
+        replacement = _Process(self.ctx, self.styles, self.compression, self.images, self.cache_dir)
+        self.processes[self.processes.index(p)] = replacement
+        return replacement
+
+    # обработка одного документа до deadline (time.monotonic); возвращает (статус, результат, время
+    # ожидания свободного процесса, время обработки или None, если процесс так и не освободился),
+    # статус - 'ok', 'error', 'timeout' или 'crash'. dispatched вызывается, когда процесс получен
+    def run(self, data: bytes, deadline: float, dispatched=None):
+        waited = time.monotonic()
+        try:
+            p = self.idle.get(timeout=max(deadline - waited, 0))
+        except queue.Empty:
+            return 'timeout', "нет свободного процесса", time.monotonic() - waited, None
+        waited = time.monotonic() - waited
+        if dispatched is not None:
+            dispatched()
+
+        started = time.perf_counter()
+        try:
+            status, result, _ = p.call(data, deadline)
+        except TimeoutError:
+            p, status, result = self._replace(p), 'timeout', "превышено время обработки"
+        except (EOFError, OSError):
+            p, status, result = self._replace(p), 'crash', "процесс обработки аварийно завершился"
+        finally:
+            self.idle.put(p)
+        return status, result, waited, time.perf_counter() - started
+
+    def close(self):
+        for p in self.processes:
+            p.stop()
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count, self.sum = 0, 0.0
+
+    def observe(self, value):
+        self.counts[next((i for i, b in enumerate(BUCKETS) if value <= b), len(BUCKETS))] += 1
+        self.count += 1
+        self.sum += value
+
+    # накопленные счетчики по верхним границам, как в гистограммах Prometheus
+    def as_dict(self):
+        buckets, total = {}, 0
+        for bound, n in zip([*map(str, BUCKETS), '+Inf'], self.counts):
+            total += n
+            buckets[bound] = total
+        return {'buckets': buckets, 'count': self.count, 'sum': round(self.sum, 6)}
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.statuses = {}
+        self.latency = {name: _Histogram() for name in ('total', 'queue_wait', 'processing')}
+        self.waiting = self.max_waiting = self.busy = 0
+        self.bytes_in = self.bytes_out = 0
+        self.completed = 0
+        self.recent = deque()
+
+    def queued(self):
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def dispatched(self):
+        with self.lock:
+            self.waiting -= 1
+            self.busy += 1
+
+    # waited - None для запросов, не дошедших до очереди; processing - None, если процесс не освободился
+    def finished(self, code, total, waited=None, processing=None, bytes_in=0, bytes_out=0):
+        now = time.monotonic()
+        with self.lock:
+            self.statuses[code] = self.statuses.get(code, 0) + 1
+            self.latency['total'].observe(total)
+            if waited is not None:
+                self.latency['queue_wait'].observe(waited)
+                if processing is None:
+                    self.waiting -= 1
+                else:
+                    self.busy -= 1
+                    self.latency['processing'].observe(processing)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            if code == 200:
+                self.completed += 1
+                self.recent.append(now)
+
+    def as_dict(self, pool) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0] < now - RATE_WINDOW:
+                self.recent.popleft()
+            uptime = now - self.started
+            return {
+                'uptime': round(uptime, 3),
+                'requests': {str(code): n for code, n in sorted(self.statuses.items())},
+                'latency': {name: h.as_dict() for name, h in self.latency.items()},
+                'queue': {'depth': self.waiting, 'max_depth': self.max_waiting, 'busy': self.busy,
+                          'workers': pool.size, 'worker_restarts': pool.restarts},
+                'throughput': {'completed': self.completed,
+                               'per_second': round(len(self.recent) / min(max(uptime, 1e-9), RATE_WINDOW), 3),
+                               'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out},
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'gost-report-helper'
+    admitted = False
+
+    # медленный клиент не держит место в очереди дольше таймаута запроса
+    def setup(self):
+        self.timeout = self.server.request_timeout
+        super().setup()
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _reply(self, code, body: bytes, content_type='application/json', headers=()):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, code, data, headers=()):
+        self._reply(code, json.dumps(data, ensure_ascii=False).encode(), headers=headers)
+
+    def _error(self, code, message, headers=()):
+        self._json(code, {'error': message}, headers)
+
+    # отказ до чтения тела: соединение после ответа закрывается
+    def _reject(self, code, message, headers=()):
+        self.close_connection = True
+        try:
+            self._error(code, message, headers)
+            if self.command == 'POST':
+                self._linger()
+        except OSError:
+            pass
+        self.server.metrics.finished(code, time.monotonic() - self.started)
+
+    # сокет, закрытый с непрочитанным телом запроса, сбрасывается (RST), и клиент, еще передающий
+    # файл, может не получить ответ. Поэтому остаток тела недолго читается и отбрасывается
+    def _linger(self, timeout=2):
+        self.wfile.flush()
+        self.connection.shutdown(socket.SHUT_WR)
+        self.connection.settimeout(timeout)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.connection.recv(65536):
+            pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/metrics':
+            self._json(200, server.metrics.as_dict(server.pool))
+        elif self.path == '/health':
+            self._json(200, {'workers': server.pool.size, 'idle': server.pool.idle.qsize()})
+        else:
+            self._error(404, "неизвестный адрес")
+
+    # проверки до чтения тела: адрес, размер, место в очереди. При отказе отвечает сам и возвращает False
+    def _admit(self) -> bool:
+        server = self.server
+        if self.path != '/format':
+            self._reject(404, "неизвестный адрес")
+            return False
+        length = self.headers.get('Content-Length', '')
+        if not length.isdigit():
+            self._reject(411, "нужен заголовок Content-Length")
+            return False
+        if int(length) > server.max_size:
+            self._reject(413, f"файл больше {server.max_size} байт")
+            return False
+        if not server.slots.acquire(blocking=False):
+            self._reject(503, "сервер перегружен, повторите позже", [('Retry-After', '1')])
+            return False
+        self.length, self.admitted = int(length), True
+        return True
+
+    # клиент с Expect: 100-continue получает отказ до того, как начнет передавать файл
+    def handle_expect_100(self):
+        self.started = time.monotonic()
+        return self._admit() and super().handle_expect_100()
+
+    def do_POST(self):
+        server = self.server
+        if not self.admitted:
+            self.started = time.monotonic()
+            if not self._admit():
+                return
+        self.admitted, started, length = False, self.started, self.length
+
+        try:
+            try:
+                data = self.rfile.read(length)
+            except OSError:
+                data = b''
+            if len(data) < length:
+                self._reject(408, "тело запроса получено не полностью")
+                return
+            server.metrics.queued()
+            status, result, waited, processing = server.pool.run(data, started + server.request_timeout,
+                                                                 server.metrics.dispatched)
+        finally:
+            server.slots.release()
+
+        code = {'ok': 200, 'error': 422, 'timeout': 504, 'crash': 500}[status]
+        if code == 200:
+            self._reply(200, result, DOCX_TYPE)
+        else:
+            self._error(code, result)
+        server.metrics.finished(code, time.monotonic() - started, waited, processing,
+                                length, len(result) if code == 200 else 0)
+
+
+class _Server:
+    daemon_threads = True
+    # повторный запуск сразу после остановки не должен ждать освобождения порта
+    allow_reuse_address = True
+
+    def configure(self, pool, max_size, timeout, queue_size):
+        self.pool, self.metrics = pool, Metrics()
+        self.max_size, self.request_timeout, self.queue_size = max_size, timeout, queue_size
+        self.slots = threading.BoundedSemaphore(pool.size + queue_size)
+
+
+class _TCPServer(_Server, ThreadingHTTPServer):
+    pass
+
+
+# Unix-сокеты есть не везде (на Windows их нет в socketserver)
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(_Server, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        def server_close(self):
+            super().server_close()
+            if os.path.exists(self.server_address):
+                os.remove(self.server_address)
+else:
+    _UnixServer = None
+
+
+# адрес: "unix:/путь/к/сокету", "хост:порт" или только порт (на 127.0.0.1)
+def parse_address(address: str):
+    if address.startswith('unix:'):
+        return address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"неверный адрес сервера: {address}")
+    return host or '127.0.0.1', int(port)
+
+
+def create_server(address, pool: WorkerPool, max_size=50 * 2**20, timeout=120, queue_size=None):
+    address = parse_address(address) if isinstance(address, str) else address
+    if isinstance(address, str):
+        if _UnixServer is None:
+            raise ValueError("Unix-сокеты на этой системе не поддерживаются, укажите хост:порт")
+        if os.path.exists(address):
+            os.remove(address)
+        server = _UnixServer(address, _Handler)
+    else:
+        server = _TCPServer(address, _Handler)
+    server.configure(pool, max_size, timeout, pool.size * 2 if queue_size is None else queue_size)
+    return server
+
+
+def serve(address='127.0.0.1:8000', jobs=None, styles=None, max_size=50 * 2**20, timeout=120, queue_size=None,
+          compression=None, images=None, cache_dir=None):
+    if styles:
+        # ошибка в профиле видна сразу, а не как незапустившиеся процессы
+        from style_configs.style_config import StyleManager
+        StyleManager(styles)
+
+    pool = WorkerPool(jobs, styles, compression, images, cache_dir)
+    pool.start()
+    try:
+        server = create_server(address, pool, max_size, timeout, queue_size)
+    except BaseException:
+        pool.close()
+        raise
+
+    where = server.server_address
+    where = f"unix:{where}" if isinstance(where, str) else f"http://{where[0]}:{where[1]}"
+    print(f"сервер: {where}, процессов: {pool.size}, очередь: {server.queue_size} "
+          f"(Ctrl+C для выхода)")
+    # остановка службы (SIGTERM) - так же, как Ctrl+C: процессы обработки завершаются, сокет удаляется
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("сервер остановлен")
+    finally:
+        server.server_close()
+        pool.close()
+
+
+# простой клиент для проверок и скриптов: (код ответа, заголовки, тело)
+def request(address, method, path, body: bytes = None, timeout=None):
+    import http.client
+
+    address = parse_address(address) if isinstance(address, str) else address
+    if isinstance(address, str):
+        conn = http.client.HTTPConnection('localhost', timeout=timeout)
+        conn.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.sock.settimeout(timeout)
+        conn.sock.connect(address)
+    else:
+        conn = http.client.HTTPConnection(*address, timeout=timeout)
+    try:
+        try:
+            conn.request(method, path, body)
+        except (BrokenPipeError, ConnectionResetError):
+            # сервер отказал (413, 503) и закрыл соединение, не дочитав файл; ответ уже отправлен
+            pass
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
@@ -0,0 +1,376 @@
+# Потоковый режим для очень больших .docx.
+#
+# word/document.xml читается кусками (XMLPullParser), каждый дочерний элемент w:body классифицируется
+# и форматируется в скользящем окне, а затем сразу пишется в выходной архив и удаляется из дерева.
+# Остальные части пакета (картинки и т.п.) копируются потоком как есть, без распаковки и повторного
+# сжатия (utils.package).
+#
+# Потолок памяти: окно из нескольких соседних элементов тела (абзацы, таблица между ними и вставленные
+# подписи) + небольшие служебные части (styles.xml, колонтитулы, .rels, [Content_Types].xml) + буферы
+# чтения/записи по CHUNK_SIZE. От числа абзацев он не зависит; самый большой одиночный элемент
+# (обычно крупная таблица) - единственное, что держится в памяти целиком.
+
+import posixpath
+import zipfile
+from collections import deque
+from functools import lru_cache
+
+from lxml import etree
+from docx.enum.section import WD_HEADER_FOOTER
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup, parse_xml
+from docx.section import Section
+from docx.styles.styles import Styles
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+from style_configs.style_config import DEFAULT_STYLES_XML, StyleManager
+from utils.converters import Converter
+from utils.numbering import new_numbering, numbering_formats, register_lists
+from utils.package import PackageZip
+from utils.parsers import DocParser, ParFeatures, ParseResult
+
+CHUNK_SIZE = 1 << 16
+
+_BODY, _P, _TBL, _SECT_PR = qn('w:body'), qn('w:p'), qn('w:tbl'), qn('w:sectPr')
+_PKG_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_CT_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+
+# пустой нижний колонтитул нового документа python-docx (абзац со стилем Footer), один раз на процесс
+@lru_cache
+def _default_footer() -> bytes:
+    from docx import Document
+
+    footer = Document().sections[0].footer
+    footer.is_linked_to_previous = False
+    return etree.tostring(footer.part.element)
+
+
+# Потоковый разбор document.xml. Выдает ('root', el) и ('body', el) на открытии w:document и w:body,
+# ('child', el) на закрытии каждого прямого потомка корня или тела и ('body_end', el) на закрытии w:body.
+# Обработанных потомков вызывающий код удаляет из дерева сам.
+def iter_body(stream, lookup=True):
+    parser = etree.XMLPullParser(events=('start', 'end'), remove_blank_text=True,
+                                 resolve_entities=False, huge_tree=True)
+    if lookup:
+        parser.set_element_class_lookup(element_class_lookup)
+
+    root = body = None
+    while True:
+        data = stream.read(CHUNK_SIZE)
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+
+        for event, el in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = el
+                    yield 'root', el
+                elif body is None and el.tag == _BODY and el.getparent() is root:
+                    body = el
+                    yield 'body', el
+            else:
+                parent = el.getparent()
+                if el is body:
+                    yield 'body_end', el
+                elif parent is not None and (parent is body or parent is root):
+                    yield 'child', el
+
+        if not data:
+            return
+
+
+def section_properties(el):
+    if el.tag == _SECT_PR:
+        return el
+    if el.tag == _P:
+        ppr = el.find(qn('w:pPr'))
+        if ppr is not None:
+            return ppr.find(qn('w:sectPr'))
+    return None
+
+
+# заменяет DocumentPart для прокси python-docx: id стилей берется из отдельно разобранного styles.xml
+class _StreamPart:
+    def __init__(self, styles: Styles):
+        self.styles = styles
+
+    def get_style_id(self, style_or_name, style_type):
+        return self.styles.get_style_id(style_or_name, style_type)
+
+
+class _StreamStory:
+    def __init__(self, part: _StreamPart):
+        self.part = part
+
+
+# окно результатов разбора: Converter.keep_empty обращается к соседям по глобальному индексу абзаца
+class _Window:
+    def __init__(self):
+        self.records = deque()
+        self.offset = 0
+
+    def __len__(self):
+        return self.offset + len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index - self.offset]
+
+    def append(self, record):
+        self.records.append(record)
+
+    def trim(self, keep_from):
+        while self.records and self.offset < keep_from:
+            self.records.popleft()
+            self.offset += 1
+
+
+class _Package:
+    def __init__(self, zin: zipfile.ZipFile):
+        self.zin = zin
+        self.names = set(zin.namelist())
+
+        pkg_rels = etree.fromstring(zin.read('_rels/.rels'))
+        self.main = next(self.targets(pkg_rels, '', RT.OFFICE_DOCUMENT))
+        self.main_dir = posixpath.dirname(self.main)
+        self.rels_name = posixpath.join(self.main_dir, '_rels', posixpath.basename(self.main) + '.rels')
+        self.rels = etree.fromstring(zin.read(self.rels_name))
+        self.content_types = etree.fromstring(zin.read('[Content_Types].xml'))
+
+    @staticmethod
+    def targets(rels, base_dir, reltype):
+        for rel in rels:
+            if rel.get('Type') == reltype and rel.get('TargetMode') != 'External':
+                target = rel.get('Target')
+                if target.startswith('/'):
+                    yield target[1:]
+                else:
+                    yield posixpath.normpath(posixpath.join(base_dir, target))
+
+    def part_by_rid(self, rid):
+        for rel in self.rels:
+            if rel.get('Id') == rid:
+                return posixpath.normpath(posixpath.join(self.main_dir, rel.get('Target')))
+        raise KeyError(rid)
+
+    def part_by_type(self, reltype):
+        return next(self.targets(self.rels, self.main_dir, reltype), None)
+
+    # новая часть пакета: связь от главной части и переопределение типа содержимого
+    def add_part(self, tmpl, reltype, content_type):
+        n = 1
+        while tmpl % n in self.names:
+            n += 1
+        name = tmpl % n
+        self.names.add(name)
+
+        ids = {rel.get('Id') for rel in self.rels}
+        rid = next(f'rId{k}' for k in range(1, len(ids) + 2) if f'rId{k}' not in ids)
+        etree.SubElement(self.rels, f'{{{_PKG_RELS_NS}}}Relationship',
+                         Id=rid, Type=reltype, Target=posixpath.relpath(name, self.main_dir))
+        etree.SubElement(self.content_types, f'{{{_CT_NS}}}Override',
+                         PartName='/' + name, ContentType=content_type)
+        return name, rid
+
+
+class StreamConverter(Converter):
+    def __init__(self, input_path: str, output_path: str, style_conf: StyleManager = None, compression: int = None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.compression = compression
+
+        # документа в памяти нет: стили, списки и родитель новых абзацев появляются в prepare_parts;
+        # выравнивание столбцов задается только разметкой Markdown, в .docx его нет
+        self._init_formatting(None, _Window(), style_conf or StyleManager())
+        self.parser = DocParser(None)
+
+        self.tb_counter = 0
+        self.section_counter = 0
+
+    # предварительный проход: какие разделы ссылаются на свой нижний колонтитул
+    @staticmethod
+    def scan_sections(stream):
+        footers, body = [], None
+        for event, el in iter_body(stream, lookup=False):
+            if event == 'body':
+                body = el
+            elif event == 'child' and el.getparent() is body:
+                sect_pr = section_properties(el)
+                if sect_pr is not None:
+                    ref = sect_pr.find(f'{qn("w:footerReference")}[@{qn("w:type")}="default"]')
+                    footers.append(ref.get(qn('r:id')) if ref is not None else None)
+                body.remove(el)
+        return footers
+
+    # повторяет python-docx: раздел без своего колонтитула пишет номер страницы в ближайший предыдущий,
+    # а если такого нет - в новый колонтитул первого раздела
+    @staticmethod
+    def plan_footers(footers):
+        targets, refs = {}, list(footers)
+        for i in range(1, len(refs)):
+            j = i
+            while j >= 0 and refs[j] is None:
+                j -= 1
+            if j < 0:
+                j, refs[0] = 0, ''
+            targets[refs[j]] = targets.get(refs[j], 0) + 1
+        return targets
+
+    def prepare_parts(self, pkg: _Package):
+        parts = {}
+
+        styles_name = pkg.part_by_type(RT.STYLES)
+        if styles_name is None:
+            styles_name, _ = pkg.add_part('word/styles%d.xml', RT.STYLES, CT.WML_STYLES)
+            styles_el = parse_xml(DEFAULT_STYLES_XML)
+        else:
+            styles_el = parse_xml(pkg.zin.read(styles_name))
+
+        styles = Styles(styles_el)
+        self.style_conf.apply_styles(styles)
+        self._story = _StreamStory(_StreamPart(styles))
+        parts[styles_name] = styles_el
+
+        # numbering.xml пишется после тела: нумерованные списки ГОСТ заводятся по ходу форматирования
+        self.numbering_name = pkg.part_by_type(RT.NUMBERING)
+        if self.numbering_name is None:
+            self.numbering_name, _ = pkg.add_part('word/numbering%d.xml', RT.NUMBERING, CT.WML_NUMBERING)
+            self.numbering = new_numbering()
+        else:
+            self.numbering = parse_xml(pkg.zin.read(self.numbering_name))
+        self.parser.list_formats = numbering_formats(self.numbering)
+        self.lists = register_lists(self.numbering)
+
+        with pkg.zin.open(pkg.main) as src:
+            targets = self.plan_footers(self.scan_sections(src))
+
+        self.new_footer_rid = None
+        for rid, count in targets.items():
+            if rid:
+                name = pkg.part_by_rid(rid)
+                ftr = parse_xml(pkg.zin.read(name))
+            else:
+                name, self.new_footer_rid = pkg.add_part('word/footer%d.xml', RT.FOOTER, CT.WML_FOOTER)
+                ftr = parse_xml(_default_footer())
+
+            story = _StreamStory(self._story.part)
+            for _ in range(count):
+                self.add_page_number(Paragraph(ftr.add_p(), story))
+            parts[name] = ftr
+
+        parts[pkg.rels_name] = pkg.rels
+        parts['[Content_Types].xml'] = pkg.content_types
+        return {name: etree.tostring(el, encoding='UTF-8', standalone=True) for name, el in parts.items()}
+
+    def start(self):
+        with zipfile.ZipFile(self.input_path) as zin, open(self.input_path, 'rb') as raw, \
+                PackageZip(self.output_path, self.compression) as zout:
+            pkg = _Package(zin)
+            parts = self.prepare_parts(pkg)
+
+            for info in zin.infolist():
+                name = info.filename
+                if name == pkg.main:
+                    with zin.open(info) as src, zout.stream(name) as dst:
+                        self.transform(src, dst)
+                elif name in parts:
+                    zout.writestr(name, parts.pop(name))
+                elif name != self.numbering_name:
+                    zout.copy_raw(raw, info)
+
+            # части, которых не было в исходном пакете
+            for name, blob in parts.items():
+                zout.writestr(name, blob)
+            zout.writestr(self.numbering_name, etree.tostring(self.numbering, encoding='UTF-8', standalone=True))
+
+    def transform(self, src, dst):
+        root = body = None
+        self._pending = deque()
+        self._last_tag = self._keep = None
+
+        for event, el in iter_body(src):
+            if event == 'root':
+                root = el
+                self._strip = [f' xmlns:{p}="{u}"'.encode() if p else f' xmlns="{u}"'.encode()
+                               for p, u in root.nsmap.items()]
+                dst.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+                dst.write(etree.tostring(root.makeelement(root.tag, root.attrib, nsmap=root.nsmap))[:-2] + b'>')
+            elif event == 'body':
+                body = el
+                dst.write(f'<{root.prefix}:body>'.encode() if root.prefix else b'<body>')
+            elif event == 'child' and el.getparent() is root:
+                dst.write(self._serialize(el))
+                root.remove(el)
+            elif event == 'child':
+                self._arrive(el)
+                self._flush(body, dst)
+            elif event == 'body_end':
+                self._arrive(None)
+                self._flush(body, dst, final=True)
+                dst.write(f'</{root.prefix}:body>'.encode() if root.prefix else b'</body>')
+
+        dst.write(f'</{root.prefix}:{etree.QName(root).localname}>'.encode() if root.prefix
+                  else f'</{etree.QName(root).localname}>'.encode())
+
+    # элемент тела прочитан полностью: можно завершить предыдущий (ему известен следующий сосед)
+    def _arrive(self, el):
+        if self._pending:
+            last = self._pending[-1]
+            if last[0].tag == _P and last[1] is None:
+                f = ParFeatures(last[0], neighbours=(last[2], el.tag if el is not None else None))
+                pt, lvl = self.parser.determine_type(f)
+                last[1] = ParseResult(pt, lvl, last[0], len(self.data), f.flags)
+                self.data.append(last[1])
+            elif last[0].tag == _TBL:
+                self.tb_counter += 1
+                self.format_table(Table(last[0], self._story), self.tb_counter)
+
+        if el is None:
+            return
+
+        sect_pr = section_properties(el)
+        if sect_pr is not None:
+            self.conf_section(Section(sect_pr, None))
+            if self.section_counter == 0 and self.new_footer_rid:
+                sect_pr.add_footerReference(WD_HEADER_FOOTER.PRIMARY, self.new_footer_rid)
+            self.section_counter += 1
+
+        self._pending.append([el, None, self._last_tag])
+        self._last_tag = el.tag
+
+    # форматирует абзацы, у которых уже разобран следующий абзац, и выгружает все, что перед ними
+    def _flush(self, body, dst, final=False):
+        pending = self._pending
+        while pending:
+            el, record, _ = pending[0]
+            if el.tag == _P:
+                if record is None or (not final and record.index + 1 >= len(self.data)):
+                    break
+                if el.getparent() is not None:
+                    self.format_doc(record)
+                    if el.getparent() is not None:
+                        self._keep = el
+                self.data.trim(record.index - 1)
+            elif el.tag == _TBL and not final and len(pending) == 1:
+                break
+            pending.popleft()
+
+        # последний отформатированный абзац и все после него еще нужны соседям (подписи, пустые абзацы)
+        while len(body):
+            child = body[0]
+            if not final and (child is self._keep or any(child is item[0] for item in pending)):
+                break
+            dst.write(self._serialize(child))
+            body.remove(child)
+
+    def _serialize(self, el):
+        xml = etree.tostring(el, encoding='UTF-8')
+        end = xml.index(b'>')
+        head = xml[:end]
+        for decl in self._strip:
+            head = head.replace(decl, b'', 1)
+        return head + xml[end:]
@@ -0,0 +1,180 @@
+# Типографская нормализация текста абзацев за один проход.
+#
+# Правила собраны в таблицу RULES и компилируются в одну регулярку с именованной группой на правило:
+# текст абзаца просматривается один раз независимо от числа правил. Найденные замены накладываются
+# на содержимое прогонов (w:t, w:tab, w:br...) на месте, поэтому форматирование внутри абзаца
+# (жирный, курсив, ссылки) сохраняется, а абзац без изменений не трогается вовсе.
+
+import re
+from bisect import bisect_right
+from typing import Callable, NamedTuple
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import nsmap, qn
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+
+class Rule(NamedTuple):
+    name: str
+    pattern: str
+    # строка; функция от найденного совпадения; пара (открывающий, закрывающий) для парных знаков
+    repl: str | Callable[[re.Match], str] | tuple[str, str]
+
+
+# порядок важен: при совпадении в одной позиции срабатывает правило, стоящее выше
+RULES = [
+    Rule('quotes', r'"', ('«', '»')),
+    Rule('range_dash', r'\d+-\d+', lambda m: m.group().replace('-', '—', 1)),
+    Rule('etc', r'(?<=\s)т\.\s*д\.(?=\s)', 'т.д.'),
+    Rule('etc_similar', r'(?<=\s)т\.\s*п\.(?=\s)', 'т.п.'),
+    # пробелы по краям убираются, внутри любая последовательность пробельных символов - один пробел;
+    # одиночный пробел не совпадает вовсе, чтобы не порождать пустых замен
+    Rule('spaces', r'\A\s+|\s+\Z|\s{2,}|[^\S ]',
+         lambda m: '' if m.start() == 0 or m.end() == len(m.string) else ' '),
+]
+
+
+class Normalizer:
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        self.pattern = re.compile('|'.join(f'(?P<_{i}>{r.pattern})' for i, r in enumerate(rules)))
+
+    # список правок (начало, конец, замена) без пустых и совпадающих с исходным текстом
+    def edits(self, text: str) -> list[tuple[int, int, str]]:
+        edits, paired = [], {}
+        for m in self.pattern.finditer(text):
+            rule = self.rules[int(m.lastgroup[1:])]
+            if isinstance(rule.repl, tuple):
+                paired.setdefault(rule.name, []).append(len(edits))
+                edits.append((m.start(), m.end(), None, rule.repl))
+                continue
+
+            new = rule.repl if isinstance(rule.repl, str) else rule.repl(m)
+            edits.append((m.start(), m.end(), new, None))
+
+        # парные знаки: открывающий и закрывающий по очереди, непарный последний остается как есть
+        for positions in paired.values():
+            if len(positions) % 2:
+                positions = positions[:-1]
+            for k, i in enumerate(positions):
+                start, end, _, pair = edits[i]
+                edits[i] = (start, end, pair[k % 2], None)
+
+        result = []
+        for start, end, new, _ in edits:
+            if new is None or new == text[start:end]:
+                continue
+            # общее начало и конец не переписываются, чтобы не переносить их между прогонами
+            old = text[start:end]
+            head = 0
+            while head < len(old) and head < len(new) and old[head] == new[head]:
+                head += 1
+            tail = 0
+            while tail < len(old) - head and tail < len(new) - head and old[-1 - tail] == new[-1 - tail]:
+                tail += 1
+            result.append((start + head, end - tail, new[head:len(new) - tail]))
+        return result
+
+    def normalize_text(self, text: str) -> str:
+        if not text:
+            return text
+
+        parts, pos = [], 0
+        for start, end, new in self.edits(text):
+            parts.append(text[pos:start])
+            parts.append(new)
+            pos = end
+        parts.append(text[pos:])
+        return ''.join(parts)
+
+    # нормализует абзац на месте; возвращает True, если текст изменился
+    def normalize_paragraph(self, par: Paragraph) -> bool:
+        segments = _segments(par._element)
+        text = ''.join(s for _, s in segments)
+        edits = self.edits(text)
+        if not edits or not text.strip():
+            return False
+
+        # начала непустых сегментов: правка целиком пишется в сегмент, где она начинается
+        owners = [i for i, (_, s) in enumerate(segments) if s]
+        starts, offset = [], 0
+        for i in owners:
+            starts.append(offset)
+            offset += len(segments[i][1])
+
+        out = {i: [] for i in owners}
+
+        def copy(a, b):
+            k = bisect_right(starts, a) - 1
+            while a < b:
+                seg_start = starts[k]
+                seg_end = seg_start + len(segments[owners[k]][1])
+                stop = min(b, seg_end)
+                out[owners[k]].append(text[a:stop])
+                a, k = stop, k + 1
+
+        pos = 0
+        for start, end, new in edits:
+            copy(pos, start)
+            if new:
+                k = bisect_right(starts, start) - 1
+                out[owners[k]].append(new)
+            pos = end
+        copy(pos, len(text))
+
+        for i in owners:
+            el, old = segments[i]
+            new = ''.join(out[i])
+            if new != old:
+                _set_segment(el, new)
+        return True
+
+
+_T, _TAB, _PTAB, _CR, _BR, _NB_HYPHEN = (qn(f'w:{n}') for n in ('t', 'tab', 'ptab', 'cr', 'br', 'noBreakHyphen'))
+_BR_TYPE = qn('w:type')
+_XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+_SEGMENTS_XPATH = etree.XPath(' | '.join(f'{parent}/w:{n}' for parent in ('w:r', 'w:hyperlink/w:r')
+                                          for n in ('t', 'tab', 'ptab', 'cr', 'br', 'noBreakHyphen')),
+                              namespaces=nsmap)
+
+
+# содержимое прогонов в порядке документа с текстом, как его видит Paragraph.text
+def _segments(p) -> list[tuple]:
+    segments = []
+    for el in _SEGMENTS_XPATH(p):
+        tag = el.tag
+        if tag == _T:
+            segments.append((el, el.text or ''))
+        elif tag == _TAB or tag == _PTAB:
+            segments.append((el, '\t'))
+        elif tag == _CR:
+            segments.append((el, '\n'))
+        elif tag == _NB_HYPHEN:
+            segments.append((el, '-'))
+        else:
+            segments.append((el, '\n' if el.get(_BR_TYPE) in (None, 'textWrapping') else ''))
+    return segments
+
+
+def _set_segment(el, text):
+    if el.tag != _T:
+        if not text:
+            el.getparent().remove(el)
+            return
+        t = OxmlElement('w:t')
+        el.addprevious(t)
+        el.getparent().remove(el)
+        el = t
+
+    if not text:
+        el.getparent().remove(el)
+        return
+    el.text = text
+    if text != text.strip():
+        el.set(_XML_SPACE, 'preserve')
+
+
+default = Normalizer(RULES)
+normalize_text = default.normalize_text
+normalize_paragraph = default.normalize_paragraph
@@ -0,0 +1,106 @@
+# Режим наблюдения: процесс остается запущенным и заново форматирует файл после каждого сохранения.
+#
+# Модули, стили и скомпилированные регулярки загружаются один раз; абзацы, не изменившиеся с прошлого
+# запуска, берутся из кэша. Файл опрашивается по времени изменения и размеру: это работает одинаково
+# везде, в том числе на сетевых дисках. Word сохраняет документ в несколько приемов, поэтому запуск
+# начинается только после того, как файл перестал меняться. Недописанный или еще заблокированный
+# сохраняющей программой файл пропускается до следующего изменения.
+
+import os
+import time
+import zipfile
+from datetime import datetime
+
+from docx.opc.exceptions import PackageNotFoundError
+
+from style_configs.style_config import StyleManager
+from utils.cache import ParCache, default_cache_dir
+from utils.pipeline import load_converter
+from utils.streaming import StreamConverter
+
+POLL_INTERVAL = 0.3
+# сколько файл должен не меняться, чтобы считаться сохраненным
+SETTLE_TIME = 0.5
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+# ждет, пока файл перестанет меняться; возвращает его итоговое состояние
+def _settle(path, state):
+    while True:
+        time.sleep(SETTLE_TIME)
+        current = _stat(path)
+        if current == state and current is not None:
+            return current
+        state = current
+
+
+# одно форматирование: результат пишется во временный файл и заменяет выходной целиком,
+# чтобы открытый в просмотрщике результат никогда не был записан наполовину
+def _run(input_file, output_file, style_conf, stream, use_cache, cache_dir, compression, images):
+    tmp = output_file + '.tmp'
+    par_cache = ParCache(cache_dir) if use_cache and not stream and not input_file.endswith('.txt') else None
+    try:
+        if stream and not input_file.endswith('.txt'):
+            StreamConverter(input_file, tmp, style_conf, compression).start()
+        else:
+            conv = load_converter(input_file, tmp, style_conf, par_cache, compression=compression, images=images)
+            conv.format()
+            conv.save()
+        os.replace(tmp, output_file)
+    finally:
+        if par_cache is not None:
+            par_cache.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return par_cache
+
+
+def watch_file(input_file, output_file, stream=False, use_cache=True, cache_dir=None, styles=None,
+               compression=None, images=None):
+    style_conf = StyleManager(styles, (cache_dir or default_cache_dir()) if use_cache else None)
+    print(f"наблюдение за {input_file} -> {output_file} (Ctrl+C для выхода)")
+
+    # первый запуск - по текущему состоянию файла, без времени от сохранения
+    state, saved_at = _stat(input_file), None
+    try:
+        while True:
+            if state is not None:
+                started = time.perf_counter()
+                try:
+                    par_cache = _run(input_file, output_file, style_conf, stream, use_cache, cache_dir, compression,
+                                     images)
+                except (zipfile.BadZipFile, PackageNotFoundError):
+                    print(f"[{datetime.now():%H:%M:%S}] файл еще не сохранен полностью, жду следующего изменения")
+                except PermissionError as e:
+                    # входной файл еще занят сохраняющей программой; занятый выходной - настоящая ошибка
+                    if e.filename != input_file:
+                        print(f"[{datetime.now():%H:%M:%S}] ошибка: {e}")
+                    else:
+                        print(f"[{datetime.now():%H:%M:%S}] файл еще не сохранен полностью, жду следующего изменения")
+                except Exception as e:
+                    print(f"[{datetime.now():%H:%M:%S}] ошибка: {e}")
+                else:
+                    elapsed = time.perf_counter() - started
+                    line = f"[{datetime.now():%H:%M:%S}] готово за {elapsed:.2f} с"
+                    if saved_at is not None:
+                        line += f", от сохранения до результата {time.time() - saved_at:.2f} с"
+                    if par_cache is not None:
+                        line += f", из кэша {par_cache.hits} из {par_cache.hits + par_cache.misses} абзацев"
+                    print(line)
+
+            # ожидание следующего сохранения
+            previous = state
+            while (current := _stat(input_file)) == previous:
+                time.sleep(POLL_INTERVAL)
+            state = _settle(input_file, current)
+            saved_at = state[0] / 1e9
+
+    except KeyboardInterrupt:
+        print("наблюдение остановлено")